@@ -0,0 +1,562 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+import asyncio
+import os
+from collections import defaultdict
+from typing import Any
+from typing import AsyncIterator
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from dynamic_importer.api.client import DEFAULT_API_HOST
+from dynamic_importer.api.client import DEFAULT_CONNECT_TIMEOUT
+from dynamic_importer.api.client import DEFAULT_MAX_RETRIES
+from dynamic_importer.api.client import DEFAULT_POOL_SIZE
+from dynamic_importer.api.client import DEFAULT_READ_TIMEOUT
+from dynamic_importer.api.client import SUCCESS_CODES
+from dynamic_importer.api.exceptions import ResourceNotFoundError
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None  # type: ignore[assignment]
+
+DEFAULT_MAX_CONCURRENCY = 50
+
+
+class AsyncCTClient:
+    """
+    asyncio counterpart of CTClient.
+
+    Every coroutine mirrors the CTClient method of the same name. At most
+    max_concurrency requests are in flight at once, no matter how many
+    coroutines are awaiting the client.
+
+    Requires the optional httpx dependency: pip install cloudtruth-dynamic-importer[async]
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        skip_ssl_validation: bool = False,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        transport: Any = None,
+    ):
+        if httpx is None:
+            raise ImportError(
+                "AsyncCTClient requires httpx. "
+                "Install it with `pip install cloudtruth-dynamic-importer[async]`"
+            )
+        api_host = os.environ.get("CLOUDTRUTH_API_HOST", DEFAULT_API_HOST)
+        if "://" not in api_host:
+            api_host = f"https://{api_host}"
+        self.base_url = f"{api_host}/api/v1"
+        self.api_key = api_key
+        self.headers = {"Authorization": f"Api-Key {self.api_key}"}
+        self.skip_ssl_validation = skip_ssl_validation
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+        if transport is None:
+            # httpx ignores the client's pool limits and verify when given a
+            # transport, so they are set on the transport itself
+            transport = httpx.AsyncHTTPTransport(
+                verify=not skip_ssl_validation,
+                limits=httpx.Limits(
+                    max_connections=pool_size, max_keepalive_connections=pool_size
+                ),
+                retries=max_retries,
+            )
+        self.http = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            transport=transport,
+        )
+
+        self.cache: Dict[str, Dict] = defaultdict(dict)
+
+    async def aclose(self) -> None:
+        await self.http.aclose()
+
+    async def __aenter__(self) -> AsyncCTClient:
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    async def _make_request(
+        self,
+        path: str,
+        method: str,
+        data: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+    ) -> Dict:
+        if path.startswith(("http://", "https://")):
+            # pagination links are already absolute
+            url = path
+        else:
+            if not path.startswith("/"):
+                path = f"/{path}"
+            if not path.endswith("/"):
+                path = f"{path}/"
+            url = f"{self.base_url}{path}"
+        async with self.semaphore:
+            try:
+                resp = await self.http.request(
+                    method.upper(), url, json=data, params=params
+                )
+            except httpx.HTTPError as e:
+                raise RuntimeError(f"{method} Request to {url} failed: {str(e)}")
+        success_code = SUCCESS_CODES[method.lower()]
+        if resp.status_code != success_code:
+            raise RuntimeError(
+                f"{method} Request to {url} failed with status code {resp.status_code}: {resp.text}"
+            )
+
+        return resp.json()
+
+    async def _iter_pages(
+        self, path: str, params: Optional[Dict] = None
+    ) -> AsyncIterator[List[Dict]]:
+        page = await self._make_request(path, "GET", params=params)
+        yield page["results"]
+        while next_url := page.get("next"):
+            page = await self._make_request(next_url, "GET")
+            yield page["results"]
+
+    async def _populate_cache(
+        self,
+        bucket: str,
+        pages: AsyncIterator[List[Dict]],
+        cache_key: Callable[[Dict], str],
+        wanted: Optional[str] = None,
+    ) -> None:
+        async for results in pages:
+            for resource in results:
+                self.cache[bucket][cache_key(resource)] = {
+                    "url": resource["url"],
+                    "id": resource["id"],
+                }
+            if wanted is not None and wanted in self.cache[bucket]:
+                return
+
+    async def get_project(self, project_name: str) -> Dict:
+        if project_name in self.cache["projects"].keys():
+            return self.cache["projects"][project_name]
+        await self._populate_cache(
+            "projects",
+            self._iter_pages("projects"),
+            lambda project: project["name"],
+            project_name,
+        )
+
+        try:
+            return self.cache["projects"][project_name]
+        except KeyError:
+            raise ResourceNotFoundError(f"Project {project_name} not found")
+
+    async def get_project_id(self, project_name: str) -> str:
+        return (await self.get_project(project_name))["id"]
+
+    async def get_project_url(self, project_name: str) -> str:
+        return (await self.get_project(project_name))["url"]
+
+    async def _populate_environment_cache(
+        self, environment_name: Optional[str] = None
+    ) -> None:
+        await self._populate_cache(
+            "environments",
+            self._iter_pages("environments"),
+            lambda environment: environment["name"],
+            environment_name,
+        )
+
+    async def get_environment_id(self, environment_name: str) -> str:
+        if environment_name not in self.cache["environments"].keys():
+            await self._populate_environment_cache(environment_name)
+
+        try:
+            return self.cache["environments"][environment_name]["id"]
+        except KeyError:
+            raise ResourceNotFoundError(f"Environment {environment_name} not found")
+
+    async def get_environment_url(self, environment_name: str) -> str:
+        if environment_name not in self.cache["environments"].keys():
+            await self._populate_environment_cache(environment_name)
+
+        try:
+            return self.cache["environments"][environment_name]["url"]
+        except KeyError:
+            raise ResourceNotFoundError(f"Environment {environment_name} not found")
+
+    async def get_parameter(self, project_name: str, parameter_name: str) -> Dict:
+        if f"{project_name}/{parameter_name}" in self.cache["parameters"].keys():
+            return self.cache["parameters"][f"{project_name}/{parameter_name}"]
+        project_id = await self.get_project_id(project_name)
+        await self._populate_cache(
+            "parameters",
+            self._iter_pages(
+                f"projects/{project_id}/parameters",
+                params={"immediate_parameters": True},
+            ),
+            lambda parameter: f"{project_name}/{parameter['name']}",
+            f"{project_name}/{parameter_name}",
+        )
+        try:
+            return self.cache["parameters"][f"{project_name}/{parameter_name}"]
+        except KeyError:
+            raise ResourceNotFoundError(f"Parameter {parameter_name} not found")
+
+    async def get_parameter_id(self, project_name: str, parameter_name: str) -> str:
+        return (await self.get_parameter(project_name, parameter_name))["id"]
+
+    async def get_template(self, project_name: str, template_name: str) -> Dict:
+        cache_key = f"{project_name}/{template_name}"
+        if cached_template := self.cache["templates"].get(cache_key):
+            return cached_template
+        project_id = await self.get_project_id(project_name)
+        await self._populate_cache(
+            "templates",
+            self._iter_pages(f"projects/{project_id}/templates"),
+            lambda template: f"{project_name}/{template['name']}",
+            cache_key,
+        )
+        try:
+            return self.cache["templates"][cache_key]
+        except KeyError:
+            raise ResourceNotFoundError(f"Template {template_name} not found")
+
+    async def get_value(
+        self, project_name: str, parameter_name: str, environment_name: str
+    ) -> Dict:
+        cache_key = f"{project_name}/{parameter_name}/{environment_name}"
+        if cached_value := self.cache["values"].get(cache_key):
+            return cached_value
+        project_id = await self.get_project_id(project_name)
+        parameter_id = await self.get_parameter_id(project_name, parameter_name)
+        environment_id = await self.get_environment_id(environment_name)
+        await self._populate_cache(
+            "values",
+            self._iter_pages(
+                f"projects/{project_id}/parameters/{parameter_id}/values",
+                params={"environment": environment_id},
+            ),
+            lambda value: f"{project_name}/{parameter_name}/{value['environment_name']}",
+            cache_key,
+        )
+        try:
+            return self.cache["values"][cache_key]
+        except KeyError:
+            raise ResourceNotFoundError(f"Parameter {parameter_name} not found")
+
+    async def _populate_type_cache(self, type_name: Optional[str] = None) -> None:
+        await self._populate_cache(
+            "types",
+            self._iter_pages("types"),
+            lambda ct_type: ct_type["name"],
+            type_name,
+        )
+
+    async def get_type_id(self, type_name: str) -> str:
+        if type_name not in self.cache["types"].keys():
+            await self._populate_type_cache(type_name)
+        try:
+            return self.cache["types"][type_name]["id"]
+        except KeyError:
+            raise ResourceNotFoundError(f"Type {type_name} not found")
+
+    async def get_type_url(self, type_name: str) -> str:
+        if type_name not in self.cache["types"].keys():
+            await self._populate_type_cache(type_name)
+        try:
+            return self.cache["types"][type_name]["url"]
+        except KeyError:
+            raise ResourceNotFoundError(f"Type {type_name} not found")
+
+    async def create_project(
+        self, name: str, description: str = "", parent: Optional[str] = None
+    ) -> Dict:
+        req_data = {"name": name, "description": description}
+        if parent:
+            parent_url = await self.get_project_url(parent)
+            req_data["depends_on"] = parent_url
+
+        resp = await self._make_request("projects", "POST", data=req_data)
+        self.cache["projects"][resp["name"]] = {"id": resp["id"], "url": resp["url"]}
+        return resp
+
+    async def create_environment(
+        self, name: str, description: str = "", parent_name: str = "default"
+    ) -> Dict:
+        parent_url = await self.get_environment_url(parent_name)
+        resp = await self._make_request(
+            "environments",
+            "POST",
+            data={"name": name, "description": description, "parent": parent_url},
+        )
+        self.cache["environments"][resp["name"]] = {
+            "id": resp["id"],
+            "url": resp["url"],
+        }
+        return resp
+
+    async def create_parameter(
+        self,
+        project_name: str,
+        name: str,
+        description: str = "",
+        type_name: str = "string",
+        secret: bool = False,
+        create_dependencies: bool = False,
+    ) -> Dict:
+        try:
+            project_id = await self.get_project_id(project_name)
+        except ResourceNotFoundError:
+            if not create_dependencies:
+                raise
+            project_id = (await self.create_project(project_name))["id"]
+
+        resp = await self._make_request(
+            f"projects/{project_id}/parameters",
+            "POST",
+            data={
+                "name": name,
+                "description": description,
+                "type": type_name,
+                "secret": secret,
+            },
+        )
+        self.cache["parameters"][f"{project_name}/{name}"] = {
+            "url": resp["url"],
+            "id": resp["id"],
+        }
+        return resp
+
+    async def create_template(
+        self,
+        project_name: str,
+        name: str,
+        body: str,
+        description: str = "",
+        create_dependencies: bool = False,
+    ) -> Dict:
+        try:
+            project_id = await self.get_project_id(project_name)
+        except ResourceNotFoundError:
+            if not create_dependencies:
+                raise
+            project_id = (await self.create_project(project_name))["id"]
+        resp = await self._make_request(
+            f"projects/{project_id}/templates",
+            "POST",
+            data={"name": name, "body": body},
+        )
+        self.cache["templates"][f"{project_name}/{name}"] = {
+            "url": resp["url"],
+            "id": resp["id"],
+        }
+        return resp
+
+    async def create_value(
+        self,
+        project_name: str,
+        parameter_name: str,
+        environment_name: str,
+        value: str,
+        create_dependencies: bool = False,
+    ) -> Dict:
+        try:
+            project_id = await self.get_project_id(project_name)
+            environment_id = await self.get_environment_id(environment_name)
+            parameter_id = await self.get_parameter_id(project_name, parameter_name)
+        except ResourceNotFoundError:
+            if not create_dependencies:
+                raise
+            project_id = (await self.create_project(project_name))["id"]
+            environment_id = (await self.create_environment(environment_name))["id"]
+            parameter_id = (await self.create_parameter(project_name, parameter_name))[
+                "id"
+            ]
+
+        value = str(value).lower() if isinstance(value, bool) else value
+        resp = await self._make_request(
+            f"projects/{project_id}/parameters/{parameter_id}/values",
+            "POST",
+            data={"environment": environment_id, "internal_value": value},
+        )
+        self.cache["values"][f"{project_name}/{parameter_name}/{environment_name}"] = {
+            "url": resp["url"],
+            "id": resp["id"],
+        }
+        return resp
+
+    async def update_value(
+        self,
+        project_name: str,
+        parameter_name: str,
+        environment_name: str,
+        value_id: str,
+        value: str,
+    ) -> Dict:
+        project_id = await self.get_project_id(project_name)
+        environment_id = await self.get_environment_id(environment_name)
+        parameter_id = await self.get_parameter_id(project_name, parameter_name)
+
+        value = str(value).lower() if isinstance(value, bool) else value
+        return await self._make_request(
+            f"projects/{project_id}/parameters/{parameter_id}/values/{value_id}",
+            "PATCH",
+            data={"environment": environment_id, "internal_value": value},
+        )
+
+    async def update_parameter(
+        self,
+        project_name: str,
+        parameter_id: str,
+        name: str,
+        description: str = "",
+        type_name: str = "string",
+    ) -> Dict:
+        project_id = await self.get_project_id(project_name)
+        return await self._make_request(
+            f"projects/{project_id}/parameters/{parameter_id}",
+            "PATCH",
+            data={
+                "name": name,
+                "description": description,
+                "type": type_name,
+            },
+        )
+
+    async def update_template(
+        self,
+        project_name: str,
+        template_id: str,
+        name: str,
+        body: str,
+        description: str = "",
+    ) -> Dict:
+        project_id = await self.get_project_id(project_name)
+        return await self._make_request(
+            f"projects/{project_id}/templates/{template_id}",
+            "PATCH",
+            data={"name": name, "body": body},
+        )
+
+    async def upsert_project(
+        self,
+        name: str,
+        description: str = "",
+        parent: Optional[str] = None,
+        create_dependencies: bool = False,
+    ) -> Dict:
+        try:
+            return await self.get_project(name)
+        except ResourceNotFoundError:
+            if not create_dependencies:
+                raise
+            return await self.create_project(name, description, parent)
+
+    async def upsert_parameter(
+        self,
+        project_name: str,
+        name: str,
+        description: str = "",
+        type_name: str = "string",
+        secret: bool = False,
+        create_dependencies: bool = False,
+    ) -> Dict:
+        try:
+            await self.get_project_id(project_name)
+        except ResourceNotFoundError:
+            if not create_dependencies:
+                raise
+            await self.create_project(project_name)
+
+        try:
+            parameter_id = await self.get_parameter_id(project_name, name)
+        except ResourceNotFoundError:
+            return await self.create_parameter(
+                project_name, name, description, type_name, secret, create_dependencies
+            )
+        return await self.update_parameter(
+            project_name, parameter_id, name, description, type_name
+        )
+
+    async def upsert_template(
+        self,
+        project_name: str,
+        name: str,
+        body: str,
+        description: str = "",
+        create_dependencies: bool = False,
+    ) -> Dict:
+        try:
+            await self.get_project_id(project_name)
+        except ResourceNotFoundError:
+            if not create_dependencies:
+                raise
+            await self.create_project(project_name)
+
+        try:
+            template_id = (await self.get_template(project_name, name))["id"]
+        except ResourceNotFoundError:
+            return await self.create_template(
+                project_name, name, body, description, create_dependencies
+            )
+        return await self.update_template(
+            project_name, template_id, name, body, description
+        )
+
+    async def upsert_value(
+        self,
+        project_name: str,
+        parameter_name: str,
+        environment_name: str,
+        value: str,
+        create_dependencies: bool = False,
+    ) -> Dict:
+        try:
+            await self.get_project_id(project_name)
+        except ResourceNotFoundError:
+            if not create_dependencies:
+                raise
+            await self.create_project(project_name)
+        try:
+            await self.get_environment_id(environment_name)
+        except ResourceNotFoundError:
+            if not create_dependencies:
+                raise
+            await self.create_environment(environment_name)
+        try:
+            await self.get_parameter_id(project_name, parameter_name)
+        except ResourceNotFoundError:
+            if not create_dependencies:
+                raise
+            await self.create_parameter(project_name, parameter_name)
+
+        try:
+            value_id = (
+                await self.get_value(project_name, parameter_name, environment_name)
+            )["id"]
+        except ResourceNotFoundError:
+            return await self.create_value(
+                project_name,
+                parameter_name,
+                environment_name,
+                value,
+                create_dependencies,
+            )
+        return await self.update_value(
+            project_name, parameter_name, environment_name, value_id, value
+        )
@@ -5,27 +5,154 @@
 #
 from __future__ import annotations
 
+import json
 import os
-from collections import defaultdict
+import time
+from itertools import chain
+from typing import Callable
 from typing import Dict
+from typing import Iterator
+from typing import List
 from typing import Optional
+from typing import Set
+from typing import Tuple
 
 import requests
+from dynamic_importer.api.disk_cache import cache_key as disk_cache_key
+from dynamic_importer.api.disk_cache import DEFAULT_CACHE_TTL
+from dynamic_importer.api.disk_cache import DiskCache
+from dynamic_importer.api.disk_cache import PERSISTED_BUCKETS
 from dynamic_importer.api.exceptions import ResourceNotFoundError
+from dynamic_importer.api.exceptions import StaleCacheError
+from dynamic_importer.api.metrics import ClientMetrics
+from dynamic_importer.api.metrics import endpoint_template
+from dynamic_importer.api.metrics import response_size
+from dynamic_importer.api.rate_limit import DEFAULT_THROTTLE_RETRIES
+from dynamic_importer.api.rate_limit import RateLimiter
+from dynamic_importer.api.rate_limit import throttle_delay
+from dynamic_importer.api.resource_cache import content_digest
+from dynamic_importer.api.resource_cache import DEFAULT_CACHE_MAX_ENTRIES
+from dynamic_importer.api.resource_cache import ResourceCache
+from dynamic_importer.api.single_flight import SingleFlight
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 DEFAULT_API_HOST = "api.cloudtruth.io"
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_POOL_SIZE = 10
+DEFAULT_READ_TIMEOUT = 60.0
+IDEMPOTENT_METHODS = {"GET", "PUT", "DELETE"}
+RETRY_BACKOFF_FACTOR = 0.5
+# 503 is handled with 429 by the throttling retries in _make_request so that
+# Retry-After is honoured by every worker and requests are not retried twice
+RETRY_STATUS_CODES = (502, 504)
 SUCCESS_CODES = {"get": 200, "post": 201, "patch": 200, "put": 200, "delete": 204}
 
 
+def _name_key(resource: Dict) -> Tuple[str, ...]:
+    return (resource["name"],)
+
+
+def _body_digest(resource: Dict) -> Optional[str]:
+    body = resource.get("body")
+    return content_digest(body) if isinstance(body, str) else None
+
+
 class CTClient:
-    def __init__(self, api_key, skip_ssl_validation=False):
+    def __init__(
+        self,
+        api_key,
+        skip_ssl_validation=False,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        cache_file: Optional[str] = None,
+        cache_ttl: int = DEFAULT_CACHE_TTL,
+        rate_limit: Optional[float] = None,
+        throttle_retries: int = DEFAULT_THROTTLE_RETRIES,
+        metrics: Optional[ClientMetrics] = None,
+        cache_max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+    ):
         api_host = os.environ.get("CLOUDTRUTH_API_HOST", DEFAULT_API_HOST)
-        self.base_url = f"https://{api_host}/api/v1"
+        if "://" not in api_host:
+            api_host = f"https://{api_host}"
+        self.base_url = f"{api_host}/api/v1"
         self.api_key = api_key
         self.headers = {"Authorization": f"Api-Key {self.api_key}"}
         self.skip_ssl_validation = skip_ssl_validation
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = self._build_session(pool_size, max_retries)
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.throttle_retries = throttle_retries
+        self.metrics = metrics or ClientMetrics()
+        # concurrent identical GETs share one request
+        self.single_flight = SingleFlight()
+
+        # shared by upload workers. Creates made through this client are cached,
+        # which keeps complete listings accurate until a write bypasses the cache
+        self.cache = ResourceCache(cache_max_entries)
+        # kinds whose list endpoint ignored a name filter, so they are listed instead
+        self.unfiltered_kinds: Set[str] = set()
+
+        self.disk_cache = DiskCache(cache_file, cache_ttl) if cache_file else None
+        self.disk_cache_key = disk_cache_key(self.base_url, self.api_key)
+        self.warm_from_disk = False
+        if self.disk_cache and (persisted := self.disk_cache.load(self.disk_cache_key)):
+            self.cache.load(persisted)
+            self.warm_from_disk = True
+
+    def _build_session(self, pool_size: int, max_retries: int) -> requests.Session:
+        """
+        Build a keep-alive session so that every request to the API host reuses
+        pooled connections instead of paying for a new TCP and TLS handshake.
+
+        Retries only cover transport failures and gateway errors on idempotent
+        methods; POST and PATCH are never replayed by the adapter. Throttled
+        responses are left to _send_request, which waits through the shared
+        rate limiter, so the adapter ignores their Retry-After.
+        """
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=RETRY_BACKOFF_FACTOR,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(self.headers)
+        session.verify = not self.skip_ssl_validation
+        return session
+
+    def close(self) -> None:
+        if self.disk_cache:
+            self.disk_cache.save(
+                self.disk_cache_key, self.cache.export(PERSISTED_BUCKETS)
+            )
+        self.session.close()
+
+    def _invalidate_disk_cache(self) -> None:
+        """
+        A 404 while using ids loaded from disk means some of them are stale, so
+        forget everything that came from the cache file.
+        """
+        self.cache.clear()
+        self.warm_from_disk = False
+        if self.disk_cache:
+            self.disk_cache.invalidate(self.disk_cache_key)
 
-        self.cache = defaultdict(dict)
+    def __enter__(self) -> CTClient:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
 
     def _make_request(
         self,
@@ -34,173 +161,381 @@ class CTClient:
         data: Optional[Dict] = None,
         params: Optional[Dict] = None,
     ) -> Dict:
-        if not path.startswith("/"):
-            path = f"/{path}"
-        if not path.endswith("/"):
-            path = f"{path}/"
-        req = getattr(requests, method.lower())
-        resp = req(
-            f"{self.base_url}{path}",
-            headers=self.headers,
-            json=data,
-            params=params,
-            verify=not self.skip_ssl_validation,
-        )
+        if path.startswith(("http://", "https://")):
+            # pagination links are already absolute
+            url = path
+        else:
+            if not path.startswith("/"):
+                path = f"/{path}"
+            if not path.endswith("/"):
+                path = f"{path}/"
+            url = f"{self.base_url}{path}"
+        if method.upper() == "GET":
+            flight_key = (url, json.dumps(params, sort_keys=True, default=str))
+            return self.single_flight.do(
+                flight_key, lambda: self._send_request(url, method, data, params)
+            )
+        return self._send_request(url, method, data, params)
+
+    def _send_request(
+        self,
+        url: str,
+        method: str,
+        data: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+    ) -> Dict:
+        endpoint = endpoint_template(url.removeprefix(self.base_url))
+        bytes_sent = len(json.dumps(data)) if data is not None else 0
         success_code = SUCCESS_CODES[method.lower()]
+        req = getattr(self.session, method.lower())
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            started = time.perf_counter()
+            try:
+                resp = req(
+                    url,
+                    headers=self.headers,
+                    json=data,
+                    params=params,
+                    verify=not self.skip_ssl_validation,
+                    timeout=self.timeout,
+                )
+            except requests.RequestException as e:
+                self.metrics.record_request(
+                    method,
+                    endpoint,
+                    time.perf_counter() - started,
+                    bytes_sent,
+                    error=True,
+                )
+                raise RuntimeError(f"{method} Request to {url} failed: {str(e)}")
+            self.metrics.record_request(
+                method,
+                endpoint,
+                time.perf_counter() - started,
+                bytes_sent,
+                response_size(resp),
+                error=resp.status_code != success_code,
+            )
+            if attempt >= self.throttle_retries or not self._is_throttled(
+                method, resp.status_code
+            ):
+                break
+            delay = throttle_delay(resp.headers.get("Retry-After"), attempt)
+            self.rate_limiter.pause(delay)
+            attempt += 1
+        if resp.status_code == 404 and self.warm_from_disk:
+            self._invalidate_disk_cache()
+            raise StaleCacheError(
+                f"{method} Request to {url} failed with status code 404 "
+                f"using cached ids: {resp.text}"
+            )
         if resp.status_code != success_code:
             raise RuntimeError(
-                f"{method} Request to {self.base_url}{path} failed with status code {resp.status_code}: {resp.text}"
+                f"{method} Request to {url} failed with status code {resp.status_code}: {resp.text}"
             )
 
         return resp.json()
 
-    def get_project(self, project_name: str) -> Dict:
-        if project_name in self.cache["projects"].keys():
-            return self.cache["parameters"][project_name]
-        projects = self._make_request("projects", "GET")
-        for project in projects["results"]:
-            self.cache["projects"][project["name"]] = {
-                "url": project["url"],
-                "id": project["id"],
-            }
+    @staticmethod
+    def _is_throttled(method: str, status_code: int) -> bool:
+        """
+        A 429 is rejected before any work is done, so any method can be sent
+        again. A 503 may have been partially handled, so only idempotent
+        methods are retried.
+        """
+        if status_code == 429:
+            return True
+        return status_code == 503 and method.upper() in IDEMPOTENT_METHODS
+
+    def _iter_pages(
+        self, path: str, params: Optional[Dict] = None
+    ) -> Iterator[List[Dict]]:
+        """
+        Lazily yield the results of each page of a list endpoint. The `next`
+        link is only followed when the caller asks for another page.
+        """
+        page = self._make_request(path, "GET", params=params)
+        yield page["results"]
+        while next_url := page.get("next"):
+            page = self._make_request(next_url, "GET")
+            yield page["results"]
+
+    def _populate_cache(
+        self,
+        kind: str,
+        pages: Iterator[List[Dict]],
+        cache_key: Callable[[Dict], Tuple[str, ...]],
+        wanted: Optional[Tuple[str, ...]] = None,
+        scope: Tuple[str, ...] = (),
+    ) -> None:
+        """
+        Cache every resource from pages as they arrive, stopping as soon as
+        the wanted cache key has been seen. When every page has been read the
+        listing of kind within scope is marked complete.
+        """
+        for results in pages:
+            with self.cache.lock:
+                for resource in results:
+                    self.cache.put(
+                        kind,
+                        cache_key(resource),
+                        resource["id"],
+                        resource["url"],
+                        _body_digest(resource),
+                    )
+            if wanted is not None and self.cache.get(kind, *wanted) is not None:
+                return
+        self.cache.mark_complete(kind, *scope)
+
+    def _populate_by_name(self, kind: str, path: str, name: str) -> None:
+        """
+        Cache the resource of kind called name with a single name filtered
+        request. If the API ignores the filter and returns other resources,
+        listing carries on from that page and kind is listed from then on.
+        """
+        if kind in self.unfiltered_kinds:
+            self._populate_cache(kind, self._iter_pages(path), _name_key, (name,))
+            return
+
+        pages = self._iter_pages(path, params={"name": name})
+        first_page = next(pages)
+        if all(resource["name"] == name for resource in first_page):
+            with self.cache.lock:
+                for resource in first_page:
+                    self.cache.put(kind, (name,), resource["id"], resource["url"])
+                # an empty result means name does not exist
+                self.cache.mark_complete(kind, name)
+            return
+        self.unfiltered_kinds.add(kind)
+        self._populate_cache(kind, chain([first_page], pages), _name_key, (name,))
+
+    def _cached(self, kind: str, *key: str) -> Optional[Dict]:
+        """
+        Look up a cached resource, counting the hit or miss.
+        """
+        cached = self.cache.get(kind, *key)
+        self.metrics.record_cache(kind, cached is not None)
+        return cached.to_dict() if cached is not None else None
+
+    def _lookup(self, kind: str, *key: str) -> Optional[Dict]:
+        cached = self.cache.get(kind, *key)
+        return cached.to_dict() if cached is not None else None
 
-        try:
-            return self.cache["projects"][project_name]
-        except KeyError:
-            raise ResourceNotFoundError(f"Project {project_name} not found")
+    def get_project(self, project_name: str) -> Dict:
+        if cached := self._cached("projects", project_name):
+            return cached
+        if not self.cache.is_complete("projects", project_name):
+            self._populate_by_name("projects", "projects", project_name)
+        if cached := self._lookup("projects", project_name):
+            return cached
+        raise ResourceNotFoundError(f"Project {project_name} not found")
 
     def get_project_id(self, project_name: str) -> str:
-        if project_name in self.cache["projects"].keys():
-            return self.cache["projects"][project_name]["id"]
-
         return self.get_project(project_name)["id"]
 
     def get_project_url(self, project_name: str) -> str:
-        if project_name in self.cache["projects"].keys():
-            return self.cache["projects"][project_name]["url"]
-
         return self.get_project(project_name)["url"]
 
-    def _populate_environment_cache(self) -> None:
-        environments = self._make_request("environments", "GET")
-        for environment in environments["results"]:
-            self.cache["environments"][environment["name"]] = {
-                "url": environment["url"],
-                "id": environment["id"],
-            }
+    def get_environment(self, environment_name: str) -> Dict:
+        if cached := self._cached("environments", environment_name):
+            return cached
+        if not self.cache.is_complete("environments", environment_name):
+            self._populate_by_name("environments", "environments", environment_name)
+        if cached := self._lookup("environments", environment_name):
+            return cached
+        raise ResourceNotFoundError(f"Environment {environment_name} not found")
 
     def get_environment_id(self, environment_name: str) -> str:
-        if environment_name in self.cache["environments"].keys():
-            return self.cache["environments"][environment_name]["id"]
-        self._populate_environment_cache()
-
-        try:
-            return self.cache["environments"][environment_name]["id"]
-        except KeyError:
-            raise ResourceNotFoundError(f"Environment {environment_name} not found")
+        return self.get_environment(environment_name)["id"]
 
     def get_environment_url(self, environment_name: str) -> str:
-        if environment_name in self.cache["environments"].keys():
-            return self.cache["environments"][environment_name]["url"]
-        self._populate_environment_cache()
-
-        try:
-            return self.cache["environments"][environment_name]["url"]
-        except KeyError:
-            raise ResourceNotFoundError(f"Environment {environment_name} not found")
+        return self.get_environment(environment_name)["url"]
 
     def get_parameter(self, project_name: str, parameter_name: str) -> Dict:
-        if f"{project_name}/{parameter_name}" in self.cache["parameters"].keys():
-            return self.cache["parameters"][f"{project_name}/{parameter_name}"]
-        project_id = self.get_project_id(project_name)
-        parameters = self._make_request(
-            f"projects/{project_id}/parameters",
-            "GET",
-            params={"immediate_parameters": True},
-        )
-        for parameter in parameters["results"]:
-            self.cache["parameters"][f"{project_name}/{parameter['name']}"] = {
-                "url": parameter["url"],
-                "id": parameter["id"],
-            }
-        try:
-            return self.cache["parameters"][f"{project_name}/{parameter_name}"]
-        except KeyError:
-            raise ResourceNotFoundError(f"Parameter {parameter_name} not found")
+        if cached := self._cached("parameters", project_name, parameter_name):
+            return cached
+        if not self.cache.is_complete("parameters", project_name):
+            project_id = self.get_project_id(project_name)
+            self._populate_cache(
+                "parameters",
+                self._iter_pages(
+                    f"projects/{project_id}/parameters",
+                    params={"immediate_parameters": True},
+                ),
+                lambda parameter: (project_name, parameter["name"]),
+                (project_name, parameter_name),
+                (project_name,),
+            )
+        if cached := self._lookup("parameters", project_name, parameter_name):
+            return cached
+        raise ResourceNotFoundError(f"Parameter {parameter_name} not found")
 
     def get_parameter_id(self, project_name: str, parameter_name: str) -> str:
-        if f"{project_name}/{parameter_name}" in self.cache["parameters"].keys():
-            return self.cache["parameters"][f"{project_name}/{parameter_name}"]["id"]
-
         return self.get_parameter(project_name, parameter_name)["id"]
 
     def get_template(self, project_name: str, template_name: str) -> Dict:
-        cache_key = f"{project_name}/{template_name}"
-        if cached_template := self.cache["templates"].get(cache_key):
+        if cached_template := self._cached("templates", project_name, template_name):
             return cached_template
-        project_id = self.get_project_id(project_name)
-        templates = self._make_request(f"projects/{project_id}/templates", "GET")
-        for template in templates["results"]:
-            self.cache["templates"][f"{project_name}/{template['name']}"] = {
-                "url": template["url"],
-                "id": template["id"],
-            }
-        try:
-            return self.cache["templates"][cache_key]
-        except KeyError:
-            raise ResourceNotFoundError(f"Template {template_name} not found")
+        if not self.cache.is_complete("templates", project_name):
+            project_id = self.get_project_id(project_name)
+            self._populate_cache(
+                "templates",
+                self._iter_pages(f"projects/{project_id}/templates"),
+                lambda template: (project_name, template["name"]),
+                (project_name, template_name),
+                (project_name,),
+            )
+        if cached_template := self._lookup("templates", project_name, template_name):
+            return cached_template
+        raise ResourceNotFoundError(f"Template {template_name} not found")
 
     def get_value(
         self, project_name: str, parameter_name: str, environment_name: str
     ) -> Dict:
-        cache_key = f"{project_name}/{parameter_name}/{environment_name}"
-        if cached_value := self.cache["values"].get(cache_key):
+        cache_key = (project_name, parameter_name, environment_name)
+        if cached_value := self._cached("values", *cache_key):
+            return cached_value
+        if not self.cache.is_complete("values", *cache_key):
+            project_id = self.get_project_id(project_name)
+            parameter_id = self.get_parameter_id(project_name, parameter_name)
+            environment_id = self.get_environment_id(environment_name)
+            self._populate_cache(
+                "values",
+                self._iter_pages(
+                    f"projects/{project_id}/parameters/{parameter_id}/values",
+                    params={"environment": environment_id},
+                ),
+                lambda value: (
+                    project_name,
+                    parameter_name,
+                    value["environment_name"],
+                ),
+                cache_key,
+                cache_key,
+            )
+        if cached_value := self._lookup("values", *cache_key):
             return cached_value
+        raise ResourceNotFoundError(f"Parameter {parameter_name} not found")
+
+    def get_project_snapshot(
+        self, project_name: str, unmask_secrets: bool = False
+    ) -> Dict:
+        """
+        Fetch the current state of a project: every parameter with its metadata
+        and the values set in each environment, plus every template body. Uses
+        paginated listings rather than a lookup per parameter and environment.
+
+        Values inherited from a parent environment are keyed by the environment
+        they are set in, so they are never mistaken for values of the child.
+        Secret values are masked unless unmask_secrets is given.
+        """
+        try:
+            return self._fetch_project_snapshot(project_name, unmask_secrets)
+        except StaleCacheError:
+            # the cache file is dropped by now, so look everything up again
+            return self._fetch_project_snapshot(project_name, unmask_secrets)
+
+    def _fetch_project_snapshot(self, project_name: str, unmask_secrets: bool) -> Dict:
         project_id = self.get_project_id(project_name)
-        parameter_id = self.get_parameter_id(project_name, parameter_name)
-        environment_id = self.get_environment_id(environment_name)
-        values = self._make_request(
-            f"projects/{project_id}/parameters/{parameter_id}/values",
-            "GET",
-            params={"environment": environment_id},
+        self._populate_cache(
+            "environments", self._iter_pages("environments"), _name_key
         )
-        for value in values["results"]:
-            self.cache["values"][
-                f"{project_name}/{parameter_name}/{value['environment_name']}"
-            ] = {
-                "url": value["url"],
-                "id": value["id"],
-            }
-        try:
-            return self.cache["values"][cache_key]
-        except KeyError:
-            raise ResourceNotFoundError(f"Parameter {parameter_name} not found")
-
-    def _populate_type_cache(self) -> None:
-        types = self._make_request("types", "GET")
-        for ct_type in types["results"]:
-            self.cache["types"][ct_type["name"]] = {
-                "url": ct_type["url"],
-                "id": ct_type["id"],
-            }
+        environment_names = {
+            environment.url: environment.key[0]
+            for environment in self.cache.resources("environments")
+        }
+        snapshot: Dict[str, Dict] = {"parameters": {}, "templates": {}}
+        for results in self._iter_pages(
+            f"projects/{project_id}/parameters",
+            params={
+                "immediate_parameters": True,
+                "values": True,
+                "mask_secrets": not unmask_secrets,
+            },
+        ):
+            for parameter in results:
+                values = {}
+                for value in (parameter.get("values") or {}).values():
+                    if not value:
+                        continue
+                    environment_name = value.get(
+                        "environment_name"
+                    ) or environment_names.get(value.get("environment"))
+                    if environment_name:
+                        values[environment_name] = {
+                            "url": value["url"],
+                            "id": value["id"],
+                            "internal_value": value.get("internal_value"),
+                        }
+                snapshot["parameters"][parameter["name"]] = {
+                    "url": parameter["url"],
+                    "id": parameter["id"],
+                    "description": parameter.get("description", ""),
+                    "type": parameter.get("type", "string"),
+                    "secret": parameter.get("secret", False),
+                    "values": values,
+                }
+        for results in self._iter_pages(f"projects/{project_id}/templates"):
+            for template in results:
+                snapshot["templates"][template["name"]] = {
+                    "url": template["url"],
+                    "id": template["id"],
+                    "body": template.get("body"),
+                }
+        return snapshot
+
+    def prefetch_project(self, project_name: str, unmask_secrets: bool = False) -> Dict:
+        """
+        Cache a project's parameters, values and templates from a single
+        snapshot. Afterwards, lookups of parameters and values in the project
+        are answered from the cache alone. Returns the snapshot.
+        """
+        snapshot = self.get_project_snapshot(project_name, unmask_secrets)
+        with self.cache.lock:
+            # drop entries that may have been deleted remotely since they were cached
+            self.cache.forget_project(project_name)
+            for name, parameter in snapshot["parameters"].items():
+                self.cache.put(
+                    "parameters",
+                    (project_name, name),
+                    parameter["id"],
+                    parameter["url"],
+                )
+                for environment_name, value in parameter["values"].items():
+                    self.cache.put(
+                        "values",
+                        (project_name, name, environment_name),
+                        value["id"],
+                        value["url"],
+                    )
+            for name, template in snapshot["templates"].items():
+                self.cache.put(
+                    "templates",
+                    (project_name, name),
+                    template["id"],
+                    template["url"],
+                    _body_digest(template),
+                )
+            for kind in ("parameters", "values", "templates"):
+                self.cache.mark_complete(kind, project_name)
+        return snapshot
+
+    def get_type(self, type_name: str) -> Dict:
+        if cached := self._cached("types", type_name):
+            return cached
+        if not self.cache.is_complete("types", type_name):
+            self._populate_by_name("types", "types", type_name)
+        if cached := self._lookup("types", type_name):
+            return cached
+        raise ResourceNotFoundError(f"Type {type_name} not found")
 
     def get_type_id(self, type_name: str) -> str:
-        if type_name in self.cache["types"].keys():
-            return self.cache["types"][type_name]["id"]
-        self._populate_type_cache()
-        try:
-            return self.cache["types"][type_name]["id"]
-        except KeyError:
-            raise ResourceNotFoundError(f"Type {type_name} not found")
+        return self.get_type(type_name)["id"]
 
     def get_type_url(self, type_name: str) -> str:
-        if type_name in self.cache["types"].keys():
-            return self.cache["types"][type_name]["url"]
-        self._populate_type_cache()
-        try:
-            return self.cache["types"][type_name]["url"]
-        except KeyError:
-            raise ResourceNotFoundError(f"Type {type_name} not found")
+        return self.get_type(type_name)["url"]
 
     def create_project(
         self, name: str, description: str = "", parent: Optional[str] = None
@@ -211,7 +546,11 @@ class CTClient:
             req_data["depends_on"] = parent_url
 
         resp = self._make_request("projects", "POST", data=req_data)
-        self.cache["projects"][resp["name"]] = {"id": resp["id"], "url": resp["url"]}
+        with self.cache.lock:
+            self.cache.put("projects", (resp["name"],), resp["id"], resp["url"])
+            # a new project has nothing of its own to look up
+            for kind in ("parameters", "values", "templates"):
+                self.cache.mark_complete(kind, resp["name"])
         return resp
 
     def create_environment(
@@ -223,10 +562,7 @@ class CTClient:
             "POST",
             data={"name": name, "description": description, "parent": parent_url},
         )
-        self.cache["environments"][resp["name"]] = {
-            "id": resp["id"],
-            "name": resp["name"],
-        }
+        self.cache.put("environments", (resp["name"],), resp["id"], resp["url"])
         return resp
 
     def create_parameter(
@@ -255,10 +591,10 @@ class CTClient:
                 "secret": secret,
             },
         )
-        self.cache["parameters"][f"{project_name}/{name}"] = {
-            "url": resp["url"],
-            "id": resp["id"],
-        }
+        with self.cache.lock:
+            self.cache.put("parameters", (project_name, name), resp["id"], resp["url"])
+            # a new parameter has no values to look up
+            self.cache.mark_complete("values", project_name, name)
         return resp
 
     def create_template(
@@ -280,10 +616,13 @@ class CTClient:
             "POST",
             data={"name": name, "body": body},
         )
-        self.cache["templates"][f"{project_name}/{name}"] = {
-            "url": resp["url"],
-            "id": resp["id"],
-        }
+        self.cache.put(
+            "templates",
+            (project_name, name),
+            resp["id"],
+            resp["url"],
+            content_digest(body),
+        )
         return resp
 
     def create_value(
@@ -311,10 +650,12 @@ class CTClient:
             "POST",
             data={"environment": environment_id, "internal_value": value},
         )
-        self.cache["values"][f"{project_name}/{parameter_name}/{environment_name}"] = {
-            "url": resp["url"],
-            "id": resp["id"],
-        }
+        self.cache.put(
+            "values",
+            (project_name, parameter_name, environment_name),
+            resp["id"],
+            resp["url"],
+        )
         return resp
 
     def update_value(
@@ -364,11 +705,52 @@ class CTClient:
         description: str = "",
     ) -> Dict:
         project_id = self.get_project_id(project_name)
-        return self._make_request(
+        resp = self._make_request(
             f"projects/{project_id}/templates/{template_id}",
             "PATCH",
             data={"name": name, "body": body},
         )
+        self.cache.put(
+            "templates",
+            (project_name, name),
+            resp["id"],
+            resp["url"],
+            content_digest(body),
+        )
+        return resp
+
+    def import_parameters(
+        self,
+        project_name: str,
+        environment_name: str,
+        parameters: List[Dict],
+        create_dependencies: bool = False,
+    ) -> Dict:
+        """
+        Create or update many parameters and their values for one environment
+        with a single request to the bulk import endpoint.
+
+        Each entry in parameters holds the parameter name, value, type and
+        secret flag. The import endpoint creates missing projects and
+        environments, so they are only verified up front when
+        create_dependencies is false.
+        """
+        if not create_dependencies:
+            self.get_project_id(project_name)
+            self.get_environment_id(environment_name)
+
+        resp = self._make_request(
+            "import",
+            "POST",
+            data={
+                "project": project_name,
+                "environment": environment_name,
+                "parameters": parameters,
+            },
+        )
+        # imported parameters and values bypass the cache, so drop anything stale
+        self.cache.forget_project(project_name, ("parameters", "values"))
+        return resp
 
     def upsert_project(
         self,
@@ -410,6 +792,18 @@ class CTClient:
                 project_name, name, description, type_name, secret, create_dependencies
             )
 
+    def template_unchanged(self, project_name: str, name: str, body: str) -> bool:
+        """
+        Whether CloudTruth already holds this exact template body, judged by
+        the digest cached when the template was last listed or uploaded.
+        """
+        try:
+            self.get_template(project_name, name)
+        except ResourceNotFoundError:
+            return False
+        cached = self.cache.get("templates", project_name, name)
+        return cached is not None and cached.digest == content_digest(body)
+
     def upsert_template(
         self,
         project_name: str,
@@ -426,9 +820,12 @@ class CTClient:
             self.create_project(project_name)
 
         try:
-            template_id = self.get_template(project_name, name)["id"]
+            template = self.get_template(project_name, name)
+            if self.template_unchanged(project_name, name, body):
+                self.metrics.record_skipped_upload("templates", len(body.encode()))
+                return template
             return self.update_template(
-                project_name, template_id, name, body, description
+                project_name, template["id"], name, body, description
             )
         except ResourceNotFoundError:
             return self.create_template(
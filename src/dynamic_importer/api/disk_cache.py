@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from tempfile import NamedTemporaryFile
+from time import time
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+DEFAULT_CACHE_TTL = 3600
+CACHE_FILE_VERSION = 3
+# values change on every import, so only resource identities are persisted
+PERSISTED_BUCKETS = ("projects", "environments", "types", "parameters")
+
+
+def cache_key(base_url: str, api_key: str) -> str:
+    """
+    API keys belong to a single organization, so a digest of the key stands in
+    for the organization without writing the key itself to disk.
+    """
+    org_digest = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+    return f"{base_url}|{org_digest}"
+
+
+class DiskCache:
+    """
+    A JSON file holding the names, ids and urls of CloudTruth resources, with
+    one entry per API host and organization. Every row records when it was
+    fetched from the API, and rows older than ttl seconds are ignored.
+    """
+
+    def __init__(self, path: str, ttl: int = DEFAULT_CACHE_TTL) -> None:
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.path, "r") as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != CACHE_FILE_VERSION:
+            return {}
+        return data.get("entries", {})
+
+    def _write(self, entries: Dict) -> None:
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # write to a sibling file and swap it in so readers never see partial JSON
+        with NamedTemporaryFile("w", dir=directory, delete=False) as fp:
+            json.dump({"version": CACHE_FILE_VERSION, "entries": entries}, fp)
+        os.replace(fp.name, self.path)
+
+    def load(self, key: str) -> Optional[Dict[str, List[List[Any]]]]:
+        entry = self._read().get(key)
+        if not entry:
+            return None
+        oldest = time() - self.ttl
+        loaded = {
+            bucket: [row for row in entry.get(bucket, []) if row[-1] >= oldest]
+            for bucket in PERSISTED_BUCKETS
+        }
+        return loaded if any(loaded.values()) else None
+
+    def save(self, key: str, cache: Dict[str, List[List[Any]]]) -> None:
+        """
+        Rows without a saved_at were fetched from the API in this run, so they
+        are stamped now. Rows loaded from the file keep their time, so ids that
+        are never fetched again still expire.
+        """
+        now = time()
+        entries = self._read()
+        entries[key] = {
+            bucket: [
+                [*row[:-1], now if row[-1] is None else row[-1]]
+                for row in cache.get(bucket, [])
+            ]
+            for bucket in PERSISTED_BUCKETS
+        }
+        self._write(entries)
+
+    def invalidate(self, key: str) -> None:
+        entries = self._read()
+        if entries.pop(key, None) is not None:
+            self._write(entries)
@@ -8,3 +8,7 @@ from __future__ import annotations
 
 class ResourceNotFoundError(ValueError):
     pass
+
+
+class StaleCacheError(RuntimeError):
+    pass
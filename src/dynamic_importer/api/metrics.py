@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+import json
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+# seconds; the last bucket is +Inf
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_EXTENSIONS = (".prom", ".txt")
+
+
+def endpoint_template(path: str) -> str:
+    """
+    Collapse resource ids so that calls to the same endpoint are grouped, e.g.
+    /projects/<id>/parameters/<id>/values/ becomes
+    /projects/{id}/parameters/{id}/values/.
+    """
+    segments = [s for s in path.split("?")[0].split("/") if s]
+    return "/" + "".join(
+        f"{s}/" if i % 2 == 0 else "{id}/" for i, s in enumerate(segments)
+    )
+
+
+def response_size(resp) -> int:
+    content = getattr(resp, "content", None)
+    return len(content) if isinstance(content, bytes) else 0
+
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
+
+
+@dataclass
+class EndpointStats:
+    count: int = 0
+    errors: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    latency_total: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    buckets: List[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+
+    def observe(self, latency: float) -> None:
+        self.latency_total += latency
+        self.latencies.append(latency)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.buckets[i] += 1
+
+    def to_dict(self) -> Dict:
+        latencies = sorted(self.latencies)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency_seconds": {
+                "total": round(self.latency_total, 6),
+                "p50": _quantile(latencies, 0.5),
+                "p95": _quantile(latencies, 0.95),
+                "max": latencies[-1] if latencies else 0.0,
+            },
+        }
+
+
+class ClientMetrics:
+    """
+    Request and cache counters collected by CTClient. One instance may be
+    shared by several clients to report on a whole run.
+    """
+
+    def __init__(self) -> None:
+        self.endpoints: Dict[Tuple[str, str], EndpointStats] = {}
+        self.cache_hits: Counter = Counter()
+        self.cache_misses: Counter = Counter()
+        # uploads left out because CloudTruth already holds the same content
+        self.skipped_uploads: Counter = Counter()
+        self.bytes_saved: Counter = Counter()
+        self.parameters = 0
+        self.lock = threading.Lock()
+
+    def record_request(
+        self,
+        method: str,
+        endpoint: str,
+        latency: float,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+        error: bool = False,
+    ) -> None:
+        with self.lock:
+            stats = self.endpoints.setdefault(
+                (method.upper(), endpoint), EndpointStats()
+            )
+            stats.count += 1
+            stats.errors += int(error)
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+            stats.observe(latency)
+
+    def record_cache(self, bucket: str, hit: bool) -> None:
+        with self.lock:
+            (self.cache_hits if hit else self.cache_misses)[bucket] += 1
+
+    def record_skipped_upload(self, kind: str, bytes_saved: int) -> None:
+        with self.lock:
+            self.skipped_uploads[kind] += 1
+            self.bytes_saved[kind] += bytes_saved
+
+    @property
+    def total_requests(self) -> int:
+        return sum(stats.count for stats in self.endpoints.values())
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            buckets = sorted(set(self.cache_hits) | set(self.cache_misses))
+            return {
+                "requests": [
+                    {"method": method, "endpoint": endpoint, **stats.to_dict()}
+                    for (method, endpoint), stats in sorted(self.endpoints.items())
+                ],
+                "cache": {
+                    bucket: {
+                        "hits": self.cache_hits[bucket],
+                        "misses": self.cache_misses[bucket],
+                    }
+                    for bucket in buckets
+                },
+                "skipped_uploads": {
+                    kind: {
+                        "count": self.skipped_uploads[kind],
+                        "bytes_saved": self.bytes_saved[kind],
+                    }
+                    for kind in sorted(self.skipped_uploads)
+                },
+                "total_requests": self.total_requests,
+                "parameters": self.parameters,
+                "requests_per_parameter": (
+                    round(self.total_requests / self.parameters, 3)
+                    if self.parameters
+                    else None
+                ),
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        Render the Prometheus text exposition format. Samples of one metric
+        family must be contiguous, so each family is written in turn.
+        """
+        with self.lock:
+            endpoints = [
+                (f'method="{method}",endpoint="{endpoint}"', stats)
+                for (method, endpoint), stats in sorted(self.endpoints.items())
+            ]
+            counters = (
+                ("cloudtruth_requests_total", "count"),
+                ("cloudtruth_request_errors_total", "errors"),
+                ("cloudtruth_request_bytes_sent_total", "bytes_sent"),
+                ("cloudtruth_request_bytes_received_total", "bytes_received"),
+            )
+            lines = []
+            for name, attr in counters:
+                lines.append(f"# TYPE {name} counter")
+                for labels, stats in endpoints:
+                    lines.append(f"{name}{{{labels}}} {getattr(stats, attr)}")
+
+            name = "cloudtruth_request_duration_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for labels, stats in endpoints:
+                for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f"{name}_sum{{{labels}}} {stats.latency_total}")
+                lines.append(f"{name}_count{{{labels}}} {stats.count}")
+
+            name = "cloudtruth_cache_lookups_total"
+            lines.append(f"# TYPE {name} counter")
+            for bucket in sorted(set(self.cache_hits) | set(self.cache_misses)):
+                hits, misses = self.cache_hits[bucket], self.cache_misses[bucket]
+                lines.append(f'{name}{{bucket="{bucket}",result="hit"}} {hits}')
+                lines.append(f'{name}{{bucket="{bucket}",result="miss"}} {misses}')
+
+            skipped = sorted(self.skipped_uploads)
+            for name, counter in (
+                ("cloudtruth_skipped_uploads_total", self.skipped_uploads),
+                ("cloudtruth_upload_bytes_saved_total", self.bytes_saved),
+            ):
+                lines.append(f"# TYPE {name} counter")
+                for kind in skipped:
+                    lines.append(f'{name}{{kind="{kind}"}} {counter[kind]}')
+
+            lines.append("# TYPE cloudtruth_parameters_total counter")
+            lines.append(f"cloudtruth_parameters_total {self.parameters}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Write Prometheus text format for .prom or .txt files, JSON otherwise.
+        """
+        if path.endswith(PROMETHEUS_EXTENSIONS):
+            output = self.to_prometheus()
+        else:
+            output = json.dumps(self.to_dict(), indent=2) + "\n"
+        with open(path, "w") as fp:
+            fp.write(output)
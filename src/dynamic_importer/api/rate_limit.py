@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+import random
+import threading
+import time
+from datetime import datetime
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+DEFAULT_THROTTLE_RETRIES = 8
+THROTTLE_BACKOFF_BASE = 1.0
+THROTTLE_BACKOFF_MAX = 60.0
+THROTTLE_JITTER = 1.0
+
+
+class RateLimiter:
+    """
+    A token bucket shared by every request a client makes. Tokens refill at
+    `rate` per second up to `burst`; a rate of None only applies pauses.
+
+    When the API asks us to slow down, `pause` holds back every caller, not
+    just the one that was throttled, so workers do not keep hammering the API.
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[int] = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate or 1))
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.resume_at = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        if self.rate:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+        self.updated = now
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.resume_at:
+                    wait = self.resume_at - now
+                elif not self.rate:
+                    return
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        with self.lock:
+            self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-After is either a number of seconds or an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def throttle_delay(retry_after: Optional[str], attempt: int) -> float:
+    """
+    Seconds to wait before retrying a throttled request. The server's
+    Retry-After wins when present; otherwise back off exponentially. Jitter
+    keeps concurrent workers from retrying in lockstep.
+    """
+    delay = parse_retry_after(retry_after)
+    if delay is None:
+        delay = min(THROTTLE_BACKOFF_MAX, THROTTLE_BACKOFF_BASE * 2**attempt)
+    return delay + random.uniform(0, THROTTLE_JITTER)
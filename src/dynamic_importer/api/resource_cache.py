@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+DEFAULT_CACHE_MAX_ENTRIES = 100_000
+# resources that live inside a project, keyed by project name first
+PROJECT_KINDS = ("parameters", "templates", "values")
+
+Key = Tuple[str, ...]
+
+
+def content_digest(body: str) -> str:
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+class CachedResource:
+    """
+    The id and url of one CloudTruth resource. `key` holds the names that
+    identify it: (name,) for projects, environments and types, (project, name)
+    for parameters and templates and (project, parameter, environment) for
+    values. `digest` is the content_digest of a template's body, when known.
+    `saved_at` is when a cache file recorded it, or None once it has been
+    fetched from the API since.
+    """
+
+    __slots__ = ("kind", "key", "id", "url", "digest", "saved_at")
+
+    def __init__(
+        self,
+        kind: str,
+        key: Key,
+        resource_id: str,
+        url: str,
+        digest: Optional[str] = None,
+    ) -> None:
+        self.kind = kind
+        self.key = key
+        self.id = resource_id
+        self.url = url
+        self.digest = digest
+        self.saved_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"id": self.id, "url": self.url}
+
+    def __repr__(self) -> str:
+        return f"CachedResource({self.kind}, {self.key}, id={self.id})"
+
+
+class ResourceCache:
+    """
+    Ids and urls of CloudTruth resources, indexed by name and by id.
+
+    At most max_entries resources are kept; the least recently used are
+    evicted first. The cache also remembers which listings have been read to
+    the end, so a name missing from a complete listing is known not to exist.
+    Removing a resource forgets every listing that contained it.
+
+    Lookups and updates are thread safe. Hold `lock` to combine several.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self.lock = threading.RLock()
+        # kept in least recently used order
+        self.entries: OrderedDict[Tuple[str, Key], CachedResource] = OrderedDict()
+        self.ids: Dict[Tuple[str, str], CachedResource] = {}
+        self.projects: Dict[str, Set[Tuple[str, Key]]] = {}
+        self.complete_listings: Set[Key] = set()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, kind: str, *key: str) -> Optional[CachedResource]:
+        with self.lock:
+            resource = self.entries.get((kind, key))
+            if resource is not None:
+                self.entries.move_to_end((kind, key))
+            return resource
+
+    def get_by_id(self, kind: str, resource_id: str) -> Optional[CachedResource]:
+        with self.lock:
+            return self.ids.get((kind, resource_id))
+
+    def resources(self, kind: str) -> List[CachedResource]:
+        with self.lock:
+            return [
+                resource
+                for (entry_kind, _), resource in self.entries.items()
+                if entry_kind == kind
+            ]
+
+    def put(
+        self,
+        kind: str,
+        key: Iterable[str],
+        resource_id: str,
+        url: str,
+        digest: Optional[str] = None,
+    ) -> CachedResource:
+        key = tuple(key)
+        with self.lock:
+            if (resource := self.entries.get((kind, key))) is not None:
+                self.ids.pop((kind, resource.id), None)
+                resource.id = resource_id
+                resource.url = url
+                resource.digest = digest
+                resource.saved_at = None
+                self.entries.move_to_end((kind, key))
+            else:
+                resource = CachedResource(kind, key, resource_id, url, digest)
+                self.entries[(kind, key)] = resource
+                if kind in PROJECT_KINDS:
+                    self.projects.setdefault(key[0], set()).add((kind, key))
+                while len(self.entries) > self.max_entries:
+                    self._remove(next(iter(self.entries)))
+                    self.evictions += 1
+            self.ids[(kind, resource_id)] = resource
+            return resource
+
+    def _remove(self, entry: Tuple[str, Key]) -> None:
+        kind, key = entry
+        resource = self.entries.pop(entry)
+        self.ids.pop((kind, resource.id), None)
+        if kind in PROJECT_KINDS:
+            project_entries = self.projects.get(key[0], set())
+            project_entries.discard(entry)
+            if not project_entries:
+                self.projects.pop(key[0], None)
+        for length in range(len(key) + 1):
+            self.complete_listings.discard((kind, *key[:length]))
+
+    def mark_complete(self, kind: str, *scope: str) -> None:
+        with self.lock:
+            self.complete_listings.add((kind, *scope))
+
+    def is_complete(self, kind: str, *scope: str) -> bool:
+        """
+        Whether the listing of kind within scope, or a wider listing that
+        includes it, has been read to the end.
+        """
+        with self.lock:
+            return any(
+                (kind, *scope[:length]) in self.complete_listings
+                for length in range(len(scope) + 1)
+            )
+
+    def forget_project(
+        self, project_name: str, kinds: Iterable[str] = PROJECT_KINDS
+    ) -> None:
+        kinds = tuple(kinds)
+        with self.lock:
+            for entry in list(self.projects.get(project_name, ())):
+                if entry[0] in kinds:
+                    self._remove(entry)
+            self.complete_listings -= {
+                listing
+                for listing in self.complete_listings
+                if listing[0] in kinds
+                and len(listing) > 1
+                and listing[1] == project_name
+            }
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.ids.clear()
+            self.projects.clear()
+            self.complete_listings.clear()
+
+    def export(self, kinds: Iterable[str]) -> Dict[str, List[List[Any]]]:
+        """
+        Resources of the given kinds as JSON friendly rows of key, id, url and
+        saved_at.
+        """
+        kinds = tuple(kinds)
+        exported: Dict[str, List[List[Any]]] = {kind: [] for kind in kinds}
+        with self.lock:
+            for (kind, key), resource in self.entries.items():
+                if kind in exported:
+                    exported[kind].append(
+                        [*key, resource.id, resource.url, resource.saved_at]
+                    )
+        return exported
+
+    def load(self, exported: Dict[str, List[List[Any]]]) -> None:
+        for kind, rows in exported.items():
+            for *key, resource_id, url, saved_at in rows:
+                self.put(kind, key, resource_id, url).saved_at = saved_at
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any
+from typing import Set
+
+JOURNAL_SUFFIX = ".journal"
+
+
+def journal_path(data_file: str) -> str:
+    return f"{data_file}{JOURNAL_SUFFIX}"
+
+
+class UploadJournal:
+    """
+    An append-only record of completed parameter, value and template uploads,
+    one JSON object per line. Each entry carries a digest of what was sent, so
+    an entry whose data changed since it was recorded is uploaded again.
+
+    A torn last line from a crash is ignored when the journal is loaded.
+    """
+
+    def __init__(self, path: str, resume: bool = False) -> None:
+        self.path = path
+        # reentrant, so the SIGINT handler can flush while record() writes
+        self.lock = threading.RLock()
+        self.completed: Set[str] = self._load() if resume else set()
+        self.fp = open(path, "a" if resume else "w")
+
+    def _load(self) -> Set[str]:
+        completed = set()
+        try:
+            with open(self.path, "r") as fp:
+                for line in fp:
+                    try:
+                        completed.add(self._key(**json.loads(line)))
+                    except (TypeError, ValueError):
+                        continue
+        except FileNotFoundError:
+            pass
+        return completed
+
+    @staticmethod
+    def _key(kind: str, project: str, name: str, environment: str, digest: str) -> str:
+        return "\0".join((kind, project, name, environment, digest))
+
+    @staticmethod
+    def _digest(payload: Any) -> str:
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()[:16]
+
+    def is_done(
+        self,
+        kind: str,
+        project: str,
+        name: str,
+        environment: str = "",
+        payload: Any = None,
+    ) -> bool:
+        key = self._key(kind, project, name, environment, self._digest(payload))
+        return key in self.completed
+
+    def record(
+        self,
+        kind: str,
+        project: str,
+        name: str,
+        environment: str = "",
+        payload: Any = None,
+    ) -> None:
+        entry = {
+            "kind": kind,
+            "project": project,
+            "name": name,
+            "environment": environment,
+            "digest": self._digest(payload),
+        }
+        with self.lock:
+            self.completed.add(self._key(**entry))
+            self.fp.write(json.dumps(entry) + "\n")
+            self.fp.flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            if not self.fp.closed:
+                self.fp.flush()
+                os.fsync(self.fp.fileno())
+
+    def close(self) -> None:
+        self.flush()
+        with self.lock:
+            self.fp.close()
+
+    def discard(self) -> None:
+        """
+        Close and delete the journal once every upload has completed.
+        """
+        self.close()
+        os.remove(self.path)
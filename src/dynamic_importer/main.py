@@ -7,14 +7,34 @@ from __future__ import annotations
 
 import json
 import os
+import signal
 from collections import defaultdict
+from concurrent.futures import as_completed
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
 from time import time
 from typing import Dict
+from typing import List
+from typing import Optional
 
 import click
 import urllib3
 from dynamic_importer.api.client import CTClient
+from dynamic_importer.api.client import DEFAULT_CONNECT_TIMEOUT
+from dynamic_importer.api.client import DEFAULT_MAX_RETRIES
+from dynamic_importer.api.client import DEFAULT_POOL_SIZE
+from dynamic_importer.api.client import DEFAULT_READ_TIMEOUT
+from dynamic_importer.api.disk_cache import DEFAULT_CACHE_TTL
+from dynamic_importer.api.exceptions import ResourceNotFoundError
+from dynamic_importer.api.metrics import ClientMetrics
 from dynamic_importer.api.types import coerce_types
+from dynamic_importer.journal import journal_path
+from dynamic_importer.journal import UploadJournal
+from dynamic_importer.plan import apply_plan
+from dynamic_importer.plan import build_plan
+from dynamic_importer.plan import empty_snapshot
+from dynamic_importer.plan import format_plan
+from dynamic_importer.plan import summarize_plan
 from dynamic_importer.processors import BaseProcessor
 from dynamic_importer.processors import get_processor_class
 from dynamic_importer.processors import get_supported_formats
@@ -22,6 +42,7 @@ from dynamic_importer.util import validate_env_values
 from dynamic_importer.walker import walk_files
 
 CREATE_DATA_MSG_INTERVAL = 20
+DEFAULT_BATCH_SIZE = 500
 DIRS_TO_IGNORE = [
     ".git",
     ".github",
@@ -35,6 +56,120 @@ DIRS_TO_IGNORE = [
 ]
 
 
+def client_options(func):
+    """
+    Options controlling the HTTP transport used to talk to the CloudTruth API.
+    """
+    options = [
+        click.option(
+            "--pool-size",
+            help="Number of keep-alive connections to hold open to the CloudTruth API",
+            type=click.IntRange(min=1),
+            default=DEFAULT_POOL_SIZE,
+            show_default=True,
+        ),
+        click.option(
+            "--connect-timeout",
+            help="Seconds to wait for a connection to the CloudTruth API",
+            type=click.FloatRange(min=0, min_open=True),
+            default=DEFAULT_CONNECT_TIMEOUT,
+            show_default=True,
+        ),
+        click.option(
+            "--read-timeout",
+            help="Seconds to wait for a response from the CloudTruth API",
+            type=click.FloatRange(min=0, min_open=True),
+            default=DEFAULT_READ_TIMEOUT,
+            show_default=True,
+        ),
+        click.option(
+            "--retries",
+            help="Number of times to retry failed connections and idempotent requests",
+            type=click.IntRange(min=0),
+            default=DEFAULT_MAX_RETRIES,
+            show_default=True,
+        ),
+        click.option(
+            "--rate-limit",
+            help="Maximum requests per second to send to the CloudTruth API. "
+            + "Unlimited by default",
+            type=click.FloatRange(min=0, min_open=True),
+            default=None,
+        ),
+        click.option(
+            "-j",
+            "--jobs",
+            help="Number of parameters and values to upload concurrently",
+            type=click.IntRange(min=1),
+            default=1,
+            show_default=True,
+        ),
+        click.option(
+            "--bulk",
+            help="Upload parameters and values through the CloudTruth bulk import endpoint",
+            is_flag=True,
+        ),
+        click.option(
+            "--batch-size",
+            help="Number of parameters to send in each bulk import request",
+            type=click.IntRange(min=1),
+            default=DEFAULT_BATCH_SIZE,
+            show_default=True,
+        ),
+        click.option(
+            "--diff",
+            help="Compare against CloudTruth first and only send changed "
+            + "parameters, values and templates",
+            is_flag=True,
+        ),
+        click.option(
+            "--cache-file",
+            help="Path to a file that keeps CloudTruth resource ids between runs",
+            default=None,
+            required=False,
+        ),
+        click.option(
+            "--cache-ttl",
+            help="Seconds before entries in --cache-file are considered stale",
+            type=click.IntRange(min=0),
+            default=DEFAULT_CACHE_TTL,
+            show_default=True,
+        ),
+        click.option(
+            "--metrics-file",
+            help="Write per-endpoint request and cache metrics to this file. Files "
+            + "ending in .prom or .txt use the Prometheus text format, others JSON",
+            default=None,
+            required=False,
+        ),
+    ]
+    for option in reversed(options):
+        func = option(func)
+    return func
+
+
+def _get_client_options(
+    pool_size: int,
+    connect_timeout: float,
+    read_timeout: float,
+    retries: int,
+    cache_file: Optional[str] = None,
+    cache_ttl: int = DEFAULT_CACHE_TTL,
+    rate_limit: Optional[float] = None,
+    metrics: Optional[ClientMetrics] = None,
+) -> Dict:
+    return {
+        "pool_size": pool_size,
+        "connect_timeout": connect_timeout,
+        "read_timeout": read_timeout,
+        "max_retries": retries,
+        "cache_file": cache_file,
+        "cache_ttl": cache_ttl,
+        "rate_limit": rate_limit,
+        "metrics": metrics,
+    }
+
+
 @click.group()
 def import_config():
     pass
@@ -102,6 +237,11 @@ def process_configs(
         input_files, should_parse_description=parse_descriptions
     )
     template, config_data = processor.process()
+    if processor.missing_values:
+        click.echo(
+            f"{len(processor.missing_values)} parameters have no value "
+            "in some environments"
+        )
 
     template_out_file = f"{output_dir}/{project}-{file_type}.cttemplate"
     config_out_file = f"{output_dir}/{project}-{file_type}.ctconfig"
@@ -195,16 +335,100 @@ def regenerate_template(default_values, env_values, file_type, data_file):
 @click.option("-k", help="Ignore SSL certificate verification", is_flag=True)
 @click.option("-c", help="Create missing projects and enviroments", is_flag=True)
 @click.option("-u", help="Upsert values", is_flag=True)
-def create_data(data_file, template_file, k, c, u):
+@click.option(
+    "--resume",
+    help="Skip uploads recorded as completed in the journal kept next to the "
+    + "data file by an earlier, interrupted run",
+    is_flag=True,
+)
+@client_options
+def create_data(
+    data_file,
+    template_file,
+    k,
+    c,
+    u,
+    resume,
+    pool_size,
+    connect_timeout,
+    read_timeout,
+    retries,
+    rate_limit,
+    jobs,
+    bulk,
+    batch_size,
+    diff,
+    cache_file,
+    cache_ttl,
+    metrics_file,
+):
+    if resume and diff:
+        # --diff compares against the remote project and skips nothing by journal
+        raise click.UsageError("--resume can not be combined with --diff")
+    metrics = ClientMetrics() if metrics_file else None
+    client_options = _get_client_options(
+        pool_size,
+        connect_timeout,
+        read_timeout,
+        retries,
+        cache_file,
+        cache_ttl,
+        rate_limit,
+        metrics,
+    )
     with open(data_file, "r") as dfp, open(template_file, "r") as tfp:
         project_config_data = json.load(dfp)
         template_data = tfp.read()
-    for project, config_data in project_config_data.items():
-        _create_data(config_data, str(template_file), template_data, project, k, c, u)
-
+    journal = UploadJournal(journal_path(data_file), resume=resume)
+    if journal.completed:
+        click.echo(f"Resuming: skipping {len(journal.completed)} completed uploads")
+    previous_handler = signal.signal(
+        signal.SIGINT, _flush_journal_on_interrupt(journal)
+    )
+    try:
+        for project, config_data in project_config_data.items():
+            _create_data(
+                config_data,
+                str(template_file),
+                template_data,
+                project,
+                k,
+                c,
+                u,
+                client_options=client_options,
+                jobs=jobs,
+                batch_size=batch_size if bulk else None,
+                diff=diff,
+                journal=journal,
+            )
+    except BaseException:
+        if journal.completed:
+            journal.close()
+        else:
+            journal.discard()
+        raise
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+    journal.discard()
+
+    if metrics:
+        metrics.write(metrics_file)
     click.echo("Data upload to CloudTruth complete!")
 
 
+def _flush_journal_on_interrupt(journal: UploadJournal):
+    def handler(signum, frame):
+        journal.flush()
+        click.echo(
+            f"\nInterrupted. Progress is saved in {journal.path}, "
+            + "rerun with --resume to continue.",
+            err=True,
+        )
+        raise KeyboardInterrupt
+
+    return handler
+
+
 def _create_data(
     config_data: Dict,
     template_name: str,
@@ -213,7 +437,66 @@ def _create_data(
     k: bool,
     c: bool,
     u: bool,
+    client_options: Optional[Dict] = None,
+    jobs: int = 1,
+    batch_size: Optional[int] = None,
+    diff: bool = False,
+    journal: Optional[UploadJournal] = None,
 ):
+    client = _build_client(k, client_options, jobs)
+
+    if "/" in project:
+        parent_project, project = project.split("/", 1)
+        client.upsert_project(project, parent=parent_project, create_dependencies=c)
+
+    total_params = len(config_data.values())
+    client.metrics.parameters += total_params
+    click.echo(f"Creating {total_params} parameters")
+    if diff:
+        snapshot = _get_snapshot(client, project)
+        _ensure_project_and_environments(client, config_data, project, c)
+        actions = build_plan(config_data, snapshot, template_name, template_data)
+        click.echo(summarize_plan(actions))
+        apply_plan(client, project, actions, create_dependencies=c, jobs=jobs)
+        client.close()
+        return
+
+    if batch_size:
+        _upload_parameters_bulk(client, config_data, project, c, batch_size, journal)
+    else:
+        try:
+            # load existing parameters and values up front so upserts skip lookups
+            client.prefetch_project(project)
+        except ResourceNotFoundError:
+            # the project is created by the first upsert when -c is given
+            pass
+        if jobs > 1:
+            _upload_parameters_concurrently(
+                client, config_data, project, c, jobs, journal
+            )
+        else:
+            _upload_parameters(client, config_data, project, c, journal)
+    if journal and journal.is_done(
+        "template", project, template_name, "", template_data
+    ):
+        click.echo(f"Skipping uploaded template: {template_name}")
+    elif client.template_unchanged(project, template_name, template_data):
+        template_size = len(template_data.encode())
+        client.metrics.record_skipped_upload("templates", template_size)
+        click.echo(
+            f"Skipping unchanged template: {template_name} ({template_size} bytes saved)"
+        )
+    else:
+        click.echo(f"Uploading template: {template_name}")
+        client.upsert_template(project, name=template_name, body=template_data)
+        if journal:
+            journal.record("template", project, template_name, "", template_data)
+    client.close()
+
+
+def _build_client(
+    k: bool, client_options: Optional[Dict] = None, jobs: int = 1
+) -> CTClient:
     api_key = os.environ.get("CLOUDTRUTH_API_KEY")
     if not api_key:
         raise click.UsageError(
@@ -222,41 +505,260 @@ def _create_data(
         )
     if k:
         urllib3.disable_warnings()
-    client = CTClient(api_key, skip_ssl_validation=k)
+    client_options = dict(client_options or {})
+    # every worker needs its own pooled connection to avoid blocking on the pool
+    client_options["pool_size"] = max(
+        client_options.get("pool_size", DEFAULT_POOL_SIZE), jobs
+    )
+    return CTClient(api_key, skip_ssl_validation=k, **client_options)
 
-    if "/" in project:
-        parent_project, project = project.split("/", 1)
-        client.upsert_project(project, parent=parent_project, create_dependencies=c)
 
+def _get_snapshot(client: CTClient, project: str) -> Dict:
+    try:
+        # secret values are compared with the local ones to build the plan
+        return client.prefetch_project(project, unmask_secrets=True)
+    except ResourceNotFoundError:
+        # nothing exists remotely yet, so everything will be created
+        return empty_snapshot()
+
+
+def _ensure_project_and_environments(
+    client: CTClient, config_data: Dict, project: str, c: bool
+):
+    """
+    Resolve the project and every environment that receives a value, creating
+    them when -c is given, so later uploads never race to create them.
+    """
+    client.upsert_project(project, create_dependencies=c)
+    environments = {
+        env
+        for param_data in config_data.values()
+        for env, value in param_data["values"].items()
+        if value
+    }
+    for env in sorted(environments):
+        try:
+            client.get_environment_id(env)
+        except ResourceNotFoundError:
+            if not c:
+                raise
+            client.create_environment(env)
+
+
+def _parameter_payload(param_data: Dict) -> Dict:
+    return {"type": coerce_types(param_data["type"]), "secret": param_data["secret"]}
+
+
+def _upsert_parameter(
+    client: CTClient,
+    project: str,
+    param_data: Dict,
+    c: bool,
+    journal: Optional[UploadJournal] = None,
+):
+    name = param_data["param_name"]
+    payload = _parameter_payload(param_data)
+    if journal and journal.is_done("parameter", project, name, "", payload):
+        return
+    client.upsert_parameter(
+        project,
+        name=name,
+        type_name=payload["type"],
+        secret=payload["secret"],
+        create_dependencies=c,
+    )
+    if journal:
+        journal.record("parameter", project, name, "", payload)
+
+
+def _upsert_value(
+    client: CTClient,
+    project: str,
+    name: str,
+    env: str,
+    value,
+    c: bool,
+    journal: Optional[UploadJournal] = None,
+):
+    if journal and journal.is_done("value", project, name, env, value):
+        return
+    client.upsert_value(project, name, env, value, create_dependencies=c)
+    if journal:
+        journal.record("value", project, name, env, value)
+
+
+def _upload_parameters(
+    client: CTClient,
+    config_data: Dict,
+    project: str,
+    c: bool,
+    journal: Optional[UploadJournal] = None,
+):
     total_params = len(config_data.values())
-    click.echo(f"Creating {total_params} parameters")
     start_time = time()
     i = 0
     for _, config_data in config_data.items():
         i += 1
-        type_name = coerce_types(config_data["type"])
-        client.upsert_parameter(
-            project,
-            name=config_data["param_name"],
-            type_name=type_name,
-            secret=config_data["secret"],
-            create_dependencies=c,
-        )
+        _upsert_parameter(client, project, config_data, c, journal)
         for env, value in config_data["values"].items():
             if value:
-                client.upsert_value(
-                    project,
-                    config_data["param_name"],
-                    env,
-                    value,
-                    create_dependencies=c,
+                _upsert_value(
+                    client, project, config_data["param_name"], env, value, c, journal
                 )
         cur_time = time()
         if cur_time - start_time > CREATE_DATA_MSG_INTERVAL:
             click.echo(f"Created {i} parameters, {total_params - i} remaining")
             start_time = time()
-    click.echo(f"Uploading template: {template_name}")
-    client.upsert_template(project, name=template_name, body=template_data)
+
+
+def _upload_parameters_concurrently(
+    client: CTClient,
+    config_data: Dict,
+    project: str,
+    c: bool,
+    jobs: int,
+    journal: Optional[UploadJournal] = None,
+):
+    """
+    Upload parameters and their values using a bounded pool of workers.
+
+    The project and environments are resolved up front so that workers never
+    race to create them. Each parameter's values are only queued once the
+    upsert of that parameter has completed.
+    """
+    _ensure_project_and_environments(client, config_data, project, c)
+
+    total_params = len(config_data.values())
+    start_time = time()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        try:
+            parameter_futures = {
+                executor.submit(
+                    _upsert_parameter, client, project, param_data, c, journal
+                ): param_data
+                for param_data in config_data.values()
+            }
+            value_futures: List[Future] = []
+            for i, future in enumerate(as_completed(parameter_futures), start=1):
+                future.result()
+                param_data = parameter_futures[future]
+                for env, value in param_data["values"].items():
+                    if value:
+                        value_futures.append(
+                            executor.submit(
+                                _upsert_value,
+                                client,
+                                project,
+                                param_data["param_name"],
+                                env,
+                                value,
+                                c,
+                                journal,
+                            )
+                        )
+                cur_time = time()
+                if cur_time - start_time > CREATE_DATA_MSG_INTERVAL:
+                    click.echo(f"Created {i} parameters, {total_params - i} remaining")
+                    start_time = time()
+            for future in as_completed(value_futures):
+                future.result()
+        except BaseException:
+            # also on KeyboardInterrupt, so queued uploads are dropped
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+
+def _upload_parameters_bulk(
+    client: CTClient,
+    config_data: Dict,
+    project: str,
+    c: bool,
+    batch_size: int,
+    journal: Optional[UploadJournal] = None,
+):
+    """
+    Upload parameters and values with one bulk import request per environment
+    and batch of at most batch_size parameters.
+    """
+    parameters_by_env = defaultdict(list)
+    # the values as they appear in config_data, for the journal
+    raw_values_by_env = defaultdict(list)
+    for param_data in config_data.values():
+        has_values = False
+        for env, value in param_data["values"].items():
+            if value:
+                has_values = True
+                if journal and journal.is_done(
+                    "value", project, param_data["param_name"], env, value
+                ):
+                    continue
+                parameters_by_env[env].append(
+                    {
+                        "name": param_data["param_name"],
+                        "value": (
+                            str(value).lower() if isinstance(value, bool) else value
+                        ),
+                        "type": coerce_types(param_data["type"]),
+                        "secret": param_data["secret"],
+                    }
+                )
+                raw_values_by_env[env].append(value)
+        if not has_values:
+            # the import endpoint only knows about parameters that carry a value
+            _upsert_parameter(client, project, param_data, c, journal)
+
+    # import default values first so other environments inherit the right types
+    environments = sorted(parameters_by_env, key=lambda env: env != "default")
+    for env in environments:
+        parameters = parameters_by_env[env]
+        for start in range(0, len(parameters), batch_size):
+            end = min(start + batch_size, len(parameters))
+            client.import_parameters(
+                project, env, parameters[start:end], create_dependencies=c
+            )
+            if journal:
+                for parameter, value in zip(
+                    parameters[start:end], raw_values_by_env[env][start:end]
+                ):
+                    journal.record("value", project, parameter["name"], env, value)
+            click.echo(f"Imported {end} of {len(parameters)} {env} values")
+
+
+@import_config.command()
+@click.option(
+    "-d",
+    "--data-file",
+    help="Full path to config data file generated from process_configs command",
+    required=True,
+)
+@click.option(
+    "-m",
+    "--template-file",
+    help="Full path to template file generated from process_configs command",
+    required=True,
+)
+@click.option("-k", help="Ignore SSL certificate verification", is_flag=True)
+@click.option(
+    "--show-unchanged",
+    help="Also list parameters, values and templates that are already up to date",
+    is_flag=True,
+)
+def plan(data_file, template_file, k, show_unchanged):
+    """
+    Compares config data and a template against CloudTruth and prints what
+    create-data --diff would create, update or leave unchanged.
+    """
+    with open(data_file, "r") as dfp, open(template_file, "r") as tfp:
+        project_config_data = json.load(dfp)
+        template_data = tfp.read()
+    client = _build_client(k)
+    for project, config_data in project_config_data.items():
+        project = project.split("/", 1)[-1]
+        snapshot = _get_snapshot(client, project)
+        actions = build_plan(config_data, snapshot, str(template_file), template_data)
+        click.echo(f"Project {project}:")
+        click.echo(format_plan(actions, show_unchanged=show_unchanged))
+    client.close()
 
 
 @import_config.command()
@@ -292,8 +794,28 @@ def _create_data(
 @click.option("-k", help="Ignore SSL certificate verification", is_flag=True)
 @click.option("-c", help="Create missing projects and enviroments", is_flag=True)
 @click.option("-u", help="Upsert values", is_flag=True)
+@client_options
 def walk_directories(
-    config_dirs, file_types, exclude_dirs, create_hierarchy, parse_descriptions, k, c, u
+    config_dirs,
+    file_types,
+    exclude_dirs,
+    create_hierarchy,
+    parse_descriptions,
+    k,
+    c,
+    u,
+    pool_size,
+    connect_timeout,
+    read_timeout,
+    retries,
+    rate_limit,
+    jobs,
+    bulk,
+    batch_size,
+    diff,
+    cache_file,
+    cache_ttl,
+    metrics_file,
 ):
     """
     Walks a directory, constructs templates and config data, and uploads to CloudTruth.
@@ -347,12 +869,36 @@ def walk_directories(
                 "config_data": config_data,
             }
 
+    metrics = ClientMetrics() if metrics_file else None
     for project, ct_data in processed_data.items():
         click.echo(f"Uploading data for {project}")
         for template_name, template_data in ct_data.items():
             template_body = template_data["template_body"]
             config_data = template_data["config_data"]
-            _create_data(config_data, template_name, template_body, project, k, c, u)
+            _create_data(
+                config_data,
+                template_name,
+                template_body,
+                project,
+                k,
+                c,
+                u,
+                client_options=_get_client_options(
+                    pool_size,
+                    connect_timeout,
+                    read_timeout,
+                    retries,
+                    cache_file,
+                    cache_ttl,
+                    rate_limit,
+                    metrics,
+                ),
+                jobs=jobs,
+                batch_size=batch_size if bulk else None,
+                diff=diff,
+            )
+    if metrics:
+        metrics.write(metrics_file)
     click.echo("Data upload to CloudTruth complete!")
 
 
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from dynamic_importer.api.client import CTClient
+from dynamic_importer.api.types import coerce_types
+
+CREATE = "create"
+UPDATE = "update"
+SKIP = "skip"
+ACTION_SYMBOLS = {CREATE: "+", UPDATE: "~", SKIP: "="}
+
+
+@dataclass
+class PlanAction:
+    """
+    One create, update or skip decision for a parameter, value or template.
+    `remote` holds the id/url and current state of the existing resource, and
+    is empty when the resource does not exist yet.
+    """
+
+    action: str
+    kind: str
+    name: str
+    environment: str = ""
+    desired: Dict[str, Any] = field(default_factory=dict)
+    remote: Dict[str, Any] = field(default_factory=dict)
+
+    def describe(self) -> str:
+        target = f"{self.kind} {self.name}"
+        if self.environment:
+            target = f"{target} ({self.environment})"
+        return f"{ACTION_SYMBOLS[self.action]} {self.action} {target}"
+
+
+def normalize_value(value: Any) -> str:
+    """
+    Render a .ctconfig value the way CloudTruth stores it as an internal value.
+    """
+    return str(value).lower() if isinstance(value, bool) else str(value)
+
+
+def empty_snapshot() -> Dict[str, Dict]:
+    return {"parameters": {}, "templates": {}}
+
+
+def build_plan(
+    config_data: Dict,
+    snapshot: Dict,
+    template_name: Optional[str] = None,
+    template_body: Optional[str] = None,
+) -> List[PlanAction]:
+    """
+    Compare .ctconfig data for one project against a snapshot from
+    CTClient.get_project_snapshot and decide what each resource needs.
+
+    Parameter descriptions are not managed by uploads, so only the type is
+    compared. Falsy values are not uploaded, matching create_data.
+    """
+    actions = []
+    remote_parameters = snapshot["parameters"]
+    for param_data in config_data.values():
+        name = param_data["param_name"]
+        type_name = coerce_types(param_data["type"])
+        remote = remote_parameters.get(name)
+        desired = {"type": type_name, "secret": param_data["secret"]}
+        if remote is None:
+            action = CREATE
+        elif remote["type"] != type_name:
+            action = UPDATE
+        else:
+            action = SKIP
+        actions.append(PlanAction(action, "parameter", name, "", desired, remote or {}))
+
+        remote_values = remote["values"] if remote else {}
+        for env, value in param_data["values"].items():
+            if not value:
+                continue
+            remote_value = remote_values.get(env)
+            if remote_value is None:
+                action = CREATE
+            elif remote_value["internal_value"] != normalize_value(value):
+                action = UPDATE
+            else:
+                action = SKIP
+            actions.append(
+                PlanAction(
+                    action, "value", name, env, {"value": value}, remote_value or {}
+                )
+            )
+
+    if template_name is not None:
+        remote_template = snapshot["templates"].get(template_name)
+        if remote_template is None:
+            action = CREATE
+        elif remote_template["body"] != template_body:
+            action = UPDATE
+        else:
+            action = SKIP
+        actions.append(
+            PlanAction(
+                action,
+                "template",
+                template_name,
+                "",
+                {"body": template_body},
+                remote_template or {},
+            )
+        )
+    return actions
+
+
+def summarize_plan(actions: List[PlanAction]) -> str:
+    counts = Counter(action.action for action in actions)
+    return (
+        f"Plan: {counts[CREATE]} to create, {counts[UPDATE]} to update, "
+        f"{counts[SKIP]} unchanged"
+    )
+
+
+def format_plan(actions: List[PlanAction], show_unchanged: bool = False) -> str:
+    lines = [
+        action.describe()
+        for action in actions
+        if show_unchanged or action.action != SKIP
+    ]
+    lines.append(summarize_plan(actions))
+    return "\n".join(lines)
+
+
+def _apply_action(
+    client: CTClient, project: str, action: PlanAction, create_dependencies: bool
+) -> None:
+    if action.kind == "parameter":
+        if action.action == CREATE:
+            client.create_parameter(
+                project,
+                action.name,
+                type_name=action.desired["type"],
+                secret=action.desired["secret"],
+                create_dependencies=create_dependencies,
+            )
+        else:
+            # keep the description set in CloudTruth rather than blanking it
+            client.update_parameter(
+                project,
+                action.remote["id"],
+                action.name,
+                description=action.remote.get("description") or "",
+                type_name=action.desired["type"],
+            )
+    elif action.kind == "value":
+        if action.action == CREATE:
+            client.create_value(
+                project, action.name, action.environment, action.desired["value"]
+            )
+        else:
+            client.update_value(
+                project,
+                action.name,
+                action.environment,
+                action.remote["id"],
+                action.desired["value"],
+            )
+    elif action.kind == "template":
+        if action.action == CREATE:
+            client.create_template(
+                project,
+                action.name,
+                action.desired["body"],
+                create_dependencies=create_dependencies,
+            )
+        else:
+            client.update_template(
+                project,
+                action.remote["id"],
+                action.name,
+                action.desired["body"],
+            )
+
+
+def apply_plan(
+    client: CTClient,
+    project: str,
+    actions: List[PlanAction],
+    create_dependencies: bool = False,
+    jobs: int = 1,
+) -> None:
+    """
+    Send only the calls a plan needs. Parameters are applied before values so
+    that every value is written after its parameter exists, and the template
+    goes last.
+    """
+    for kind in ("parameter", "value", "template"):
+        pending = [a for a in actions if a.kind == kind and a.action != SKIP]
+        if jobs > 1 and len(pending) > 1:
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                list(
+                    executor.map(
+                        lambda a: _apply_action(
+                            client, project, a, create_dependencies
+                        ),
+                        pending,
+                    )
+                )
+        else:
+            for action in pending:
+                _apply_action(client, project, action, create_dependencies)
@@ -9,7 +9,6 @@ import importlib
 import os
 import pkgutil
 import re
-from copy import deepcopy
 from typing import Any
 from typing import Dict
 from typing import List
@@ -19,6 +18,8 @@ from typing import Union
 
 RE_WORDS = "(pas+wo?r?d|pass(phrase)?|pwd|token|secrete?|api(\\W|_)?key)"
 RE_CANDIDATES = re.compile("(^{0}$|_{0}_|^{0}_|_{0}$)".format(RE_WORDS), re.IGNORECASE)
+# turns "[a][b]" paths into "_a_b", to be stripped of the leading "_"
+PARAM_NAME_TABLE = str.maketrans({"[": "_", "]": None, "'": None})
 
 
 def get_processor_class(file_type: str) -> BaseProcessor:
@@ -40,16 +41,89 @@ def get_processor_class(file_type: str) -> BaseProcessor:
 def get_supported_formats() -> List[str]:
     for module_loader, name, ispkg in pkgutil.iter_modules([os.path.dirname(__file__)]):
         importlib.import_module("." + name, __package__)
-    return [
+    # sorted, so the order does not depend on which processors were imported first
+    return sorted(
         c.__name__.removesuffix("Processor").lower()
         for c in BaseProcessor.__subclasses__()
-    ]
+    )
+
+
+MISSING = object()
+
+
+def _child(container: Union[List, Dict], key: Any) -> Any:
+    if isinstance(container, list):
+        return container[key] if key < len(container) else MISSING
+    return container.get(key, MISSING)
+
+
+def _add_child(container: Union[List, Dict], key: Any, value: Any) -> bool:
+    if isinstance(container, list):
+        if key != len(container):
+            return False
+        container.append(value)
+    else:
+        container[key] = value
+    return True
+
+
+def _overlay_container(target: Any, key: Any, node: Union[List, Dict]) -> Any:
+    """
+    The container in target at key that mirrors node, added empty if target
+    has nothing there. None if target holds something else at key.
+    """
+    if target is None:
+        return None
+    existing = _child(target, key)
+    if existing is MISSING:
+        existing = type(node)()
+        return existing if _add_child(target, key, existing) else None
+    if isinstance(node, list):
+        return existing if isinstance(existing, list) else None
+    return existing if isinstance(existing, dict) else None
+
+
+class ConfigPath:
+    """
+    The location of a node in config data: its "[a][b]" text, its key, and
+    the parameter name of its parent. A container's text and name are built
+    once and shared by all its children, so each child's text is a single
+    concatenation onto its parent's.
+
+    The parameter name of a location is built when first asked for, and kept.
+    """
+
+    __slots__ = ("text", "name_prefix", "key", "_name")
+
+    def __init__(self, text: str = "", key: Any = None, name_prefix: str = "") -> None:
+        self.text = text
+        self.name_prefix = name_prefix
+        self.key = key
+        self._name: Optional[str] = None
+        if key is None:
+            self._name = text.translate(PARAM_NAME_TABLE).lstrip("_")
+
+    def child(self, key: Any) -> ConfigPath:
+        return ConfigPath(f"{self.text}[{key}]", key, self.param_name)
+
+    @property
+    def param_name(self) -> str:
+        if self._name is None:
+            key = str(self.key).translate(PARAM_NAME_TABLE)
+            self._name = (
+                f"{self.name_prefix}_{key}" if self.name_prefix else key.lstrip("_")
+            )
+        return self._name
+
+    def __str__(self) -> str:
+        return self.text
 
 
 class BaseProcessor:
     default_values = None
     parameters = None
     parameters_and_values: Dict = {}
+    missing_values: Dict = {}
     raw_data: Dict = {}
     should_parse_description = False
     template: Dict = {}
@@ -79,7 +153,9 @@ class BaseProcessor:
         return "string"
 
     def path_to_param_name(self, path):
-        return path.replace("[", "_").replace("]", "").replace("'", "").lstrip("_")
+        if isinstance(path, ConfigPath):
+            return path.param_name
+        return path.translate(PARAM_NAME_TABLE).lstrip("_")
 
     def process(
         self, hints: Optional[Dict] = None
@@ -88,20 +164,18 @@ class BaseProcessor:
         return self.template, self.parameters_and_values
 
     def extract_parameters_and_values(self, hints: Optional[Dict] = None) -> None:
-        self.template = deepcopy(self.raw_data["default"])
-        for env, data in self.raw_data.items():
-            template, environment_values = self._traverse_data(
-                "", data, env, hints=hints
-            )
-            self.template.update(template)
-
-            for path, config_data in environment_values.items():
-                if path not in self.parameters_and_values.keys():
-                    self.parameters_and_values[path] = config_data
-                else:
-                    self.parameters_and_values[path]["values"].update(
-                        config_data["values"]
-                    )
+        # The default values, or the first environment's when there are none,
+        # are rewritten in place to become the template. Every environment is
+        # walked at once, so each parameter is visited a single time.
+        base_env = (
+            "default" if "default" in self.raw_data else next(iter(self.raw_data))
+        )
+        environments = {base_env: self.raw_data[base_env], **self.raw_data}
+        (
+            self.template,
+            self.parameters_and_values,
+            self.missing_values,
+        ) = self._traverse_environments("", environments, hints=hints)
 
     def encode_template_references(
         self, template: Dict, config_data: Optional[Dict]
@@ -110,6 +184,31 @@ class BaseProcessor:
             "Subclasses must implement the encode_template_references method"
         )
 
+    def unquote_references(
+        self, template_body: str, quote: str, replacements: Dict[str, str]
+    ) -> str:
+        """
+        Rewrite the quotes around template references in a single pass.
+
+        replacements maps parameter names to the quote that should surround
+        their references instead of quote, or "" to drop it. References to
+        other parameters are left alone.
+        """
+        if not replacements:
+            return template_body
+        quote = re.escape(quote)
+        pattern = re.compile(
+            rf"{quote}(\{{\{{\s+cloudtruth\.parameters\.([^{{}}]+?)\s+\}}\}}){quote}"
+        )
+
+        def replace(match: re.Match) -> str:
+            new_quote = replacements.get(match.group(2))
+            if new_quote is None:
+                return match.group(0)
+            return f"{new_quote}{match.group(1)}{new_quote}"
+
+        return pattern.sub(replace, template_body)
+
     def generate_template(self, hints: Optional[Dict] = None):
         hints = hints or self.parameters_and_values
         return self.encode_template_references(self.template, hints)
@@ -117,59 +216,192 @@ class BaseProcessor:
     def _parse_description(self, obj: Union[List, Dict], value: Any) -> Optional[str]:
         return None
 
+    def _visit(
+        self, path: ConfigPath, obj: Any, env: str, hints: Optional[Dict]
+    ) -> Optional[Tuple[Any, Optional[Dict]]]:
+        """
+        The template value and parameter data for obj, or None when obj is a
+        container whose children should be visited instead. The parameter
+        data is None when obj is not a parameter.
+        """
+        if isinstance(obj, (list, dict)):
+            return None
+
+        if not hints:
+            obj_type = self.guess_type(obj)
+            param_name = self.path_to_param_name(path)
+            value = str(obj).lower() if obj_type == "boolean" else obj
+            return f"{{{{ cloudtruth.parameters.{param_name} }}}}", {
+                "values": {env: value},
+                "param_name": param_name,
+                "type": obj_type,
+                "secret": self.is_param_secret(param_name),
+            }
+
+        if existing_data := hints.get(str(path)):
+            param_name = existing_data["param_name"]
+            return f"{{{{ cloudtruth.parameters.{param_name} }}}}", existing_data
+
+        return obj, None
+
+    def _leaf_value(self, path: ConfigPath, obj: Any, hints: Optional[Dict]) -> Any:
+        """
+        The value an environment holds for the parameter at path, or MISSING
+        when obj is a container whose children should be visited instead.
+        Must agree with _visit on which nodes are containers.
+        """
+        if isinstance(obj, (list, dict)):
+            return MISSING
+        return str(obj).lower() if isinstance(obj, bool) else obj
+
     def _traverse_data(
         self,
         path: str,
         obj: Union[List, Dict, str],
-        env: Optional[str] = "default",
+        env: str = "default",
         hints: Optional[Dict] = None,
     ) -> Tuple[Any, Dict]:
         """
-        Traverse obj recursively and construct every path / value pair.
+        Walk the data of a single environment, replacing each parameter in obj
+        with its template reference.
+        """
+        template, params_and_values, _ = self._traverse_environments(
+            path, {env: obj}, hints=hints
+        )
+        return template, params_and_values
+
+    def _traverse_environments(
+        self,
+        path: str,
+        environments: Dict[str, Any],
+        hints: Optional[Dict] = None,
+    ) -> Tuple[Any, Dict, Dict[str, List[str]]]:
+        """
+        Walk the data of every environment together, depth first, and
+        construct one record per path holding the values of all of them.
+
+        The first environment's data is rewritten in place to become the
+        template. The others are only read: the template gains the references
+        and containers it lacks for their nodes, and keeps everything it has.
+
+        Nodes are kept on an explicit stack rather than the call stack, so
+        deeply nested documents cannot hit the recursion limit. Each path is
+        visited once for all environments, and its text is built once, from
+        the text its parent shares with its siblings. Also returns, for every
+        parameter that some environments have no value for, the names of
+        those environments.
 
         Inspired by: https://github.com/jabbalaci/JSON-path/blob/master/jsonpath.py
         """
-        params_and_values = {}
-        if isinstance(obj, list):
-            for i, subnode in enumerate(obj):
-                sub_path = path + f"[{i}]"
-                template_value, ct_data = self._traverse_data(
-                    sub_path, subnode, env, hints=hints
-                )
-                obj[i] = template_value
-
-                if sub_path in ct_data and self.should_parse_description:
-                    ct_data[sub_path]["description"] = self._parse_description(obj, i)
-                params_and_values.update(ct_data)
-            return obj, params_and_values
-        elif isinstance(obj, dict):
-            for k, v in obj.items():
-                sub_path = path + f"[{k}]"
-                template_value, ct_data = self._traverse_data(
-                    sub_path, v, env, hints=hints
-                )
-                obj[k] = template_value
-
-                if sub_path in ct_data and self.should_parse_description:
-                    ct_data[sub_path]["description"] = self._parse_description(obj, k)
-                params_and_values.update(ct_data)
-            return obj, params_and_values
-        else:
-            if not hints:
-                obj_type = self.guess_type(obj)
-                param_name = self.path_to_param_name(path)
-                value = str(obj).lower() if obj_type == "boolean" else obj
-                return f"{{{{ cloudtruth.parameters.{param_name} }}}}", {
-                    path: {
-                        "values": {env: value},
-                        "param_name": param_name,
-                        "type": obj_type,
-                        "secret": self.is_param_secret(param_name),
-                    }
-                }
-
-            if existing_data := hints.get(path):
-                param_name = existing_data["param_name"]
-                return f"{{{{ cloudtruth.parameters.{param_name} }}}}", existing_data
-
-            return obj, {}
+        env_names = list(environments)
+        base_env = env_names[0]
+        params_and_values: Dict[str, Dict] = {}
+        # each holds an environment's obj, so a scalar obj can be replaced
+        # like any other node
+        roots = {env: [obj] for env, obj in environments.items()}
+        root_path = ConfigPath(path)
+        # (key, path, [(env, parent, node)], container of the template value)
+        stack: List[Tuple[Any, ConfigPath, List[Tuple[str, Any, Any]], Any]] = [
+            (
+                0,
+                root_path,
+                [(env, root, root[0]) for env, root in roots.items()],
+                roots[base_env],
+            )
+        ]
+        while stack:
+            key, node_path, nodes, target = stack.pop()
+            leaf_seen = False
+            data: Optional[Dict] = None
+            is_list: Optional[bool] = None
+            node_target = None
+            containers: List[Tuple[str, Any]] = []
+            for env, parent, node in nodes:
+                if not leaf_seen:
+                    visited = self._visit(node_path, node, env, hints)
+                    if visited is not None:
+                        leaf_seen = True
+                        template_value, data = visited
+                        if env == base_env:
+                            parent[key] = template_value
+                        elif target is not None and _child(target, key) is MISSING:
+                            _add_child(target, key, template_value)
+                        if data is not None and (
+                            self.should_parse_description
+                            and not hints
+                            and node_path is not root_path
+                        ):
+                            data["description"] = self._parse_description(parent, key)
+                        continue
+                else:
+                    value = self._leaf_value(node_path, node, hints)
+                    if value is not MISSING:
+                        if data is not None and not hints:
+                            data["values"][env] = value
+                        continue
+
+                if is_list is None:
+                    is_list = isinstance(node, list)
+                    if env == base_env:
+                        node_target = node
+                    else:
+                        node_target = _overlay_container(target, key, node)
+                containers.append((env, node))
+
+            if data is not None:
+                text = node_path.text
+                if (existing := params_and_values.get(text)) is None:
+                    params_and_values[text] = data
+                elif existing is not data:
+                    existing["values"].update(data["values"])
+
+            if not containers:
+                continue
+            # shared by every child, rather than rebuilt from the ancestors
+            text, name = node_path.text, node_path.param_name
+            if len(containers) == 1:
+                env, node = containers[0]
+                items = enumerate(node) if isinstance(node, list) else node.items()
+                pending = [
+                    (
+                        k,
+                        ConfigPath(f"{text}[{k}]", k, name),
+                        [(env, node, v)],
+                        node_target,
+                    )
+                    for k, v in items
+                ]
+            else:
+                # children of containers shaped like the first one share its
+                # place in the template, the others have none
+                children: Dict[Any, List] = {}
+                stray_children: Dict[Any, List] = {}
+                for env, node in containers:
+                    grouped = (
+                        children
+                        if isinstance(node, list) == is_list
+                        else stray_children
+                    )
+                    items = enumerate(node) if isinstance(node, list) else node.items()
+                    for k, v in items:
+                        grouped.setdefault(k, []).append((env, node, v))
+                pending = [
+                    (k, ConfigPath(f"{text}[{k}]", k, name), child_nodes, node_target)
+                    for k, child_nodes in children.items()
+                ] + [
+                    (k, ConfigPath(f"{text}[{k}]", k, name), child_nodes, None)
+                    for k, child_nodes in stray_children.items()
+                ]
+            # reversed, so children are visited in document order
+            pending.reverse()
+            stack.extend(pending)
+
+        missing_values: Dict[str, List[str]] = {}
+        if not hints and len(env_names) > 1:
+            for text, data in params_and_values.items():
+                values = data["values"]
+                if len(values) < len(env_names):
+                    missing_values[text] = [
+                        env for env in env_names if env not in values
+                    ]
+        return roots[base_env][0], params_and_values, missing_values
@@ -6,7 +6,6 @@
 from __future__ import annotations
 
 import os
-from re import sub
 from typing import Dict
 from typing import Optional
 
@@ -20,9 +19,10 @@ class DotEnvProcessor(BaseProcessor):
         self, env_values: Dict, should_parse_description: bool = False
     ) -> None:
         self.should_parse_description = should_parse_description
-        # Due to an unknown bug, self.parameters_and_values can persist between
-        # Processor instances. Therefore, we reset it here.
+        # BaseProcessor declares these as class attributes, so they would be
+        # shared by every Processor instance. Therefore, we reset them here.
         self.parameters_and_values: Dict = {}
+        self.raw_data: Dict = {}
         for env, file_path in env_values.items():
             if not os.path.isfile(file_path):
                 raise ValueError(
@@ -36,10 +36,10 @@ class DotEnvProcessor(BaseProcessor):
         de_template = DotEnv("")
         de_template.from_dict(template)
         template_body = de_template.dumps()
+        replacements: Dict[str, str] = {}
         if config_data:
             for _, data in config_data.items():
                 if data["type"] != "string":
-                    reference = rf"(\{{\{{\s+cloudtruth.parameters.{data['param_name']}\s+\}}\}})"
-                    template_body = sub(reference, r"\1", template_body)
+                    replacements.setdefault(data["param_name"], "")
 
-        return template_body
+        return self.unquote_references(template_body, "", replacements)
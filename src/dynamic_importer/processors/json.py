@@ -6,7 +6,6 @@
 from __future__ import annotations
 
 import json
-from re import sub
 from typing import Dict
 from typing import Optional
 
@@ -18,9 +17,10 @@ class JSONProcessor(BaseProcessor):
         self, env_values: Dict, should_parse_description: bool = False
     ) -> None:
         self.should_parse_description = should_parse_description
-        # Due to an unknown bug, self.parameters_and_values can persist between
-        # Processor instances. Therefore, we reset it here.
+        # BaseProcessor declares these as class attributes, so they would be
+        # shared by every Processor instance. Therefore, we reset them here.
         self.parameters_and_values: Dict = {}
+        self.raw_data: Dict = {}
         for env, file_path in env_values.items():
             with open(file_path, "r") as fp:
                 try:
@@ -34,14 +34,14 @@ class JSONProcessor(BaseProcessor):
         self, template: Dict, config_data: Optional[Dict]
     ) -> str:
         template_body = json.dumps(template, indent=4)
+        replacements: Dict[str, str] = {}
         if config_data:
             for _, data in config_data.items():
                 try:
                     if data["type"] != "string":
-                        # JSON strings use double quotes
-                        reference = rf'"(\{{\{{\s+cloudtruth.parameters.{data["param_name"]}\s+\}}\}})"'
-                        template_body = sub(reference, r"\1", template_body)
+                        replacements.setdefault(data["param_name"], "")
                 except KeyError:
                     raise RuntimeError(f"data: {data}")
 
-        return template_body
+        # JSON strings use double quotes
+        return self.unquote_references(template_body, '"', replacements)
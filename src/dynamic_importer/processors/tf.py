@@ -6,16 +6,262 @@
 from __future__ import annotations
 
 import os
-from re import sub
+import re
 from typing import Any
 from typing import Dict
+from typing import Iterator
 from typing import List
 from typing import Optional
 from typing import Tuple
-from typing import Union
 
 import hcl2
 from dynamic_importer.processors import BaseProcessor
+from dynamic_importer.processors import ConfigPath
+from dynamic_importer.processors import MISSING
+
+RE_IDENTIFIER = re.compile(r"[A-Za-z_][\w-]*")
+RE_LABEL = re.compile(r'"((?:[^"\\]|\\.)*)"|([A-Za-z_][\w-]*)')
+RE_HEREDOC = re.compile(r"<<-?([A-Za-z_]\w*)[ \t]*\n")
+RE_PATH_PART = re.compile(r"\[([^\]]*)\]")
+
+Span = Tuple[int, int]
+
+
+def _skip_space(text: str, pos: int) -> int:
+    """
+    Skip whitespace, newlines and comments.
+    """
+    while pos < len(text):
+        if text[pos].isspace():
+            pos += 1
+        elif text.startswith("#", pos) or text.startswith("//", pos):
+            newline = text.find("\n", pos)
+            pos = len(text) if newline == -1 else newline
+        elif text.startswith("/*", pos):
+            end = text.find("*/", pos + 2)
+            pos = len(text) if end == -1 else end + 2
+        else:
+            break
+    return pos
+
+
+def _skip_string(text: str, pos: int) -> int:
+    """
+    Skip the quoted string starting at pos, including any interpolations.
+    """
+    pos += 1
+    while pos < len(text):
+        char = text[pos]
+        if char == "\\":
+            pos += 2
+        elif char == '"':
+            return pos + 1
+        elif char in "$%" and text.startswith("{", pos + 1):
+            pos = _scan(text, pos + 1, stop_at_newline=False)
+        else:
+            pos += 1
+    return pos
+
+
+def _scan(
+    text: str, pos: int, stop_at_newline: bool, stop_at_comma: bool = False
+) -> int:
+    """
+    Skip an expression. From an opening bracket, skip to just past the
+    matching closing bracket. Otherwise stop at the newline, comment, comma
+    or closing bracket that ends the expression.
+    """
+    depth = 0
+    while pos < len(text):
+        char = text[pos]
+        if char == "," and stop_at_comma and depth == 0:
+            return pos
+        elif char in "([{":
+            depth += 1
+        elif char in ")]}":
+            if depth == 0:
+                return pos
+            depth -= 1
+            if depth == 0 and not stop_at_newline:
+                return pos + 1
+        elif char == '"':
+            pos = _skip_string(text, pos)
+            continue
+        elif char == "<" and (heredoc := RE_HEREDOC.match(text, pos)):
+            terminator = re.compile(rf"^[ \t]*{heredoc.group(1)}[ \t]*$", re.M)
+            marker = terminator.search(text, heredoc.end())
+            pos = len(text) if marker is None else marker.end()
+            continue
+        elif char == "#" or text.startswith("//", pos):
+            if depth == 0:
+                return pos
+            newline = text.find("\n", pos)
+            pos = len(text) if newline == -1 else newline
+            continue
+        elif char == "\n" and depth == 0:
+            return pos
+        elif text.startswith("/*", pos):
+            end = text.find("*/", pos + 2)
+            pos = len(text) if end == -1 else end + 2
+            continue
+        pos += 1
+    return pos
+
+
+def _rstrip(text: str, start: int, end: int) -> int:
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return end
+
+
+def _block_attributes(text: str, pos: int) -> Dict[str, Span]:
+    """
+    Source spans of the attribute expressions in the block body opening at
+    pos.
+    """
+    attributes: Dict[str, Span] = {}
+    pos += 1
+    while True:
+        pos = _skip_space(text, pos)
+        if pos >= len(text) or text[pos] == "}":
+            return attributes
+        if (identifier := RE_IDENTIFIER.match(text, pos)) is None:
+            # not something we understand, so skip to the end of the line
+            pos = _scan(text, pos + 1, stop_at_newline=True)
+            continue
+        pos = _skip_space(text, identifier.end())
+        if text.startswith("=", pos) and not text.startswith("==", pos):
+            start = _skip_space(text, pos + 1)
+            end = _scan(text, start, stop_at_newline=True)
+            attributes[identifier.group(0)] = (start, _rstrip(text, start, end))
+            pos = end
+        else:
+            # a nested block such as validation, with optional labels
+            while (label := RE_LABEL.match(text, pos)) is not None:
+                pos = _skip_space(text, label.end())
+            if text.startswith("{", pos):
+                pos = _scan(text, pos, stop_at_newline=False)
+
+
+def _top_level(text: str) -> Iterator[Tuple[str, Optional[List[str]], int, int]]:
+    """
+    Every top level attribute and block in text, as its identifier, its
+    labels, and where its expression or body starts and ends. Attributes
+    have None for labels and blocks start at their opening brace.
+    """
+    pos = _skip_space(text, 0)
+    while pos < len(text):
+        if (identifier := RE_IDENTIFIER.match(text, pos)) is None:
+            pos = _skip_space(text, _scan(text, pos + 1, stop_at_newline=True))
+            continue
+        pos = _skip_space(text, identifier.end())
+        if text.startswith("=", pos):
+            start = _skip_space(text, pos + 1)
+            pos = _scan(text, start, stop_at_newline=True)
+            yield identifier.group(0), None, start, _rstrip(text, start, pos)
+            pos = _skip_space(text, pos)
+            continue
+        labels = []
+        while (label := RE_LABEL.match(text, pos)) is not None:
+            labels.append(
+                label.group(1) if label.group(1) is not None else label.group(2)
+            )
+            pos = _skip_space(text, label.end())
+        if not text.startswith("{", pos):
+            pos = _skip_space(text, _scan(text, pos + 1, stop_at_newline=True))
+            continue
+        start = pos
+        pos = _scan(text, pos, stop_at_newline=False)
+        yield identifier.group(0), labels, start, pos
+        pos = _skip_space(text, pos)
+
+
+def variable_spans(text: str) -> List[Tuple[str, Dict[str, Span]]]:
+    """
+    The name of every variable block in text, in source order, with the
+    source spans of its attribute expressions.
+    """
+    return [
+        (labels[0], _block_attributes(text, start))
+        for identifier, labels, start, _ in _top_level(text)
+        if identifier == "variable" and labels
+    ]
+
+
+def _collect_spans(
+    text: str, start: int, end: int, path: Tuple[str, ...], spans: Dict
+) -> None:
+    spans[path] = (start, end)
+    if text.startswith("[", start):
+        pos, index = start + 1, 0
+        while (pos := _skip_space(text, pos)) < end and text[pos] != "]":
+            element_end = _scan(text, pos, stop_at_newline=False, stop_at_comma=True)
+            _collect_spans(
+                text, pos, _rstrip(text, pos, element_end), (*path, str(index)), spans
+            )
+            index += 1
+            pos = _skip_space(text, element_end)
+            if text.startswith(",", pos):
+                pos += 1
+    elif text.startswith("{", start):
+        pos = start + 1
+        while (pos := _skip_space(text, pos)) < end and text[pos] != "}":
+            if (key := RE_LABEL.match(text, pos)) is None:
+                pos = _scan(text, pos + 1, stop_at_newline=True, stop_at_comma=True)
+                pos += text.startswith(",", pos)
+                continue
+            name = key.group(1) if key.group(1) is not None else key.group(2)
+            pos = _skip_space(text, key.end())
+            if text.startswith("=", pos) or text.startswith(":", pos):
+                value_start = _skip_space(text, pos + 1)
+                pos = _scan(text, value_start, stop_at_newline=True, stop_at_comma=True)
+                _collect_spans(
+                    text,
+                    value_start,
+                    _rstrip(text, value_start, pos),
+                    (*path, name),
+                    spans,
+                )
+            pos = _skip_space(text, pos)
+            pos += text.startswith(",", pos)
+
+
+def value_spans(text: str) -> Dict[Tuple[str, ...], Span]:
+    """
+    Source spans of the top level attribute values in text, and of the
+    elements of any lists and objects they hold, keyed by their path: the
+    attribute name followed by list indexes and object keys.
+    """
+    spans: Dict[Tuple[str, ...], Span] = {}
+    for identifier, labels, start, end in _top_level(text):
+        if labels is None:
+            _collect_spans(text, start, end, (identifier,), spans)
+    return spans
+
+
+def path_parts(path: str) -> Tuple[str, ...]:
+    """
+    The keys in a parameter path such as [tags]["Name"], without quotes.
+    """
+    return tuple(part.strip('"') for part in RE_PATH_PART.findall(path))
+
+
+def splice_references(text: str, references: Dict[Span, str]) -> str:
+    """
+    Replace the given source spans with template references in one pass.
+    String literals are replaced whole, quotes included, since hcl2 keeps the
+    quotes in the values it reads.
+    """
+    parts = []
+    pos = 0
+    for (start, end), reference in sorted(references.items()):
+        if start < pos:
+            continue
+        parts.append(text[pos:start])
+        parts.append(reference)
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts)
 
 
 class TFProcessor(BaseProcessor):
@@ -24,10 +270,12 @@ class TFProcessor(BaseProcessor):
     def __init__(
         self, env_values: Dict, should_parse_description: bool = False
     ) -> None:
-        self.should_parse_description = should_parse_description
-        # Due to an unknown bug, self.parameters_and_values can persist between
-        # Processor instances. Therefore, we reset it here.
+        # descriptions are read from the variable blocks, not from comments
+        self.should_parse_description = False
+        # BaseProcessor declares these as class attributes, so they would be
+        # shared by every Processor instance. Therefore, we reset them here.
         self.parameters_and_values: Dict = {}
+        self.raw_data: Dict = {}
         for env, file_path in env_values.items():
             if not os.path.isfile(file_path):
                 raise ValueError(
@@ -49,83 +297,75 @@ class TFProcessor(BaseProcessor):
         self, template: Dict, config_data: Optional[Dict]
     ) -> str:
         template_body = self.raw_file
-        environment = "default"
-        if config_data:
-            for _, data in config_data.items():
-                value = str(data["values"][environment])
-                reference = f'{{{{ cloudtruth.parameters.{data["param_name"]} }}}}'
-                template_body = sub(value, reference, template_body)
+        if not config_data:
+            return template_body
+
+        variables = variable_spans(template_body)
+        variables_by_name = {name: attributes for name, attributes in variables}
+        references: Dict[Span, str] = {}
+        for path, data in config_data.items():
+            span = self._attribute_span(path, variables, variables_by_name)
+            if span is not None:
+                references.setdefault(
+                    span, f'{{{{ cloudtruth.parameters.{data["param_name"]} }}}}'
+                )
 
-        return template_body
+        return splice_references(template_body, references)
 
-    def _traverse_data(
+    def _attribute_span(
         self,
         path: str,
-        obj: Union[Dict, List, str],
-        env: Optional[str] = "default",
-        hints: Optional[Dict] = None,
-    ) -> Tuple[Any, Dict]:
+        variables: List[Tuple[str, Dict[str, Span]]],
+        variables_by_name: Dict[str, Dict[str, Span]],
+    ) -> Optional[Span]:
         """
-        Traverse obj recursively and construct every path / value pair.
-
-        Inspired by: https://github.com/jabbalaci/JSON-path/blob/master/jsonpath.py
+        The source span of the value a parameter path refers to: the default
+        of a variable, or another attribute of a variable without a type.
         """
-        params_and_values = {}
-        if isinstance(obj, list):
-            for i, subnode in enumerate(obj):
-                template_value, ct_data = self._traverse_data(
-                    path + f"[{i}]", subnode, env, hints=hints
-                )
-                obj[i] = template_value
-                params_and_values.update(ct_data)
-            return obj, params_and_values
-        elif isinstance(obj, dict):
-            if set(obj.keys()) >= self.data_keys:
-                if not hints:
-                    param_name = self.path_to_param_name(path)
-                    value = (
-                        str(obj["default"]).lower() if obj["type"] == "boolean" else obj
-                    )
-                    return f"{{{{ cloudtruth.parameters.{param_name} }}}}", {
-                        path: {
-                            "values": {env: value},
-                            "param_name": param_name,
-                            "description": obj.get("description", ""),
-                            "type": obj["type"],
-                            "secret": obj.get("sensitive", False),
-                        }
-                    }
-
-                if existing_data := hints.get(path):
-                    param_name = existing_data["param_name"]
-                    return (
-                        f"{{{{ cloudtruth.parameters.{param_name} }}}}",
-                        existing_data,
-                    )
-
-            for k, v in obj.items():
-                template_value, ct_data = self._traverse_data(
-                    path + f"[{k}]", v, env, hints=hints
-                )
-                obj[k] = template_value
-                params_and_values.update(ct_data)
-            return obj, params_and_values
+        parts = path_parts(path)
+        if len(parts) < 3 or len(parts) > 4 or parts[0] != "variable":
+            return None
+        name = parts[2]
+        attribute = parts[3] if len(parts) == 4 else "default"
+        index = int(parts[1]) if parts[1].isdigit() else -1
+        if 0 <= index < len(variables) and variables[index][0] == name:
+            attributes = variables[index][1]
         else:
+            attributes = variables_by_name.get(name, {})
+        return attributes.get(attribute)
+
+    def _visit(
+        self, path: ConfigPath, obj: Any, env: str, hints: Optional[Dict]
+    ) -> Optional[Tuple[Any, Optional[Dict]]]:
+        # a variable block with a type and default is a single parameter
+        if isinstance(obj, dict) and set(obj.keys()) >= self.data_keys:
             if not hints:
-                obj_type = self.guess_type(obj)
                 param_name = self.path_to_param_name(path)
-                value = str(obj).lower() if obj_type == "boolean" else obj
+                value = self._leaf_value(path, obj, hints)
                 return f"{{{{ cloudtruth.parameters.{param_name} }}}}", {
-                    path: {
-                        "values": {env: value},
-                        "param_name": param_name,
-                        "type": obj_type,
-                        "secret": False,
-                    }
+                    "values": {env: value},
+                    "param_name": param_name,
+                    "description": obj.get("description", ""),
+                    "type": obj["type"],
+                    "secret": obj.get("sensitive", False),
                 }
 
-            if existing_data := hints.get(path):
+            if existing_data := hints.get(str(path)):
                 param_name = existing_data["param_name"]
                 return f"{{{{ cloudtruth.parameters.{param_name} }}}}", existing_data
 
-            return obj, {}
+            return None
+
+        visited = super()._visit(path, obj, env, hints)
+        if not hints and visited is not None and visited[1] is not None:
+            visited[1]["secret"] = False
+        return visited
+
+    def _leaf_value(self, path: ConfigPath, obj: Any, hints: Optional[Dict]) -> Any:
+        if isinstance(obj, dict) and set(obj.keys()) >= self.data_keys:
+            if hints and not hints.get(str(path)):
+                return MISSING
+            # the default is what the template reference replaces
+            default = obj["default"]
+            return str(default).lower() if obj["type"] == "boolean" else default
+        return super()._leaf_value(path, obj, hints)
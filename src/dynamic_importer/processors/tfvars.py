@@ -5,12 +5,15 @@
 #
 from __future__ import annotations
 
-from re import sub
 from typing import Dict
 from typing import Optional
 
 import hcl2
 from dynamic_importer.processors import BaseProcessor
+from dynamic_importer.processors.tf import path_parts
+from dynamic_importer.processors.tf import Span
+from dynamic_importer.processors.tf import splice_references
+from dynamic_importer.processors.tf import value_spans
 
 
 class TFVarsProcessor(BaseProcessor):
@@ -18,9 +21,10 @@ class TFVarsProcessor(BaseProcessor):
         self, env_values: Dict, should_parse_description: bool = False
     ) -> None:
         self.should_parse_description = should_parse_description
-        # Due to an unknown bug, self.parameters_and_values can persist between
-        # Processor instances. Therefore, we reset it here.
+        # BaseProcessor declares these as class attributes, so they would be
+        # shared by every Processor instance. Therefore, we reset them here.
         self.parameters_and_values: Dict = {}
+        self.raw_data: Dict = {}
         for env, file_path in env_values.items():
             try:
                 with open(file_path, "r") as fp:
@@ -39,16 +43,15 @@ class TFVarsProcessor(BaseProcessor):
         self, template: Dict, config_data: Optional[Dict]
     ) -> str:
         template_body = self.raw_file
-        environment = "default"
-        if config_data:
-            for _, data in config_data.items():
-                source_name = sub(r"_\d+", "", data["param_name"])
-                value = (
-                    rf"({source_name})(\s*=\s*.*){str(data['values'][environment])}(.*)"
-                )
-                reference = (
-                    rf'\1\2{{{{ cloudtruth.parameters.{data["param_name"]} }}}}\3'
+        if not config_data:
+            return template_body
+
+        spans = value_spans(template_body)
+        references: Dict[Span, str] = {}
+        for path, data in config_data.items():
+            if (span := spans.get(path_parts(path))) is not None:
+                references.setdefault(
+                    span, f'{{{{ cloudtruth.parameters.{data["param_name"]} }}}}'
                 )
-                template_body = sub(value, reference, template_body)
 
-        return template_body
+        return splice_references(template_body, references)
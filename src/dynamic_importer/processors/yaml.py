@@ -5,7 +5,6 @@
 #
 from __future__ import annotations
 
-from re import sub
 from typing import Any
 from typing import Dict
 from typing import Optional
@@ -23,9 +22,10 @@ class YAMLProcessor(BaseProcessor):
         self, env_values: Dict, should_parse_description: bool = False
     ) -> None:
         self.should_parse_description = should_parse_description
-        # Due to an unknown bug, self.parameters_and_values can persist between
-        # Processor instances. Therefore, we reset it here.
+        # BaseProcessor declares these as class attributes, so they would be
+        # shared by every Processor instance. Therefore, we reset them here.
         self.parameters_and_values: Dict = {}
+        self.raw_data: Dict = {}
         for env, file_path in env_values.items():
             try:
                 with open(file_path, "r") as fp:
@@ -62,16 +62,15 @@ class YAMLProcessor(BaseProcessor):
         self, template: Dict, config_data: Optional[Dict]
     ) -> str:
         template_body = yaml.dump(template, stream=None)
+        replacements: Dict[str, str] = {}
         if config_data:
             for _, data in config_data.items():
                 if data["type"] != "string":
-                    # YAML strings use single quotes
-                    reference = rf"'(\{{\{{\s+cloudtruth.parameters.{data['param_name']}\s+\}}\}})'"
-                    template_body = sub(reference, r"\1", template_body)
+                    replacements.setdefault(data["param_name"], "")
                 default_value = data.get("values", {}).get("default")
                 if default_value and data["type"] == "string":
                     if default_value.startswith("'") and default_value.endswith("'"):
-                        reference = rf"'(\{{\{{\s+cloudtruth.parameters.{data['param_name']}\s+\}}\}})'"
-                        template_body = sub(reference, r'"\1"', template_body)
+                        replacements.setdefault(data["param_name"], '"')
 
-        return template_body
+        # YAML strings use single quotes
+        return self.unquote_references(template_body, "'", replacements)
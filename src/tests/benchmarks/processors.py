@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+"""
+Processor micro-benchmarks.
+
+Generates synthetic config files with a given number of leaf values and times
+the stages of processing them separately, for every processor:
+
+    parse      reading the input files (the processor constructor)
+    traverse   extract_parameters_and_values, which walks all environments
+               together with _traverse_environments
+    template   generate_template, which encodes the template references
+
+Each stage is also run once under tracemalloc to record its peak memory and
+the number of memory blocks it allocated. Between consecutive sizes the
+growth exponent of every stage is reported, so 1.0 is linear and 2.0 is
+quadratic. Run from src:
+
+    python -m tests.benchmarks.processors --sizes 1000,10000 --environments 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from itertools import product
+from tempfile import TemporaryDirectory
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Tuple
+
+from dynamic_importer.processors import get_processor_class
+
+DEFAULT_SIZES = (100, 1000, 10000)
+DEFAULT_ENVIRONMENTS = (1, 3)
+DEFAULT_DEPTH = 32
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 1.25
+STAGES = ("parse", "traverse", "template")
+
+
+def _value(i: int, variant: int):
+    """
+    A leaf value that differs between environments, cycling through types.
+    """
+    kind = i % 4
+    if kind == 0:
+        return i * 10 + variant
+    if kind == 1:
+        return (i + variant) % 2 == 0
+    return f"value-{i}-{variant}"
+
+
+def _yaml_scalar(value) -> str:
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+
+def _skipped(i: int, variant: int) -> bool:
+    # environments other than default leave out some values
+    return variant > 0 and (i + variant) % 7 == 0
+
+
+def generate_yaml_wide(size: int, variant: int, depth: int) -> str:
+    """
+    Many sections of 50 keys, with comments and short lists.
+    """
+    lines = []
+    for i in range(size):
+        if i % 50 == 0:
+            lines.append(f"section_{i // 50}:")
+        if _skipped(i, variant):
+            continue
+        if i % 10 == 9:
+            lines.append(f"  list_{i}:")
+            lines.append(f"    - {_yaml_scalar(_value(i, variant))}")
+        else:
+            lines.append(f"  # setting {i}")
+            lines.append(f"  key_{i}: {_yaml_scalar(_value(i, variant))}")
+    return "\n".join(lines) + "\n"
+
+
+def generate_yaml_deep(size: int, variant: int, depth: int) -> str:
+    """
+    Chains of nested mappings depth levels deep, with a leaf at every level.
+    """
+    lines = []
+    for i in range(size):
+        level = i % depth
+        if level == 0:
+            lines.append(f"chain_{i // depth}:")
+        indent = "  " * (level + 1)
+        if not _skipped(i, variant):
+            lines.append(f"{indent}leaf_{i}: {_yaml_scalar(_value(i, variant))}")
+        lines.append(f"{indent}level_{level + 1}:")
+    lines.append("  " * (depth + 1) + "end: true")
+    return "\n".join(lines) + "\n"
+
+
+def generate_json(size: int, variant: int, depth: int) -> str:
+    """
+    Services holding nested settings objects and lists.
+    """
+    services: Dict = {}
+    for i in range(size):
+        if _skipped(i, variant):
+            continue
+        service = services.setdefault(f"service_{i // 100}", {})
+        group = service.setdefault(f"group_{(i // 10) % 10}", {})
+        if i % 10 == 9:
+            group.setdefault("items", []).append(_value(i, variant))
+        else:
+            group[f"key_{i}"] = _value(i, variant)
+    return json.dumps(services, indent=4)
+
+
+def generate_tf(size: int, variant: int, depth: int) -> str:
+    blocks = []
+    for i in range(size):
+        value = _value(i, variant)
+        if isinstance(value, bool):
+            type_name, default = "bool", str(value).lower()
+        elif isinstance(value, int):
+            type_name, default = "number", str(value)
+        else:
+            type_name, default = "string", f'"{value}"'
+        blocks.append(
+            f'variable "var_{i}" {{\n'
+            f'  description = "Variable {i}"\n'
+            f"  type        = {type_name}\n"
+            f"  default     = {default}\n"
+            "}\n"
+        )
+    return "\n".join(blocks)
+
+
+def generate_tfvars(size: int, variant: int, depth: int) -> str:
+    lines = []
+    for i in range(size):
+        if _skipped(i, variant):
+            continue
+        value = _value(i, variant)
+        if isinstance(value, bool):
+            value = str(value).lower()
+        elif isinstance(value, str):
+            value = f'"{value}"'
+        lines.append(f"# variable {i}")
+        lines.append(f"var_{i} = {value}")
+    return "\n".join(lines) + "\n"
+
+
+def generate_dotenv(size: int, variant: int, depth: int) -> str:
+    return "".join(
+        f"VAR_{i}={_yaml_scalar(_value(i, variant))}\n"
+        for i in range(size)
+        if not _skipped(i, variant)
+    )
+
+
+# case name: (file type, file extension, generator)
+CASES: Dict[str, Tuple[str, str, Callable[[int, int, int], str]]] = {
+    "yaml-wide": ("yaml", "yaml", generate_yaml_wide),
+    "yaml-deep": ("yaml", "yaml", generate_yaml_deep),
+    "json": ("json", "json", generate_json),
+    "tf": ("tf", "tf", generate_tf),
+    "tfvars": ("tfvars", "tfvars", generate_tfvars),
+    "dotenv": ("dotenv", "env", generate_dotenv),
+}
+
+
+def environment_names(count: int) -> List[str]:
+    return ["default"] + [f"env{i}" for i in range(1, count)]
+
+
+def write_case(
+    directory: str, case: str, size: int, environments: int, depth: int
+) -> Dict[str, str]:
+    _, extension, generator = CASES[case]
+    input_files = {}
+    for variant, env in enumerate(environment_names(environments)):
+        file_path = os.path.join(directory, f"{case}-{size}-{env}.{extension}")
+        with open(file_path, "w") as fp:
+            fp.write(generator(size, variant, depth))
+        input_files[env] = file_path
+    return input_files
+
+
+def run_stages(file_type: str, input_files: Dict[str, str]) -> Dict[str, Callable]:
+    """
+    Stage functions for one fresh processor, to be called in STAGES order.
+    """
+    processing_class = get_processor_class(file_type)
+    state = {}
+
+    def parse():
+        state["processor"] = processing_class(input_files, True)
+
+    def traverse():
+        state["processor"].extract_parameters_and_values(None)
+
+    def template():
+        state["processor"].generate_template()
+
+    return {"parse": parse, "traverse": traverse, "template": template}
+
+
+def measure(file_type: str, input_files: Dict[str, str], repeat: int) -> Dict:
+    """
+    Best of repeat timings for every stage, then one traced run for memory.
+    """
+    stages: Dict[str, Dict] = {stage: {"seconds": math.inf} for stage in STAGES}
+    for _ in range(repeat):
+        stage_functions = run_stages(file_type, input_files)
+        for stage in STAGES:
+            gc.collect()
+            started = time.perf_counter()
+            stage_functions[stage]()
+            elapsed = time.perf_counter() - started
+            stages[stage]["seconds"] = min(stages[stage]["seconds"], elapsed)
+
+    stage_functions = run_stages(file_type, input_files)
+    for stage in STAGES:
+        gc.collect()
+        blocks_before = sys.getallocatedblocks()
+        collections_before = gc.get_stats()[0]["collections"]
+        tracemalloc.start()
+        stage_functions[stage]()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stages[stage].update(
+            {
+                "seconds": round(stages[stage]["seconds"], 6),
+                "peak_kb": peak // 1024,
+                "allocated_blocks": sys.getallocatedblocks() - blocks_before,
+                "gc_collections": gc.get_stats()[0]["collections"] - collections_before,
+            }
+        )
+    return stages
+
+
+def add_growth(results: List[Dict]) -> None:
+    """
+    Record, for each result, how fast every stage grew since the next smaller
+    size of the same case: log(time ratio) / log(size ratio).
+    """
+    previous: Dict[Tuple, Dict] = {}
+    for result in sorted(results, key=lambda r: r["size"]):
+        key = (result["case"], result["environments"])
+        if (smaller := previous.get(key)) and not (
+            result.get("error") or smaller.get("error")
+        ):
+            size_ratio = math.log(result["size"] / smaller["size"])
+            for stage in STAGES:
+                before = smaller["stages"][stage]["seconds"]
+                after = result["stages"][stage]["seconds"]
+                if before > 0 and after > 0:
+                    result["stages"][stage]["growth"] = round(
+                        math.log(after / before) / size_ratio, 2
+                    )
+        previous[key] = result
+
+
+def case_key(result: Dict) -> tuple:
+    return (result["case"], result["size"], result["environments"])
+
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Describe every stage that got slower than the baseline by more than
+    tolerance.
+    """
+    baseline_results = {case_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline_results.get(case_key(result))
+        if previous is None or result.get("error") or previous.get("error"):
+            continue
+        for stage in STAGES:
+            before = previous["stages"][stage]["seconds"]
+            after = result["stages"][stage]["seconds"]
+            if after > before * tolerance:
+                regressions.append(f"{case_key(result)} {stage}: {before} -> {after}")
+    return regressions
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--cases",
+        type=lambda value: value.split(","),
+        default=list(CASES),
+        help=f"Comma separated cases out of {', '.join(CASES)}",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=_int_list,
+        default=list(DEFAULT_SIZES),
+        help="Comma separated numbers of leaf values per file",
+    )
+    parser.add_argument(
+        "--environments",
+        type=_int_list,
+        default=list(DEFAULT_ENVIRONMENTS),
+        help="Comma separated environment counts, including default",
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        default=DEFAULT_DEPTH,
+        help="Nesting depth of the yaml-deep case",
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("-o", "--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Results JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    options = parser.parse_args(argv)
+    unknown_cases = set(options.cases) - set(CASES)
+    if unknown_cases:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown_cases))}")
+    # the parsers recurse into deeply nested documents
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), options.depth * 10))
+
+    results = []
+    with TemporaryDirectory() as directory:
+        for case, environments, size in product(
+            options.cases, options.environments, sorted(options.sizes)
+        ):
+            file_type = CASES[case][0]
+            input_files = write_case(directory, case, size, environments, options.depth)
+            result = {"case": case, "size": size, "environments": environments}
+            try:
+                result["stages"] = measure(file_type, input_files, options.repeat)
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+            results.append(result)
+            summary = result.get("error") or "  ".join(
+                f"{stage} {data['seconds']:.4f}s"
+                for stage, data in result["stages"].items()
+            )
+            print(
+                f"{case:>9} size={size:<7} envs={environments:<3} {summary}",
+                file=sys.stderr,
+            )
+    add_growth(results)
+
+    report = {
+        "benchmark": "processors",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": options.repeat,
+        "depth": options.depth,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, "w") as fp:
+            fp.write(output + "\n")
+    else:
+        print(output)
+
+    regressions = []
+    if options.baseline:
+        with open(options.baseline) as fp:
+            regressions = compare(results, json.load(fp), options.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
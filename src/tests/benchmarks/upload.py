@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+"""
+End-to-end upload benchmarks.
+
+Generates synthetic .ctconfig/.cttemplate pairs, runs `create-data` against
+the local CloudTruth stand-in with injected latency, and reports wall time,
+requests per parameter and peak RSS of each run as JSON. Run from src:
+
+    python -m tests.benchmarks.upload --parameters 100,1000 --environments 1,5
+
+Each case uploads into an empty stand-in ("create") and then uploads the same
+data again ("resync"), which exercises lookups and caching. With --baseline,
+the run fails when a case is slower or sends more requests per parameter than
+the baseline allows.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from itertools import product
+from tempfile import TemporaryDirectory
+from tempfile import TemporaryFile
+from typing import Any
+from typing import Dict
+from typing import List
+
+from tests.fixtures.server import CloudTruthStandIn
+
+DEFAULT_PARAMETERS = (100, 1000)
+DEFAULT_ENVIRONMENTS = (1, 5)
+DEFAULT_JOBS = (1, 8)
+DEFAULT_LATENCY = 0.002
+DEFAULT_TOLERANCE = 1.25
+MODES = {"default": [], "bulk": ["--bulk"], "diff": ["--diff"]}
+PHASES = ("create", "resync")
+PROJECT = "benchmark"
+
+
+def environment_names(count: int) -> List[str]:
+    return ["default"] + [f"env{i}" for i in range(1, count)]
+
+
+def generate_config(parameters: int, environments: int) -> Dict:
+    """
+    Config data in the shape written by process-configs, mixing parameter
+    types and leaving some environments without a value.
+    """
+    config_data = {}
+    for i in range(parameters):
+        name = f"service_{i // 100}_setting_{i}"
+        type_name = ("string", "integer", "boolean")[i % 3]
+        values: Dict[str, Any] = {}
+        for j, env in enumerate(environment_names(environments)):
+            if j and (i + j) % 4 == 0:
+                continue
+            if type_name == "integer":
+                values[env] = i * 10 + j
+            elif type_name == "boolean":
+                values[env] = (i + j) % 2 == 0
+            else:
+                values[env] = f"value-{i}-{env}"
+        config_data[f"[service_{i // 100}][setting_{i}]"] = {
+            "values": values,
+            "param_name": name,
+            "type": type_name,
+            "secret": i % 10 == 0,
+        }
+    return {PROJECT: config_data}
+
+
+def generate_template(config: Dict) -> str:
+    return "".join(
+        f"{parameter['param_name']}={{{{ cloudtruth.parameters.{parameter['param_name']} }}}}\n"
+        for parameter in config[PROJECT].values()
+    )
+
+
+def write_case(directory: str, parameters: int, environments: int) -> List[str]:
+    config = generate_config(parameters, environments)
+    data_file = os.path.join(directory, f"{PROJECT}.ctconfig")
+    template_file = os.path.join(directory, f"{PROJECT}.cttemplate")
+    with open(data_file, "w") as fp:
+        json.dump(config, fp)
+    with open(template_file, "w") as fp:
+        fp.write(generate_template(config))
+    return ["-d", data_file, "-m", template_file]
+
+
+def run_create_data(args: List[str], api_host: str) -> Dict:
+    """
+    Run create-data in a child process, so its peak RSS is its own. Its stderr
+    goes to a file rather than a pipe, which could fill up while we wait.
+    """
+    env = {**os.environ, "CLOUDTRUTH_API_HOST": api_host, "CLOUDTRUTH_API_KEY": "x"}
+    command = [sys.executable, "-m", "dynamic_importer.main", "create-data", *args]
+    with TemporaryFile() as stderr_file:
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            command, env=env, stdout=subprocess.DEVNULL, stderr=stderr_file
+        )
+        _, status, rusage = os.wait4(process.pid, 0)
+        wall_seconds = time.perf_counter() - started
+        process.returncode = os.waitstatus_to_exitcode(status)
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode()
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss_kb = rusage.ru_maxrss // (1024 if sys.platform == "darwin" else 1)
+    return {
+        "exit_code": process.returncode,
+        "wall_seconds": round(wall_seconds, 3),
+        "peak_rss_kb": peak_rss_kb,
+        "error": stderr.strip().splitlines()[-1] if process.returncode else None,
+    }
+
+
+def run_case(
+    parameters: int,
+    environments: int,
+    mode: str,
+    jobs: int,
+    options: argparse.Namespace,
+) -> List[Dict]:
+    results = []
+    with (
+        TemporaryDirectory() as directory,
+        CloudTruthStandIn(
+            latency=options.latency,
+            page_size=options.page_size,
+            throttle_every=options.throttle_every,
+        ) as stand_in,
+    ):
+        files = write_case(directory, parameters, environments)
+        metrics_file = os.path.join(directory, "metrics.json")
+        for phase in PHASES:
+            args = [*files, "-c", "-u", "--jobs", str(jobs), *MODES[mode]]
+            args += ["--metrics-file", metrics_file]
+            requests_before = len(stand_in.requests)
+            result = run_create_data(args, stand_in.base_host)
+            requests = len(stand_in.requests) - requests_before
+            result.update(
+                {
+                    "parameters": parameters,
+                    "environments": environments,
+                    "mode": mode,
+                    "jobs": jobs,
+                    "phase": phase,
+                    "requests": requests,
+                    "requests_per_parameter": round(requests / parameters, 3),
+                }
+            )
+            if os.path.exists(metrics_file):
+                with open(metrics_file) as fp:
+                    result["client_metrics"] = json.load(fp)
+                os.remove(metrics_file)
+            results.append(result)
+            print(
+                f"{mode:>7} jobs={jobs:<3} params={parameters:<6} envs={environments:<3} "
+                f"{phase:<6} {result['wall_seconds']:>8.2f}s "
+                f"{result['requests_per_parameter']:>7.2f} req/param "
+                f"{result['peak_rss_kb'] // 1024:>5} MiB"
+                + (f"  FAILED: {result['error']}" if result["exit_code"] else ""),
+                file=sys.stderr,
+            )
+    return results
+
+
+def case_key(result: Dict) -> tuple:
+    return tuple(
+        result[k] for k in ("parameters", "environments", "mode", "jobs", "phase")
+    )
+
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Describe every case that regressed against the baseline by more than
+    tolerance, in wall time or in requests per parameter.
+    """
+    baseline_results = {case_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline_results.get(case_key(result))
+        if previous is None:
+            continue
+        for metric in ("wall_seconds", "requests_per_parameter"):
+            if result[metric] > previous[metric] * tolerance:
+                regressions.append(
+                    f"{case_key(result)} {metric}: {previous[metric]} -> {result[metric]}"
+                )
+    return regressions
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--parameters",
+        type=_int_list,
+        default=list(DEFAULT_PARAMETERS),
+        help="Comma separated parameter counts",
+    )
+    parser.add_argument(
+        "--environments",
+        type=_int_list,
+        default=list(DEFAULT_ENVIRONMENTS),
+        help="Comma separated environment counts, including default",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=_int_list,
+        default=list(DEFAULT_JOBS),
+        help="Comma separated --jobs values",
+    )
+    parser.add_argument(
+        "--modes",
+        type=lambda value: value.split(","),
+        default=list(MODES),
+        help=f"Comma separated upload modes out of {', '.join(MODES)}",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=DEFAULT_LATENCY,
+        help="Seconds the stand-in API waits before each response",
+    )
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--throttle-every", type=int, default=None)
+    parser.add_argument("-o", "--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Results JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    options = parser.parse_args(argv)
+    unknown_modes = set(options.modes) - set(MODES)
+    if unknown_modes:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown_modes))}")
+
+    results = []
+    for parameters, environments, mode, jobs in product(
+        options.parameters, options.environments, options.modes, options.jobs
+    ):
+        if mode == "bulk" and jobs > 1:
+            # bulk imports are sent one batch at a time
+            continue
+        results.extend(run_case(parameters, environments, mode, jobs, options))
+
+    report = {
+        "benchmark": "upload",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "latency": options.latency,
+        "page_size": options.page_size,
+        "throttle_every": options.throttle_every,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, "w") as fp:
+            fp.write(output + "\n")
+    else:
+        print(output)
+
+    failed = [r for r in results if r["exit_code"]]
+    regressions = []
+    if options.baseline:
+        with open(options.baseline) as fp:
+            regressions = compare(results, json.load(fp), options.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,10 @@
 #
 from __future__ import annotations
 
+import json
+
+import httpx
+
 
 def mocked_requests_get(*args, **kwargs):
     class MockResponse:
@@ -321,3 +325,148 @@ def mocked_requests_localhost_post(*args, **kwargs):
             },
             201,
         )
+
+
+def mocked_httpx_transport(
+    get=mocked_requests_get, post=mocked_requests_post, patch=mocked_requests_patch
+):
+    """
+    Adapt the requests mocks above into an httpx transport for AsyncCTClient tests.
+    """
+    handlers = {"GET": get, "POST": post, "PATCH": patch}
+
+    def handler(request):
+        kwargs = {}
+        if request.content:
+            kwargs["json"] = json.loads(request.content)
+        url = str(request.url.copy_with(query=None))
+        resp = handlers[request.method](url, **kwargs)
+        return httpx.Response(resp.status_code, json=resp.json_data)
+
+    return httpx.MockTransport(handler)
+
+
+def mocked_requests_paginated_get(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+        def text(self):
+            return self.json_data
+
+    url = args[0]
+    if url == "https://api.cloudtruth.io/api/v1/projects/":
+        return MockResponse(
+            {
+                "next": "https://api.cloudtruth.io/api/v1/projects/?page=2",
+                "results": [{"id": "1", "url": "/projects/1/", "name": "myproj"}],
+            },
+            200,
+        )
+    elif url == "https://api.cloudtruth.io/api/v1/projects/?page=2":
+        return MockResponse(
+            {
+                "next": "https://api.cloudtruth.io/api/v1/projects/?page=3",
+                "results": [{"id": "2", "url": "/projects/2/", "name": "proj2"}],
+            },
+            200,
+        )
+    elif url == "https://api.cloudtruth.io/api/v1/projects/?page=3":
+        return MockResponse(
+            {
+                "next": None,
+                "results": [{"id": "3", "url": "/projects/3/", "name": "proj3"}],
+            },
+            200,
+        )
+
+    return MockResponse(None, 404)
+
+
+def mocked_requests_prefetch_get(*args, **kwargs):
+    class MockResponse:
+        def __init__(self, json_data, status_code):
+            self.json_data = json_data
+            self.status_code = status_code
+
+        def json(self):
+            return self.json_data
+
+        def text(self):
+            return self.json_data
+
+    url = args[0]
+    if url == "https://api.cloudtruth.io/api/v1/projects/":
+        return MockResponse(
+            {"results": [{"id": "1", "url": "/projects/1/", "name": "myproj"}]}, 200
+        )
+    elif url == "https://api.cloudtruth.io/api/v1/environments/":
+        return MockResponse(
+            {
+                "results": [
+                    {"id": "1", "url": "/environments/1/", "name": "default"},
+                    {"id": "2", "url": "/environments/2/", "name": "production"},
+                    {"id": "3", "url": "/environments/3/", "name": "staging"},
+                ]
+            },
+            200,
+        )
+    elif url == "https://api.cloudtruth.io/api/v1/projects/1/parameters/":
+        default_value = {
+            "id": "1",
+            "url": "/projects/1/parameters/1/values/1/",
+            "environment": "/environments/1/",
+            "environment_name": "default",
+        }
+        return MockResponse(
+            {
+                "results": [
+                    {
+                        "id": "1",
+                        "url": "/projects/1/parameters/1/",
+                        "name": "param1",
+                        "values": {
+                            "/environments/1/": default_value,
+                            "/environments/2/": {
+                                "id": "2",
+                                "url": "/projects/1/parameters/1/values/2/",
+                                "environment": "/environments/2/",
+                            },
+                            # staging inherits the default value
+                            "/environments/3/": default_value,
+                        },
+                    },
+                    {
+                        "id": "2",
+                        "url": "/projects/1/parameters/2/",
+                        "name": "param2",
+                        "values": {
+                            "/environments/1/": None,
+                            "/environments/2/": None,
+                            "/environments/3/": None,
+                        },
+                    },
+                ]
+            },
+            200,
+        )
+    elif url == "https://api.cloudtruth.io/api/v1/projects/1/templates/":
+        return MockResponse(
+            {
+                "results": [
+                    {
+                        "id": "1",
+                        "url": "/projects/1/templates/1/",
+                        "name": "mytemplate",
+                        "body": "PARAM1={{ cloudtruth.parameters.param1 }}",
+                    }
+                ]
+            },
+            200,
+        )
+
+    return MockResponse(None, 404)
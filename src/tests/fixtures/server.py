@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Tuple
+from urllib.parse import parse_qs
+from urllib.parse import urlencode
+from urllib.parse import urlsplit
+
+TYPES = ("boolean", "integer", "string")
+
+
+class CloudTruthStandIn:
+    """
+    A small stateful stand-in for the CloudTruth API served over plain HTTP on
+    localhost. Point CLOUDTRUTH_API_HOST at `base_host` to use it.
+
+    Projects, environments, types, parameters, values and templates can be
+    listed, created and updated, and parameters and values can be bulk
+    imported. Listings honour the `name` filter and are paginated when
+    page_size is set. Every request waits `latency` seconds, and every
+    `throttle_every`-th request is rejected with a 429 and `retry_after`.
+
+    Run `python -m tests.fixtures.server` from src to serve it on a fixed port.
+    """
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 0.0,
+        page_size: int | None = None,
+        throttle_every: int | None = None,
+        retry_after: float = 0,
+    ):
+        self.latency = latency
+        self.page_size = page_size
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.projects: Dict[str, Dict[str, Any]] = {}
+        self.environments = {
+            "default": {"id": "1", "url": "/environments/1/", "parent": None}
+        }
+        self.types = {
+            name: {"id": str(i), "url": f"/types/{i}/", "name": name}
+            for i, name in enumerate(TYPES, start=1)
+        }
+        # (project, name) to type, secret and values by environment name
+        self.parameters: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.parameter_ids: Dict[Tuple[str, str], str] = {}
+        self.parameter_keys: List[Tuple[str, str]] = []
+        # project id to templates by name
+        self.templates: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.requests: List[Tuple[str, str, Any]] = []
+        self.throttled = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_host(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self) -> CloudTruthStandIn:
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _add_project(self, name, description="", depends_on=None):
+        if name not in self.projects:
+            project_id = str(len(self.projects) + 1)
+            self.projects[name] = {
+                "id": project_id,
+                "url": f"/projects/{project_id}/",
+                "name": name,
+                "description": description,
+                "depends_on": depends_on,
+            }
+        return self.projects[name]
+
+    def _add_environment(self, name, parent=None):
+        if name not in self.environments:
+            env_id = str(len(self.environments) + 1)
+            self.environments[name] = {
+                "id": env_id,
+                "url": f"/environments/{env_id}/",
+                "parent": parent or self.environments["default"]["url"],
+            }
+        return self.environments[name]
+
+    def _add_parameter(self, project, name, type_name="string", secret=False):
+        key = (project, name)
+        if key not in self.parameters:
+            self.parameters[key] = {"type": type_name, "secret": secret, "values": {}}
+            self.parameter_keys.append(key)
+            self.parameter_ids[key] = str(len(self.parameter_keys))
+        return self.parameters[key]
+
+    def _project_name(self, project_id):
+        for name, project in self.projects.items():
+            if project["id"] == project_id:
+                return name
+        return None
+
+    def _parameter_key(self, project_id, parameter_id):
+        index = int(parameter_id) - 1 if parameter_id.isdigit() else -1
+        if not 0 <= index < len(self.parameter_keys):
+            return None
+        key = self.parameter_keys[index]
+        return key if key[0] == self._project_name(project_id) else None
+
+    def _environment_name(self, reference):
+        """
+        Values refer to their environment by id or by url.
+        """
+        for name, environment in self.environments.items():
+            if reference in (environment["id"], environment["url"]):
+                return name
+        return None
+
+    def _parameter_json(self, project_id, key):
+        stored = self.parameters[key]
+        parameter_id = self.parameter_ids[key]
+        return {
+            "id": parameter_id,
+            "url": f"/projects/{project_id}/parameters/{parameter_id}/",
+            "name": key[1],
+            "type": stored["type"],
+            "secret": stored["secret"],
+            "values": {
+                self.environments[env]["url"]: self._value_json(project_id, key, env)
+                for env in stored["values"]
+            },
+        }
+
+    def _value_json(self, project_id, key, env):
+        parameter_id = self.parameter_ids[key]
+        environment = self.environments[env]
+        value_id = f"{parameter_id}-{environment['id']}"
+        return {
+            "id": value_id,
+            "url": f"/projects/{project_id}/parameters/{parameter_id}/values/{value_id}/",
+            "environment": environment["url"],
+            "environment_name": env,
+            "internal_value": str(self.parameters[key]["values"][env]),
+        }
+
+    def _page(self, path, query, results):
+        """
+        Apply the name filter and pagination to a listing.
+        """
+        if "name" in query:
+            results = [r for r in results if r["name"] == query["name"]]
+        if not self.page_size:
+            return 200, {"next": None, "results": results}
+        page = int(query.get("page", 1))
+        start = (page - 1) * self.page_size
+        end = start + self.page_size
+        next_url = None
+        if end < len(results):
+            next_query = urlencode({**query, "page": page + 1})
+            next_url = f"{self.base_host}{path}?{next_query}"
+        return 200, {"next": next_url, "results": results[start:end]}
+
+    def _import(self, body):
+        project = self._add_project(body["project"])
+        self._add_environment(body["environment"])
+        for parameter in body["parameters"]:
+            stored = self._add_parameter(
+                project["name"],
+                parameter["name"],
+                parameter["type"],
+                parameter["secret"],
+            )
+            stored["values"][body["environment"]] = parameter["value"]
+        return 201, {"project": [], "environment": [], "parameter": []}
+
+    def _handle_projects(self, method, query, path, body):
+        if method == "GET":
+            return self._page(path, query, list(self.projects.values()))
+        if method == "POST":
+            if body["name"] in self.projects:
+                return 400, {"name": ["Project with this name already exists."]}
+            project = self._add_project(
+                body["name"], body.get("description", ""), body.get("depends_on")
+            )
+            return 201, project
+        return 405, {"detail": "Method not allowed."}
+
+    def _handle_environments(self, method, query, path, body):
+        if method == "GET":
+            return self._page(
+                path,
+                query,
+                [{"name": name, **env} for name, env in self.environments.items()],
+            )
+        if method == "POST":
+            if body["name"] in self.environments:
+                return 400, {"name": ["Environment with this name already exists."]}
+            environment = self._add_environment(body["name"], body.get("parent"))
+            return 201, {"name": body["name"], **environment}
+        return 405, {"detail": "Method not allowed."}
+
+    def _handle_parameters(self, method, parts, query, path, body):
+        project_id = parts[1]
+        project_name = self._project_name(project_id)
+        if project_name is None:
+            return 404, {"detail": "Not found."}
+        if len(parts) == 3:
+            if method == "GET":
+                results = [
+                    self._parameter_json(project_id, key)
+                    for key in self.parameters
+                    if key[0] == project_name
+                ]
+                return self._page(path, query, results)
+            if method == "POST":
+                if (project_name, body["name"]) in self.parameters:
+                    return 400, {"name": ["Parameter with this name already exists."]}
+                key = (project_name, body["name"])
+                self._add_parameter(
+                    *key, body.get("type", "string"), body.get("secret", False)
+                )
+                return 201, self._parameter_json(project_id, key)
+            return 405, {"detail": "Method not allowed."}
+
+        key = self._parameter_key(project_id, parts[3])
+        if key is None:
+            return 404, {"detail": "Not found."}
+        if len(parts) == 4:
+            if method == "PATCH":
+                stored = self.parameters[key]
+                stored["type"] = body.get("type", stored["type"])
+                stored["secret"] = body.get("secret", stored["secret"])
+                return 200, self._parameter_json(project_id, key)
+            return 405, {"detail": "Method not allowed."}
+
+        values = self.parameters[key]["values"]
+        if len(parts) == 5 and method == "GET":
+            environment = self._environment_name(query.get("environment"))
+            results = [
+                self._value_json(project_id, key, env)
+                for env in values
+                if environment is None or env == environment
+            ]
+            return self._page(path, query, results)
+        environment = self._environment_name((body or {}).get("environment"))
+        if environment is None:
+            return 400, {"environment": ["Invalid environment."]}
+        if len(parts) == 5 and method == "POST":
+            if environment in values:
+                return 400, {"environment": ["A value already exists."]}
+            values[environment] = body["internal_value"]
+            return 201, self._value_json(project_id, key, environment)
+        if len(parts) == 6 and method == "PATCH":
+            if environment not in values:
+                return 404, {"detail": "Not found."}
+            values[environment] = body["internal_value"]
+            return 200, self._value_json(project_id, key, environment)
+        return 405, {"detail": "Method not allowed."}
+
+    def _handle_templates(self, method, parts, query, path, body):
+        if self._project_name(parts[1]) is None:
+            return 404, {"detail": "Not found."}
+        project_templates = self.templates.setdefault(parts[1], {})
+        if len(parts) == 3:
+            if method == "GET":
+                return self._page(path, query, list(project_templates.values()))
+            if method == "POST":
+                if body["name"] in project_templates:
+                    return 400, {"name": ["Template with this name already exists."]}
+                template_id = str(len(project_templates) + 1)
+                project_templates[body["name"]] = {
+                    "id": template_id,
+                    "url": f"/projects/{parts[1]}/templates/{template_id}/",
+                    "name": body["name"],
+                    "body": body["body"],
+                }
+                return 201, project_templates[body["name"]]
+            return 405, {"detail": "Method not allowed."}
+
+        for name, template in project_templates.items():
+            if template["id"] == parts[3]:
+                break
+        else:
+            return 404, {"detail": "Not found."}
+        if method == "PATCH":
+            updated = {**template, **body, "id": template["id"], "url": template["url"]}
+            del project_templates[name]
+            project_templates[updated["name"]] = updated
+            return 200, updated
+        return 405, {"detail": "Method not allowed."}
+
+    def _should_throttle(self) -> bool:
+        if not self.throttle_every:
+            return False
+        return len(self.requests) % self.throttle_every == 0
+
+    def handle(self, method, path, body):
+        """
+        Returns the status, JSON payload and extra headers of a response.
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.requests.append((method, path, body))
+            if self._should_throttle():
+                self.throttled += 1
+                return (
+                    429,
+                    {"detail": "Request was throttled."},
+                    {"Retry-After": str(self.retry_after)},
+                )
+            url = urlsplit(path)
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            parts = [p for p in url.path.split("/") if p][2:]
+            status, payload = 404, {"detail": "Not found."}
+            if parts == ["projects"]:
+                status, payload = self._handle_projects(method, query, url.path, body)
+            elif parts == ["environments"]:
+                status, payload = self._handle_environments(
+                    method, query, url.path, body
+                )
+            elif parts == ["types"] and method == "GET":
+                status, payload = self._page(url.path, query, list(self.types.values()))
+            elif parts == ["import"] and method == "POST":
+                status, payload = self._import(body)
+            elif len(parts) >= 3 and parts[0] == "projects":
+                if parts[2] == "parameters" and len(parts) <= 6:
+                    status, payload = self._handle_parameters(
+                        method, parts, query, url.path, body
+                    )
+                elif parts[2] == "templates" and len(parts) <= 4:
+                    status, payload = self._handle_templates(
+                        method, parts, query, url.path, body
+                    )
+            return status, payload, {}
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                status, payload, headers = stand_in.handle(method, self.path, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def do_PATCH(self):
+                self._respond("PATCH")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a CloudTruth API stand-in")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--page-size", type=int, default=None)
+    parser.add_argument("--throttle-every", type=int, default=None)
+    parser.add_argument("--retry-after", type=float, default=0)
+    args = parser.parse_args()
+    stand_in = CloudTruthStandIn(
+        port=args.port,
+        latency=args.latency,
+        page_size=args.page_size,
+        throttle_every=args.throttle_every,
+        retry_after=args.retry_after,
+    )
+    print(f"Serving on {stand_in.base_host}, set CLOUDTRUTH_API_HOST to use it")
+    try:
+        stand_in.server.serve_forever()
+    except KeyboardInterrupt:
+        stand_in.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
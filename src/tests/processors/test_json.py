@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from dynamic_importer.processors import ConfigPath
+from dynamic_importer.processors.json import JSONProcessor
+
+
+class JSONTestCase(TestCase):
+    def setUp(self) -> None:
+        self.current_dir = pathlib.Path(__file__).parent.resolve()
+        self.processor = JSONProcessor(
+            {"default": f"{self.current_dir}/../../../samples/short.json"}
+        )
+        return super().setUp()
+
+    def test_json_traverse_order(self):
+        template, params = self.processor._traverse_data(
+            "", {"a": [1, {"b": True}], "c": "x"}
+        )
+        self.assertEqual(list(params), ["[a][0]", "[a][1][b]", "[c]"])
+        self.assertEqual(
+            template,
+            {
+                "a": [
+                    "{{ cloudtruth.parameters.a_0 }}",
+                    {"b": "{{ cloudtruth.parameters.a_1_b }}"},
+                ],
+                "c": "{{ cloudtruth.parameters.c }}",
+            },
+        )
+        self.assertEqual(params["[a][1][b]"]["values"], {"default": "true"})
+        self.assertEqual(params["[a][1][b]"]["type"], "boolean")
+
+    def test_json_traverse_deep_nesting(self):
+        # well past the default recursion limit
+        depth = 5000
+        data = node = {}
+        for _ in range(depth):
+            node["child"] = {}
+            node = node["child"]
+        node["leaf"] = 1
+
+        _, params = self.processor._traverse_data("", data)
+        path = "[child]" * depth + "[leaf]"
+        self.assertEqual(list(params), [path])
+        self.assertEqual(params[path]["values"], {"default": 1})
+
+    def test_json_paths(self):
+        path = ConfigPath("").child("a").child(0).child("'b'")
+        self.assertEqual(str(path), "[a][0]['b']")
+        self.assertEqual(path.name_prefix, "a_0")
+        self.assertEqual(self.processor.path_to_param_name(path), "a_0_b")
+        self.assertEqual(self.processor.path_to_param_name("[_x][y[1]]"), "x_y_1")
+
+    def test_json_environment_overlay(self):
+        with TemporaryDirectory() as td:
+            files = {}
+            environments = {
+                "default": {"a": {"x": 1, "y": 2}, "b": [1]},
+                "prod": {"a": {"x": 3}, "b": [4, 5], "c": "only prod"},
+            }
+            for env, data in environments.items():
+                files[env] = os.path.join(td, f"{env}.json")
+                with open(files[env], "w") as fp:
+                    json.dump(data, fp)
+            processor = JSONProcessor(files)
+            prod = processor.raw_data["prod"]
+            template, params = processor.process()
+
+        # values missing from prod keep their references, and values only in
+        # prod are added, without changing prod's own data
+        self.assertEqual(
+            template,
+            {
+                "a": {
+                    "x": "{{ cloudtruth.parameters.a_x }}",
+                    "y": "{{ cloudtruth.parameters.a_y }}",
+                },
+                "b": [
+                    "{{ cloudtruth.parameters.b_0 }}",
+                    "{{ cloudtruth.parameters.b_1 }}",
+                ],
+                "c": "{{ cloudtruth.parameters.c }}",
+            },
+        )
+        self.assertEqual(prod, environments["prod"])
+        self.assertEqual(params["[a][x]"]["values"], {"default": 1, "prod": 3})
+        self.assertEqual(params["[a][y]"]["values"], {"default": 2})
+        self.assertEqual(params["[c]"]["values"], {"prod": "only prod"})
+        self.assertEqual(
+            processor.missing_values,
+            {"[a][y]": ["prod"], "[b][1]": ["default"], "[c]": ["default"]},
+        )
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+import os
+import re
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from dynamic_importer.processors.tf import TFProcessor
+from dynamic_importer.processors.tf import variable_spans
+
+RE_REFERENCE = re.compile(r"\{\{ cloudtruth\.parameters\.(.+?) \}\}")
+
+VARIABLES = """# Networking
+variable "vpc_cidr_block" {
+  type    = string
+  default = "10.0.0.0/16" # the whole VPC
+}
+
+variable "other_cidr_block" {
+  type    = string
+  default = "10.0.0.0/16"
+}
+
+variable "pattern" {
+  description = <<-EOT
+    A } brace and "quotes"
+  EOT
+  type    = string
+  default = "a+b*(c)"
+  validation {
+    condition     = length(var.pattern) > 0
+    error_message = "Must not be empty."
+  }
+}
+
+variable "replicas" {
+  type    = number
+  default = 3
+}
+
+resource "aws_vpc" "main" {
+  cidr_block = var.vpc_cidr_block
+}
+"""
+
+
+class TFTestCase(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, "variables.tf")
+        with open(self.file_path, "w") as fp:
+            fp.write(VARIABLES)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+        return super().tearDown()
+
+    def test_tf_variable_spans(self):
+        variables = variable_spans(VARIABLES)
+        self.assertEqual(
+            [name for name, _ in variables],
+            ["vpc_cidr_block", "other_cidr_block", "pattern", "replicas"],
+        )
+        spans = {
+            name: {k: VARIABLES[start:end] for k, (start, end) in attributes.items()}
+            for name, attributes in variables
+        }
+        self.assertEqual(spans["vpc_cidr_block"]["default"], '"10.0.0.0/16"')
+        self.assertEqual(spans["pattern"]["default"], '"a+b*(c)"')
+        self.assertNotIn("condition", spans["pattern"])
+        self.assertEqual(spans["replicas"]["default"], "3")
+
+    def test_tf_template_references(self):
+        processor = TFProcessor({"default": self.file_path})
+        _, processed_data = processor.process()
+        template_str = processor.generate_template(processed_data)
+        names = [
+            data["param_name"]
+            for path, data in processed_data.items()
+            if path.startswith("[variable]")
+        ]
+        self.assertEqual(len(names), 4)
+        for name in names:
+            self.assertIn(f"{{{{ cloudtruth.parameters.{name} }}}}", template_str)
+        # repeated defaults each get their own reference, and the rest of the
+        # file is untouched
+        self.assertNotIn("10.0.0.0/16", template_str)
+        self.assertNotIn("a+b*(c)", template_str)
+        self.assertIn("# the whole VPC\n", template_str)
+        self.assertIn('    A } brace and "quotes"\n', template_str)
+        self.assertIn("cidr_block = var.vpc_cidr_block", template_str)
+        self.assertNotIn('"{{ cloudtruth.parameters.', template_str)
+
+    def test_tf_template_renders_values(self):
+        processor = TFProcessor({"default": self.file_path})
+        _, processed_data = processor.process()
+        template_str = processor.generate_template(processed_data)
+        # rendered with the values exactly as they are uploaded
+        parameters = {
+            data["param_name"]: data["values"]["default"]
+            for data in processed_data.values()
+        }
+        self.assertEqual(parameters['variable_0_"vpc_cidr_block"'], '"10.0.0.0/16"')
+        rendered = RE_REFERENCE.sub(
+            lambda match: str(parameters[match.group(1)]), template_str
+        )
+        self.assertEqual(rendered, VARIABLES)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+import os
+import re
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from dynamic_importer.processors.tf import value_spans
+from dynamic_importer.processors.tfvars import TFVarsProcessor
+
+RE_REFERENCE = re.compile(r"\{\{ cloudtruth\.parameters\.(.+?) \}\}")
+
+VALUES = """# VPC CIDR block
+vpc_cidr_block = "10.0.0.0/16" # the whole VPC
+other_cidr_block = "10.0.0.0/16"
+subnet_1_cidr = "a+b*(c)"
+ports = [80, 443]
+replicas = 3
+tags = {
+  Name = "x" # name tag
+}
+"""
+
+
+class TFVarsTestCase(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, "terraform.tfvars")
+        with open(self.file_path, "w") as fp:
+            fp.write(VALUES)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+        return super().tearDown()
+
+    def test_tfvars_value_spans(self):
+        spans = {
+            path: VALUES[start:end]
+            for path, (start, end) in value_spans(VALUES).items()
+        }
+        self.assertEqual(spans[("vpc_cidr_block",)], '"10.0.0.0/16"')
+        self.assertEqual(spans[("ports", "1")], "443")
+        self.assertEqual(spans[("tags", "Name")], '"x"')
+
+    def test_tfvars_template_references(self):
+        processor = TFVarsProcessor({"default": self.file_path})
+        _, processed_data = processor.process()
+        template_str = processor.generate_template(processed_data)
+        self.assertEqual(
+            template_str,
+            "# VPC CIDR block\n"
+            "vpc_cidr_block = {{ cloudtruth.parameters.vpc_cidr_block }} # the whole VPC\n"
+            "other_cidr_block = {{ cloudtruth.parameters.other_cidr_block }}\n"
+            "subnet_1_cidr = {{ cloudtruth.parameters.subnet_1_cidr }}\n"
+            "ports = [{{ cloudtruth.parameters.ports_0 }}, "
+            "{{ cloudtruth.parameters.ports_1 }}]\n"
+            "replicas = {{ cloudtruth.parameters.replicas }}\n"
+            "tags = {\n"
+            "  Name = {{ cloudtruth.parameters.tags_Name }} # name tag\n"
+            "}\n",
+        )
+
+    def test_tfvars_template_renders_values(self):
+        processor = TFVarsProcessor({"default": self.file_path})
+        _, processed_data = processor.process()
+        template_str = processor.generate_template(processed_data)
+        parameters = {
+            data["param_name"]: data["values"]["default"]
+            for data in processed_data.values()
+        }
+        # string values keep their quotes, so they are rendered exactly once
+        self.assertEqual(parameters["vpc_cidr_block"], '"10.0.0.0/16"')
+        rendered = RE_REFERENCE.sub(
+            lambda match: str(parameters[match.group(1)]), template_str
+        )
+        self.assertEqual(rendered, VALUES)
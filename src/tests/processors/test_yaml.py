@@ -87,3 +87,25 @@ class YamlTestCase(TestCase):
         # This is a limitation of the current implementation but users can manually override
         self.assertTrue(processed_data["[secret][create]"]["secret"])
         self.assertTrue(processed_data["[secret][name]"]["secret"])
+
+    def test_yaml_unquote_references(self):
+        processor = YAMLProcessor(
+            {"default": f"{self.current_dir}/../../../samples/advanced/values.yaml"}
+        )
+        template_body = (
+            "port: '{{ cloudtruth.parameters.port }}'\n"
+            "name: '{{ cloudtruth.parameters.name }}'\n"
+            "dotted: '{{ cloudtruth.parameters.a.b }}'\n"
+            "axb: '{{ cloudtruth.parameters.axb }}'\n"
+            "inline: x {{ cloudtruth.parameters.port }} '{{ cloudtruth.parameters.port }}'\n"
+        )
+        self.assertEqual(
+            processor.unquote_references(
+                template_body, "'", {"port": "", "name": '"', "a.b": ""}
+            ),
+            "port: {{ cloudtruth.parameters.port }}\n"
+            'name: "{{ cloudtruth.parameters.name }}"\n'
+            "dotted: {{ cloudtruth.parameters.a.b }}\n"
+            "axb: '{{ cloudtruth.parameters.axb }}'\n"
+            "inline: x {{ cloudtruth.parameters.port }} {{ cloudtruth.parameters.port }}\n",
+        )
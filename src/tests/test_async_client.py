@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+import httpx
+from dynamic_importer.api.async_client import AsyncCTClient
+from dynamic_importer.api.exceptions import ResourceNotFoundError
+from tests.fixtures.requests import mocked_httpx_transport
+from tests.fixtures.requests import mocked_requests_upsert_get
+
+
+class TestAsyncClient(IsolatedAsyncioTestCase):
+    async def test_async_client_pool_size(self):
+        async with AsyncCTClient("async-api-key", pool_size=3) as client:
+            pool = client.http._transport._pool
+            self.assertEqual(pool._max_connections, 3)
+            self.assertEqual(pool._max_keepalive_connections, 3)
+
+    async def test_async_client_get(self):
+        async with AsyncCTClient(
+            "async-api-key", transport=mocked_httpx_transport()
+        ) as client:
+            self.assertEqual(await client.get_project_id("myproj"), "1")
+            self.assertEqual(await client.get_environment_id("production"), "2")
+            self.assertDictEqual(
+                await client.get_parameter("myproj", "param1"),
+                {"id": "1", "url": "/projects/1/parameters/1/"},
+            )
+            self.assertDictEqual(
+                await client.get_template("myproj", "template1"),
+                {"id": "1", "url": "/projects/1/templates/1/"},
+            )
+            self.assertDictEqual(
+                await client.get_value("myproj", "param1", "production"),
+                {"id": "1", "url": "/projects/1/parameters/1/values/1/"},
+            )
+            self.assertEqual(await client.get_type_url("string"), "/types/1/")
+
+            with self.assertRaises(ResourceNotFoundError):
+                await client.get_project_id("invalid")
+            with self.assertRaises(ResourceNotFoundError):
+                await client.get_environment_id("invalid")
+            with self.assertRaises(ResourceNotFoundError):
+                await client.get_type_id("invalid")
+            with self.assertRaises(RuntimeError):
+                await client._make_request("invalid", "GET")
+
+    async def test_async_client_upsert(self):
+        async with AsyncCTClient(
+            "async-api-key",
+            transport=mocked_httpx_transport(get=mocked_requests_upsert_get),
+        ) as client:
+            created = await client.upsert_template(
+                "proj2", "template1", "wooooooooo template!", create_dependencies=True
+            )
+            self.assertEqual(created["id"], "2")
+            self.assertEqual(client.cache["projects"]["proj2"]["id"], "2")
+
+            created = await client.upsert_value(
+                "proj3",
+                "param1",
+                "development",
+                "important value",
+                create_dependencies=True,
+            )
+            self.assertEqual(created["id"], "2")
+            self.assertEqual(
+                client.cache["environments"]["development"],
+                {"id": "3", "url": "/environments/3/"},
+            )
+
+        async with AsyncCTClient(
+            "async-api-key", transport=mocked_httpx_transport()
+        ) as client:
+            updated = await client.upsert_value(
+                "myproj", "param1", "production", "important value"
+            )
+            self.assertEqual(updated["id"], "1")
+            with self.assertRaises(ResourceNotFoundError):
+                await client.upsert_parameter("proj5", "param10")
+
+    async def test_async_client_concurrency_limit(self):
+        in_flight = 0
+        max_in_flight = 0
+
+        async def handler(request):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, json={"results": []})
+
+        async with AsyncCTClient(
+            "async-api-key",
+            max_concurrency=3,
+            transport=httpx.MockTransport(handler),
+        ) as client:
+            await asyncio.gather(
+                *[client._make_request("projects", "GET") for _ in range(12)]
+            )
+        self.assertEqual(max_in_flight, 3)
@@ -5,6 +5,7 @@
 #
 from __future__ import annotations
 
+import json
 import os
 import pathlib
 import shutil
@@ -15,11 +16,14 @@ from unittest import mock
 from unittest import TestCase
 
 import pytest
+import requests
 from click.testing import CliRunner
+from dynamic_importer.main import _upload_parameters_concurrently
 from dynamic_importer.main import import_config
 from dynamic_importer.processors import get_processor_class
 from tests.fixtures.requests import mocked_requests_localhost_get
 from tests.fixtures.requests import mocked_requests_localhost_post
+from tests.fixtures.server import CloudTruthStandIn
 
 
 class TestCLI(TestCase):
@@ -55,7 +59,7 @@ Options:
         self.assertEqual(result.exit_code, 2)
         self.assertIn(
             "Error: Invalid value for '-t' / '--file-type': "
-            "'spam' is not one of 'yaml', 'dotenv', 'json', 'tf', 'tfvars'",
+            "'spam' is not one of 'dotenv', 'json', 'tf', 'tfvars', 'yaml'",
             result.output,
         )
 
@@ -274,11 +278,11 @@ def test_cli_process_configs_yaml(tmp_path):
 
 
 @mock.patch(
-    "dynamic_importer.api.client.requests.get",
+    "dynamic_importer.api.client.requests.Session.get",
     side_effect=mocked_requests_localhost_get,
 )
 @mock.patch(
-    "dynamic_importer.api.client.requests.post",
+    "dynamic_importer.api.client.requests.Session.post",
     side_effect=mocked_requests_localhost_post,
 )
 @pytest.mark.usefixtures("tmp_path")
@@ -319,6 +323,281 @@ def test_cli_import_data_json(mock_get, mock_post, tmp_path):
         assert result.exit_code == 0
 
 
+@mock.patch(
+    "dynamic_importer.api.client.requests.Session.get",
+    side_effect=mocked_requests_localhost_get,
+)
+@mock.patch(
+    "dynamic_importer.api.client.requests.Session.post",
+    side_effect=mocked_requests_localhost_post,
+)
+@pytest.mark.usefixtures("tmp_path")
+def test_cli_import_data_json_concurrent(mock_post, mock_get, tmp_path):
+    runner = CliRunner(
+        env={"CLOUDTRUTH_API_HOST": "localhost:8000", "CLOUDTRUTH_API_KEY": "test"}
+    )
+    current_dir = pathlib.Path(__file__).parent.resolve()
+    with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+        result = runner.invoke(
+            import_config,
+            [
+                "process-configs",
+                "-t",
+                "json",
+                "-p",
+                "testproj",
+                "--default-values",
+                f"{current_dir}/../../samples/short.json",
+                "-o",
+                td,
+            ],
+            catch_exceptions=False,
+        )
+        assert result.exit_code == 0
+
+        result = runner.invoke(
+            import_config,
+            [
+                "create-data",
+                "-d",
+                f"{td}/testproj-json.ctconfig",
+                "-m",
+                f"{td}/testproj-json.cttemplate",
+                "--jobs",
+                "4",
+            ],
+            catch_exceptions=False,
+        )
+        assert result.exit_code == 0, result.output
+        # 9 parameters, 9 values and the template
+        assert mock_post.call_count == 19
+
+
+@mock.patch(
+    "dynamic_importer.api.client.requests.Session.get",
+    side_effect=mocked_requests_localhost_get,
+)
+@mock.patch("dynamic_importer.api.client.requests.Session.post")
+@pytest.mark.usefixtures("tmp_path")
+def test_cli_create_data_resume(mock_post, mock_get, tmp_path):
+    failures = [5]
+
+    def flaky_post(*args, **kwargs):
+        if failures and mock_post.call_count == failures[0]:
+            failures.pop()
+            raise requests.ConnectionError("connection reset")
+        return mocked_requests_localhost_post(*args, **kwargs)
+
+    mock_post.side_effect = flaky_post
+    runner = CliRunner(
+        env={"CLOUDTRUTH_API_HOST": "localhost:8000", "CLOUDTRUTH_API_KEY": "test"}
+    )
+    current_dir = pathlib.Path(__file__).parent.resolve()
+    with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+        result = runner.invoke(
+            import_config,
+            [
+                "process-configs",
+                "-t",
+                "json",
+                "-p",
+                "testproj",
+                "--default-values",
+                f"{current_dir}/../../samples/short.json",
+                "-o",
+                td,
+            ],
+            catch_exceptions=False,
+        )
+        assert result.exit_code == 0
+        create_data = [
+            "create-data",
+            "-d",
+            f"{td}/testproj-json.ctconfig",
+            "-m",
+            f"{td}/testproj-json.cttemplate",
+        ]
+
+        result = runner.invoke(import_config, create_data)
+        assert result.exit_code == 1
+        journal = pathlib.Path(f"{td}/testproj-json.ctconfig.journal")
+        # the first two parameters and their values completed
+        assert len(journal.read_text().splitlines()) == 4
+
+        result = runner.invoke(import_config, [*create_data, "--resume", "--diff"])
+        assert result.exit_code == 2
+        assert "--resume can not be combined with --diff" in result.output
+        assert len(journal.read_text().splitlines()) == 4
+
+        mock_post.reset_mock()
+        result = runner.invoke(
+            import_config, [*create_data, "--resume"], catch_exceptions=False
+        )
+        assert result.exit_code == 0, result.output
+        assert "Resuming: skipping 4 completed uploads" in result.output
+        # 19 uploads in total, 4 of them done by the first run
+        assert mock_post.call_count == 15
+        assert not journal.exists()
+
+
+@pytest.mark.usefixtures("tmp_path")
+@pytest.mark.timeout(30)
+def test_cli_import_data_json_bulk(tmp_path):
+    current_dir = pathlib.Path(__file__).parent.resolve()
+    with CloudTruthStandIn() as stand_in:
+        runner = CliRunner(
+            env={
+                "CLOUDTRUTH_API_HOST": stand_in.base_host,
+                "CLOUDTRUTH_API_KEY": "test",
+            }
+        )
+        with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+            result = runner.invoke(
+                import_config,
+                [
+                    "process-configs",
+                    "-t",
+                    "json",
+                    "-p",
+                    "testproj",
+                    "--default-values",
+                    f"{current_dir}/../../samples/short.json",
+                    "-o",
+                    td,
+                ],
+                catch_exceptions=False,
+            )
+            assert result.exit_code == 0
+
+            result = runner.invoke(
+                import_config,
+                [
+                    "create-data",
+                    "-d",
+                    f"{td}/testproj-json.ctconfig",
+                    "-m",
+                    f"{td}/testproj-json.cttemplate",
+                    "-c",
+                    "--bulk",
+                    "--batch-size",
+                    "4",
+                    "--metrics-file",
+                    f"{td}/metrics.json",
+                ],
+                catch_exceptions=False,
+            )
+            assert result.exit_code == 0, result.output
+            with open(f"{td}/metrics.json") as fp:
+                metrics = json.load(fp)
+
+    import_requests = [r for r in stand_in.requests if r[1] == "/api/v1/import/"]
+    assert metrics["parameters"] == 9
+    assert metrics["total_requests"] == len(stand_in.requests)
+    import_metrics = [m for m in metrics["requests"] if m["endpoint"] == "/import/"]
+    assert import_metrics[0]["count"] == 3
+    assert import_metrics[0]["bytes_received"] > 0
+    # 9 parameters in batches of 4
+    assert [len(r[2]["parameters"]) for r in import_requests] == [4, 4, 1]
+    assert len(stand_in.parameters) == 9
+    assert stand_in.parameters[("testproj", "b_c")] == {
+        "type": "integer",
+        "secret": False,
+        "values": {"default": 2},
+    }
+    assert "testproj" in stand_in.projects
+    assert len(stand_in.templates["1"]) == 1
+
+
+@pytest.mark.usefixtures("tmp_path")
+@pytest.mark.timeout(60)
+def test_cli_import_data_json_stand_in(tmp_path):
+    current_dir = pathlib.Path(__file__).parent.resolve()
+    # small pages and regular 429s, as seen from a busy organization
+    with CloudTruthStandIn(page_size=2, throttle_every=7) as stand_in:
+        runner = CliRunner(
+            env={
+                "CLOUDTRUTH_API_HOST": stand_in.base_host,
+                "CLOUDTRUTH_API_KEY": "test",
+            }
+        )
+        with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+            result = runner.invoke(
+                import_config,
+                [
+                    "process-configs",
+                    "-t",
+                    "json",
+                    "-p",
+                    "testproj",
+                    "--default-values",
+                    f"{current_dir}/../../samples/short.json",
+                    "-o",
+                    td,
+                ],
+                catch_exceptions=False,
+            )
+            assert result.exit_code == 0
+            create_data = [
+                "create-data",
+                "-d",
+                f"{td}/testproj-json.ctconfig",
+                "-m",
+                f"{td}/testproj-json.cttemplate",
+                "-c",
+                "--jobs",
+                "4",
+            ]
+            result = runner.invoke(import_config, create_data, catch_exceptions=False)
+            assert result.exit_code == 0, result.output
+
+            with open(f"{td}/testproj-json.ctconfig") as fp:
+                config_data = json.load(fp)["testproj"]
+            config_data["[b][c]"]["values"]["default"] = 3
+            with open(f"{td}/testproj-json.ctconfig", "w") as fp:
+                json.dump({"testproj": config_data}, fp)
+            result = runner.invoke(import_config, create_data, catch_exceptions=False)
+            assert result.exit_code == 0, result.output
+
+    assert stand_in.throttled > 0
+    assert len(stand_in.parameters) == 9
+    assert stand_in.parameters[("testproj", "b_c")]["values"] == {"default": 3}
+    assert stand_in.parameters[("testproj", "a")]["values"] == {"default": 1}
+    methods = [request[0] for request in stand_in.requests]
+    assert "PATCH" in methods
+    assert len(stand_in.templates["1"]) == 1
+
+
+def test_upload_parameters_concurrently_orders_values():
+    client = mock.MagicMock()
+    config_data = {
+        f"[param{i}]": {
+            "param_name": f"param{i}",
+            "type": "string",
+            "secret": False,
+            "values": {"default": f"value{i}", "production": f"prod{i}"},
+        }
+        for i in range(20)
+    }
+    _upload_parameters_concurrently(client, config_data, "myproj", True, 4)
+
+    assert client.upsert_parameter.call_count == 20
+    assert client.upsert_value.call_count == 40
+    call_names = [
+        (c[0], c.kwargs.get("name") or c.args[1])
+        for c in client.mock_calls
+        if c[0] in ("upsert_parameter", "upsert_value")
+    ]
+    for i in range(20):
+        param_idx = call_names.index(("upsert_parameter", f"param{i}"))
+        value_idxs = [
+            idx
+            for idx, call in enumerate(call_names)
+            if call == ("upsert_value", f"param{i}")
+        ]
+        assert len(value_idxs) == 2
+        assert all(idx > param_idx for idx in value_idxs)
+
+
 def test_cli_process_configs_missing_outputdir():
     runner = CliRunner()
     current_dir = pathlib.Path(__file__).parent.resolve()
@@ -344,3 +623,71 @@ def test_cli_process_configs_missing_outputdir():
     finally:
         if os.path.exists(dest_dir):
             shutil.rmtree(dest_dir)
+
+
+@pytest.mark.usefixtures("tmp_path")
+@pytest.mark.timeout(30)
+def test_cli_plan_after_import(tmp_path):
+    current_dir = pathlib.Path(__file__).parent.resolve()
+    with CloudTruthStandIn() as stand_in:
+        runner = CliRunner(
+            env={
+                "CLOUDTRUTH_API_HOST": stand_in.base_host,
+                "CLOUDTRUTH_API_KEY": "test",
+            }
+        )
+        with runner.isolated_filesystem(temp_dir=tmp_path) as td:
+            result = runner.invoke(
+                import_config,
+                [
+                    "process-configs",
+                    "-t",
+                    "json",
+                    "-p",
+                    "testproj",
+                    "--default-values",
+                    f"{current_dir}/../../samples/short.json",
+                    "-o",
+                    td,
+                ],
+                catch_exceptions=False,
+            )
+            assert result.exit_code == 0
+            files = [
+                "-d",
+                f"{td}/testproj-json.ctconfig",
+                "-m",
+                f"{td}/testproj-json.cttemplate",
+            ]
+
+            result = runner.invoke(
+                import_config, ["plan", *files], catch_exceptions=False
+            )
+            assert result.exit_code == 0, result.output
+            assert "+ create parameter b_c" in result.output
+            assert "Plan: 19 to create, 0 to update, 0 unchanged" in result.output
+
+            result = runner.invoke(
+                import_config,
+                ["create-data", *files, "-c", "--bulk"],
+                catch_exceptions=False,
+            )
+            assert result.exit_code == 0, result.output
+
+            result = runner.invoke(
+                import_config, ["plan", *files], catch_exceptions=False
+            )
+            assert result.exit_code == 0, result.output
+            assert "Plan: 0 to create, 0 to update, 19 unchanged" in result.output
+
+            requests_before = len(stand_in.requests)
+            result = runner.invoke(
+                import_config,
+                ["create-data", *files, "--diff"],
+                catch_exceptions=False,
+            )
+            assert result.exit_code == 0, result.output
+            assert "Plan: 0 to create, 0 to update, 19 unchanged" in result.output
+
+    # an unchanged project is only read, never written
+    assert all(r[0] == "GET" for r in stand_in.requests[requests_before:])
@@ -5,17 +5,27 @@
 #
 from __future__ import annotations
 
+import json
 import os
+import threading
+import time
+from tempfile import TemporaryDirectory
 from unittest import mock
 from unittest import TestCase
 
+import pytest
+import requests
 from dynamic_importer.api.client import CTClient
 from dynamic_importer.api.client import DEFAULT_API_HOST
 from dynamic_importer.api.exceptions import ResourceNotFoundError
+from tests.fixtures.clock import FakeClock
 from tests.fixtures.requests import mocked_requests_get
+from tests.fixtures.requests import mocked_requests_paginated_get
 from tests.fixtures.requests import mocked_requests_patch
 from tests.fixtures.requests import mocked_requests_post
+from tests.fixtures.requests import mocked_requests_prefetch_get
 from tests.fixtures.requests import mocked_requests_upsert_get
+from tests.fixtures.server import CloudTruthStandIn
 
 
 class TestClient(TestCase):
@@ -24,15 +34,353 @@ class TestClient(TestCase):
         client = CTClient(mock_api_key)
         self.assertEqual(client.base_url, f"https://{DEFAULT_API_HOST}/api/v1")
         self.assertEqual(client.headers, {"Authorization": f"Api-Key {mock_api_key}"})
-        self.assertEqual(client.cache, {})
+        self.assertEqual(len(client.cache), 0)
 
     @mock.patch.dict(os.environ, {"CLOUDTRUTH_API_HOST": "localhost:8000"})
     def test_client_init_with_host_override(self):
         client = CTClient("super-secret-api-key11!!")
         self.assertEqual(client.base_url, "https://localhost:8000/api/v1")
 
+    @mock.patch.dict(os.environ, {"CLOUDTRUTH_API_HOST": "http://127.0.0.1:8000"})
+    def test_client_init_with_host_scheme_override(self):
+        client = CTClient("super-secret-api-key11!!")
+        self.assertEqual(client.base_url, "http://127.0.0.1:8000/api/v1")
+
+    def test_client_session_pooling(self):
+        client = CTClient(
+            "pool-party", pool_size=25, connect_timeout=2, read_timeout=30
+        )
+        adapter = client.session.get_adapter(client.base_url)
+        self.assertEqual(adapter._pool_maxsize, 25)
+        self.assertEqual(adapter.max_retries.total, 3)
+        self.assertNotIn("POST", adapter.max_retries.allowed_methods)
+        self.assertNotIn("PATCH", adapter.max_retries.allowed_methods)
+        self.assertEqual(client.timeout, (2, 30))
+        self.assertEqual(client.session.headers["Authorization"], "Api-Key pool-party")
+
+    @mock.patch(
+        "dynamic_importer.api.client.requests.Session.get",
+        side_effect=mocked_requests_paginated_get,
+    )
+    def test_client_pagination(self, mock_get):
+        client = CTClient("page-turner")
+
+        # found on the first page, so later pages are never requested
+        self.assertEqual(client.get_project_id("myproj"), "1")
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertIsNone(client.cache.get("projects", "proj2"))
+
+        # the next link is followed until the project is found
+        self.assertEqual(client.get_project_id("proj2"), "2")
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertIsNone(client.cache.get("projects", "proj3"))
+
+        # every page is read before giving up
+        client = CTClient("page-turner")
+        with self.assertRaises(ResourceNotFoundError):
+            client.get_project_id("invalid")
+        self.assertEqual(mock_get.call_count, 6)
+        self.assertEqual(
+            {project.key for project in client.cache.resources("projects")},
+            {("myproj",), ("proj2",), ("proj3",)},
+        )
+
+    @mock.patch(
+        "dynamic_importer.api.client.requests.Session.get",
+        side_effect=mocked_requests_prefetch_get,
+    )
+    def test_client_prefetch_project(self, mock_get):
+        client = CTClient("fetch-it-all")
+        snapshot = client.prefetch_project("myproj")
+        self.assertEqual(mock_get.call_count, 4)
+        parameter_calls = [
+            call
+            for call in mock_get.call_args_list
+            if call.args[0].endswith("/parameters/")
+        ]
+        self.assertEqual(
+            parameter_calls[0].kwargs["params"],
+            {"immediate_parameters": True, "values": True, "mask_secrets": True},
+        )
+        self.assertEqual(
+            snapshot["templates"]["mytemplate"]["body"],
+            "PARAM1={{ cloudtruth.parameters.param1 }}",
+        )
+
+        self.assertEqual(client.get_parameter_id("myproj", "param2"), "2")
+        self.assertEqual(
+            client.get_value("myproj", "param1", "default")["id"],
+            "1",
+        )
+        # environment name is resolved from the environment url
+        self.assertEqual(
+            client.get_value("myproj", "param1", "production")["id"],
+            "2",
+        )
+        # inherited values are never treated as set in the inheriting environment
+        with self.assertRaises(ResourceNotFoundError):
+            client.get_value("myproj", "param1", "staging")
+        with self.assertRaises(ResourceNotFoundError):
+            client.get_value("myproj", "param2", "default")
+        with self.assertRaises(ResourceNotFoundError):
+            client.get_parameter("myproj", "param3")
+        self.assertEqual(mock_get.call_count, 4)
+
+        # secret values are only revealed when asked for, e.g. to build a plan
+        client.get_project_snapshot("myproj", unmask_secrets=True)
+        self.assertFalse(mock_get.call_args_list[-2].kwargs["params"]["mask_secrets"])
+
+    @mock.patch("dynamic_importer.api.client.requests.Session.patch")
+    @mock.patch(
+        "dynamic_importer.api.client.requests.Session.get",
+        side_effect=mocked_requests_prefetch_get,
+    )
+    def test_client_skips_unchanged_template(self, mock_get, mock_patch):
+        body = "PARAM1={{ cloudtruth.parameters.param1 }}"
+        client = CTClient("same-again")
+        client.prefetch_project("myproj")
+        self.assertTrue(client.template_unchanged("myproj", "mytemplate", body))
+        client.upsert_template("myproj", "mytemplate", body)
+        mock_patch.assert_not_called()
+        self.assertEqual(client.metrics.skipped_uploads["templates"], 1)
+        self.assertEqual(client.metrics.bytes_saved["templates"], len(body))
+
+        updated = mock.Mock(status_code=200, headers={})
+        updated.json.return_value = {"id": "1", "url": "/projects/1/templates/1/"}
+        mock_patch.return_value = updated
+        client.upsert_template("myproj", "mytemplate", f"{body}\n")
+        mock_patch.assert_called_once()
+        # the uploaded body is remembered, so the next sync skips it
+        self.assertTrue(client.template_unchanged("myproj", "mytemplate", f"{body}\n"))
+        self.assertFalse(client.template_unchanged("myproj", "missing", body))
+
+    @mock.patch(
+        "dynamic_importer.api.client.requests.Session.get",
+        side_effect=mocked_requests_get,
+    )
+    def test_client_disk_cache(self, mock_get):
+        with TemporaryDirectory() as tmp_dir:
+            cache_file = f"{tmp_dir}/ids.json"
+            with CTClient("warm-start", cache_file=cache_file) as client:
+                self.assertFalse(client.warm_from_disk)
+                client.get_parameter_id("myproj", "param1")
+                client.get_type_id("string")
+            self.assertEqual(mock_get.call_count, 3)
+
+            with CTClient("warm-start", cache_file=cache_file) as client:
+                self.assertTrue(client.warm_from_disk)
+                self.assertEqual(client.get_project_id("myproj"), "1")
+                self.assertEqual(client.get_parameter_id("myproj", "param1"), "1")
+                self.assertEqual(client.get_type_url("string"), "/types/1/")
+                self.assertEqual(client.cache.resources("values"), [])
+            self.assertEqual(mock_get.call_count, 3)
+
+            # a different org or an expired entry starts cold
+            client = CTClient("another-org", cache_file=cache_file)
+            self.assertFalse(client.warm_from_disk)
+            client = CTClient("warm-start", cache_file=cache_file, cache_ttl=-1)
+            self.assertFalse(client.warm_from_disk)
+
+            # a 404 means cached ids are stale, so the cache file entry is dropped
+            client = CTClient("warm-start", cache_file=cache_file)
+            self.assertTrue(client.warm_from_disk)
+            with self.assertRaises(RuntimeError):
+                client._make_request("invalid", "GET")
+            self.assertFalse(client.warm_from_disk)
+            self.assertEqual(len(client.cache), 0)
+            client = CTClient("warm-start", cache_file=cache_file)
+            self.assertFalse(client.warm_from_disk)
+
     @mock.patch(
-        "dynamic_importer.api.client.requests.get", side_effect=mocked_requests_get
+        "dynamic_importer.api.client.requests.Session.get",
+        side_effect=mocked_requests_get,
+    )
+    def test_client_disk_cache_expiry(self, mock_get):
+        with TemporaryDirectory() as tmp_dir:
+            cache_file = f"{tmp_dir}/ids.json"
+            with CTClient("warm-start", cache_file=cache_file) as client:
+                client.get_project_id("myproj")
+                client.get_type_id("string")
+            with open(cache_file) as fp:
+                data = json.load(fp)
+            entry = next(iter(data["entries"].values()))
+            aged = time.time() - 3500
+            entry["projects"][0][-1] = aged
+            with open(cache_file, "w") as fp:
+                json.dump(data, fp)
+
+            # loading and closing again does not renew what was not fetched
+            with CTClient("warm-start", cache_file=cache_file) as client:
+                client.get_type_id("string")
+            self.assertEqual(mock_get.call_count, 2)
+            with open(cache_file) as fp:
+                entry = next(iter(json.load(fp)["entries"].values()))
+            self.assertEqual(entry["projects"][0][-1], aged)
+
+            # the aged row expires on its own, the others are kept
+            client = CTClient("warm-start", cache_file=cache_file, cache_ttl=3000)
+            self.assertIsNone(client.cache.get("projects", "myproj"))
+            self.assertIsNotNone(client.cache.get("types", "string"))
+
+    def test_client_disk_cache_recreated_project(self):
+        with TemporaryDirectory() as tmp_dir, CloudTruthStandIn() as stand_in:
+            cache_file = f"{tmp_dir}/ids.json"
+            stand_in._add_project("myproj")
+            with mock.patch.dict(
+                os.environ, {"CLOUDTRUTH_API_HOST": stand_in.base_host}
+            ):
+                with CTClient("warm-start", cache_file=cache_file) as client:
+                    self.assertEqual(client.get_project_id("myproj"), "1")
+
+                # the project is deleted and created again with a new id
+                stand_in.projects["myproj"].update(id="2", url="/projects/2/")
+                client = CTClient("warm-start", cache_file=cache_file)
+                self.assertTrue(client.warm_from_disk)
+                snapshot = client.prefetch_project("myproj")
+            self.assertEqual(snapshot, {"parameters": {}, "templates": {}})
+            self.assertFalse(client.warm_from_disk)
+            self.assertEqual(client.get_project_id("myproj"), "2")
+
+    @mock.patch(
+        "dynamic_importer.api.client.requests.Session.get",
+        side_effect=mocked_requests_get,
+    )
+    def test_client_reuses_session_with_timeout(self, mock_get):
+        with CTClient("keep-alive", read_timeout=5) as client:
+            client.get_project_id("myproj")
+            client.get_environment_id("production")
+        self.assertEqual(mock_get.call_count, 2)
+        for call in mock_get.call_args_list:
+            self.assertEqual(call.kwargs["timeout"], (10.0, 5))
+
+    @mock.patch(
+        "dynamic_importer.api.client.requests.Session.get",
+        side_effect=requests.ConnectTimeout("timed out"),
+    )
+    def test_client_transport_error(self, mock_get):
+        client = CTClient("hung-socket")
+        with self.assertRaises(RuntimeError):
+            client.get_project_id("myproj")
+
+    @mock.patch("dynamic_importer.api.client.requests.Session.get")
+    def test_client_filtered_lookup(self, mock_get):
+        def filtered_get(*args, **kwargs):
+            response = mocked_requests_get(*args, **kwargs)
+            name = (kwargs.get("params") or {}).get("name")
+            if name is not None:
+                response.json_data = {
+                    "results": [
+                        resource
+                        for resource in response.json_data["results"]
+                        if resource["name"] == name
+                    ]
+                }
+            return response
+
+        mock_get.side_effect = filtered_get
+        client = CTClient("filter-it")
+        self.assertEqual(client.get_project_id("myproj"), "1")
+        self.assertEqual(client.get_environment_url("production"), "/environments/2/")
+        self.assertEqual(client.get_type_id("string"), "1")
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertEqual(mock_get.call_args.kwargs["params"], {"name": "string"})
+        self.assertEqual(client.cache.resources("environments")[0].key, ("production",))
+
+        # an empty filtered result answers repeated misses for that name
+        with self.assertRaises(ResourceNotFoundError):
+            client.get_project_id("invalid")
+        with self.assertRaises(ResourceNotFoundError):
+            client.get_project_id("invalid")
+        self.assertEqual(mock_get.call_count, 4)
+        self.assertEqual(client.unfiltered_kinds, set())
+
+        # an API that ignores the filter is listed instead
+        mock_get.side_effect = mocked_requests_paginated_get
+        client = CTClient("filter-it")
+        self.assertEqual(client.get_project_id("proj2"), "2")
+        self.assertEqual(mock_get.call_count, 6)
+        self.assertEqual(client.unfiltered_kinds, {"projects"})
+        self.assertEqual(client.get_project_id("proj3"), "3")
+        self.assertEqual(mock_get.call_args.kwargs["params"], None)
+
+    @mock.patch("dynamic_importer.api.client.requests.Session.get")
+    def test_client_single_flight(self, mock_get):
+        release = threading.Event()
+
+        def slow_get(*args, **kwargs):
+            release.wait(timeout=5)
+            return mocked_requests_get(*args, **kwargs)
+
+        mock_get.side_effect = slow_get
+        client = CTClient("single-flight")
+        threads = [
+            threading.Thread(target=client.get_project_id, args=("myproj",))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        release.set()
+        for thread in threads:
+            thread.join()
+        # every lookup waited on the first listing instead of sending its own
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(client.single_flight.calls, {})
+
+    @mock.patch("dynamic_importer.api.rate_limit.time", new_callable=FakeClock)
+    @mock.patch("dynamic_importer.api.client.requests.Session.post")
+    @mock.patch("dynamic_importer.api.client.requests.Session.get")
+    def test_client_throttled(self, mock_get, mock_post, clock):
+        def throttled(status_code, retry_after=None):
+            headers = {"Retry-After": retry_after} if retry_after else {}
+            return mock.Mock(status_code=status_code, headers=headers, text="slow down")
+
+        ok = mock.Mock(status_code=200, headers={})
+        ok.json.return_value = {"results": [{"id": "1", "url": "/p/1/", "name": "p"}]}
+        mock_get.side_effect = [throttled(429, "2"), throttled(503), ok]
+        client = CTClient("throttled")
+        self.assertEqual(client.get_project_id("p"), "1")
+        self.assertEqual(mock_get.call_count, 3)
+        # Retry-After is honoured, with up to a second of jitter
+        self.assertTrue(2 <= clock.sleeps[0] <= 3)
+
+        # a 503 may have been partially applied, so POST is not replayed
+        mock_post.side_effect = [throttled(503)]
+        with self.assertRaises(RuntimeError):
+            client._make_request("projects", "POST", data={"name": "q"})
+        self.assertEqual(mock_post.call_count, 1)
+
+        # a 429 was never handled, so any method is sent again
+        created = mock.Mock(status_code=201, headers={})
+        created.json.return_value = {"id": "2"}
+        mock_post.side_effect = [throttled(429, "0"), created]
+        client._make_request("projects", "POST", data={"name": "q"})
+        self.assertEqual(mock_post.call_count, 3)
+
+        # retries are bounded
+        mock_get.side_effect = None
+        mock_get.return_value = throttled(429, "0")
+        client = CTClient("throttled", throttle_retries=2)
+        with self.assertRaises(RuntimeError):
+            client.get_project_id("p")
+        self.assertEqual(mock_get.call_count, 6)
+
+    @pytest.mark.timeout(30)
+    def test_client_throttled_through_adapter(self):
+        with CloudTruthStandIn(throttle_every=1, retry_after=0.5) as stand_in:
+            with mock.patch.dict(
+                os.environ, {"CLOUDTRUTH_API_HOST": stand_in.base_host}
+            ):
+                client = CTClient("throttled", max_retries=3, throttle_retries=1)
+                with self.assertRaises(RuntimeError) as raised:
+                    client.get_project("myproj")
+            # only the client retries throttled requests, the adapter does not
+            self.assertEqual(len(stand_in.requests), 2)
+            self.assertIn("status code 429", str(raised.exception))
+
+    @mock.patch(
+        "dynamic_importer.api.client.requests.Session.get",
+        side_effect=mocked_requests_get,
     )
     def test_client_get(self, mock_get):
         client = CTClient("super-secret-api-key11!!")
@@ -41,7 +389,8 @@ class TestClient(TestCase):
         self.assertEqual(client.get_project_id("myproj"), "1")
         self.assertEqual(mock_get.call_count, 1)
         self.assertDictEqual(
-            client.cache["projects"]["myproj"], {"id": "1", "url": "/projects/1/"}
+            client.cache.get("projects", "myproj").to_dict(),
+            {"id": "1", "url": "/projects/1/"},
         )
         self.assertEqual(client.get_project_id("myproj"), "1")
         self.assertEqual(mock_get.call_count, 1)
@@ -50,7 +399,7 @@ class TestClient(TestCase):
         self.assertEqual(client.get_environment_id("production"), "2")
         self.assertEqual(mock_get.call_count, 2)
         self.assertDictEqual(
-            client.cache["environments"]["production"],
+            client.cache.get("environments", "production").to_dict(),
             {"id": "2", "url": "/environments/2/"},
         )
         self.assertEqual(client.get_environment_url("production"), "/environments/2/")
@@ -63,7 +412,7 @@ class TestClient(TestCase):
         )
         self.assertEqual(mock_get.call_count, 3)
         self.assertDictEqual(
-            client.cache["parameters"]["myproj/param1"],
+            client.cache.get("parameters", "myproj", "param1").to_dict(),
             {"id": "1", "url": "/projects/1/parameters/1/"},
         )
         self.assertEqual(client.get_parameter_id("myproj", "param1"), "1")
@@ -81,7 +430,7 @@ class TestClient(TestCase):
         )
         self.assertEqual(mock_get.call_count, 4)
         self.assertDictEqual(
-            client.cache["templates"]["myproj/template1"],
+            client.cache.get("templates", "myproj", "template1").to_dict(),
             {"id": "1", "url": "/projects/1/templates/1/"},
         )
         self.assertDictEqual(
@@ -97,7 +446,7 @@ class TestClient(TestCase):
         )
         self.assertEqual(mock_get.call_count, 5)
         self.assertDictEqual(
-            client.cache["values"]["myproj/param1/production"],
+            client.cache.get("values", "myproj", "param1", "production").to_dict(),
             {"id": "1", "url": "/projects/1/parameters/1/values/1/"},
         )
         self.assertDictEqual(
@@ -110,7 +459,8 @@ class TestClient(TestCase):
         self.assertEqual(client.get_type_id("string"), "1")
         self.assertEqual(mock_get.call_count, 6)
         self.assertDictEqual(
-            client.cache["types"]["string"], {"id": "1", "url": "/types/1/"}
+            client.cache.get("types", "string").to_dict(),
+            {"id": "1", "url": "/types/1/"},
         )
         self.assertEqual(client.get_type_url("string"), "/types/1/")
         self.assertEqual(mock_get.call_count, 6)
@@ -122,37 +472,46 @@ class TestClient(TestCase):
         with self.assertRaises(ResourceNotFoundError):
             client.get_environment_id("invalid")
         self.assertEqual(mock_get.call_count, 8)
+        # complete listings answer later misses without another request
         with self.assertRaises(ResourceNotFoundError):
             client.get_environment_url("invalid"), None
-        self.assertEqual(mock_get.call_count, 9)
+        self.assertEqual(mock_get.call_count, 8)
         with self.assertRaises(ResourceNotFoundError):
             client.get_parameter("invalid", "invalid")
-        self.assertEqual(mock_get.call_count, 10)
+        self.assertEqual(mock_get.call_count, 8)
         with self.assertRaises(ResourceNotFoundError):
             client.get_parameter_id("invalid", "invalid")
-        self.assertEqual(mock_get.call_count, 11)
+        self.assertEqual(mock_get.call_count, 8)
         with self.assertRaises(ResourceNotFoundError):
             client.get_template("invalid", "invalid")
-        self.assertEqual(mock_get.call_count, 12)
+        self.assertEqual(mock_get.call_count, 8)
         with self.assertRaises(ResourceNotFoundError):
             client.get_value("invalid", "invalid", "invalid")
-        self.assertEqual(mock_get.call_count, 13)
+        self.assertEqual(mock_get.call_count, 8)
         with self.assertRaises(ResourceNotFoundError):
             client.get_type_id("invalid")
-        self.assertEqual(mock_get.call_count, 14)
+        self.assertEqual(mock_get.call_count, 9)
         with self.assertRaises(ResourceNotFoundError):
             client.get_type_url("invalid")
-        self.assertEqual(mock_get.call_count, 15)
+        self.assertEqual(mock_get.call_count, 9)
+        with self.assertRaises(ResourceNotFoundError):
+            client.get_parameter("myproj", "invalid")
+        self.assertEqual(mock_get.call_count, 10)
+        with self.assertRaises(ResourceNotFoundError):
+            client.get_parameter("myproj", "other")
+        self.assertEqual(mock_get.call_count, 10)
 
         # generic failure
         with self.assertRaises(RuntimeError):
             client._make_request("invalid", "GET")
 
     @mock.patch(
-        "dynamic_importer.api.client.requests.get", side_effect=mocked_requests_get
+        "dynamic_importer.api.client.requests.Session.get",
+        side_effect=mocked_requests_get,
     )
     @mock.patch(
-        "dynamic_importer.api.client.requests.post", side_effect=mocked_requests_post
+        "dynamic_importer.api.client.requests.Session.post",
+        side_effect=mocked_requests_post,
     )
     def test_client_create(self, mock_post, mock_get):
         client = CTClient("time-to-create-the-things")
@@ -160,6 +519,7 @@ class TestClient(TestCase):
         mock_post.assert_called_once()
         client.create_environment("production")
         self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(client.get_environment_url("production"), "/environments/3/")
         client.create_parameter("myproj", "param1")
         self.assertEqual(mock_post.call_count, 3)
         client.create_template("myproj", "template1", "wooooooooo template!")
@@ -168,14 +528,16 @@ class TestClient(TestCase):
         self.assertEqual(mock_post.call_count, 5)
 
     @mock.patch(
-        "dynamic_importer.api.client.requests.get",
+        "dynamic_importer.api.client.requests.Session.get",
         side_effect=mocked_requests_upsert_get,
     )
     @mock.patch(
-        "dynamic_importer.api.client.requests.patch", side_effect=mocked_requests_patch
+        "dynamic_importer.api.client.requests.Session.patch",
+        side_effect=mocked_requests_patch,
     )
     @mock.patch(
-        "dynamic_importer.api.client.requests.post", side_effect=mocked_requests_post
+        "dynamic_importer.api.client.requests.Session.post",
+        side_effect=mocked_requests_post,
     )
     def test_client_upsert_create_dependencies(self, mock_post, mock_patch, mock_get):
         client = CTClient("lets-get-upserting")
@@ -197,13 +559,16 @@ class TestClient(TestCase):
         self.assertEqual(mock_post.call_count, 8)
 
     @mock.patch(
-        "dynamic_importer.api.client.requests.get", side_effect=mocked_requests_get
+        "dynamic_importer.api.client.requests.Session.get",
+        side_effect=mocked_requests_get,
     )
     @mock.patch(
-        "dynamic_importer.api.client.requests.patch", side_effect=mocked_requests_patch
+        "dynamic_importer.api.client.requests.Session.patch",
+        side_effect=mocked_requests_patch,
     )
     @mock.patch(
-        "dynamic_importer.api.client.requests.post", side_effect=mocked_requests_post
+        "dynamic_importer.api.client.requests.Session.post",
+        side_effect=mocked_requests_post,
     )
     def test_client_upsert_no_create_dependencies(
         self, mock_post, mock_patch, mock_get
@@ -223,7 +588,8 @@ class TestClient(TestCase):
         self.assertEqual(mock_patch.call_count, 2)
 
     @mock.patch(
-        "dynamic_importer.api.client.requests.get", side_effect=mocked_requests_get
+        "dynamic_importer.api.client.requests.Session.get",
+        side_effect=mocked_requests_get,
     )
     def test_client_upsert_raises(self, mock_get):
         client = CTClient("time-to-error-out!")
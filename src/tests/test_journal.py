@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+import pytest
+from dynamic_importer.journal import UploadJournal
+
+
+@pytest.mark.timeout(5)
+def test_journal_flush_while_recording(tmp_path):
+    journal = UploadJournal(str(tmp_path / "data.ctconfig.journal"))
+    write = journal.fp.write
+
+    def interrupted_write(line):
+        # a SIGINT handler runs in the thread that holds the lock
+        journal.flush()
+        return write(line)
+
+    journal.fp.write = interrupted_write  # type: ignore[method-assign]
+    journal.record("parameter", "proj", "param1", payload={"type": "string"})
+    journal.close()
+
+    resumed = UploadJournal(journal.path, resume=True)
+    assert resumed.is_done("parameter", "proj", "param1", payload={"type": "string"})
+    resumed.discard()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+import json
+from unittest import mock
+
+from dynamic_importer.api.client import CTClient
+from dynamic_importer.api.metrics import ClientMetrics
+from dynamic_importer.api.metrics import endpoint_template
+from tests.fixtures.requests import mocked_requests_get
+
+
+def test_endpoint_template():
+    assert endpoint_template("/projects/") == "/projects/"
+    assert endpoint_template("/projects/1/parameters/2/values/?environment=3") == (
+        "/projects/{id}/parameters/{id}/values/"
+    )
+    assert endpoint_template("/import/") == "/import/"
+
+
+def test_metrics_report(tmp_path):
+    metrics = ClientMetrics()
+    for latency in (0.02, 0.03, 0.04, 2.0):
+        metrics.record_request("get", "/projects/", latency, bytes_received=10)
+    metrics.record_request("POST", "/import/", 0.5, bytes_sent=100, error=True)
+    metrics.record_cache("projects", True)
+    metrics.record_cache("projects", False)
+    metrics.record_skipped_upload("templates", 300)
+    metrics.parameters = 2
+
+    report = metrics.to_dict()
+    assert report["total_requests"] == 5
+    assert report["requests_per_parameter"] == 2.5
+    assert report["cache"] == {"projects": {"hits": 1, "misses": 1}}
+    assert report["skipped_uploads"] == {"templates": {"count": 1, "bytes_saved": 300}}
+    get_stats = report["requests"][0]
+    assert (get_stats["method"], get_stats["endpoint"]) == ("GET", "/projects/")
+    assert get_stats["count"] == 4
+    assert get_stats["bytes_received"] == 40
+    assert get_stats["latency_seconds"]["p50"] == 0.04
+    assert get_stats["latency_seconds"]["p95"] == 2.0
+    assert report["requests"][1]["errors"] == 1
+
+    prometheus = metrics.to_prometheus()
+    labels = 'method="GET",endpoint="/projects/"'
+    assert f"cloudtruth_requests_total{{{labels}}} 4" in prometheus
+    assert f'cloudtruth_request_duration_seconds_bucket{{{labels},le="0.05"}} 3' in (
+        prometheus
+    )
+    assert f'cloudtruth_request_duration_seconds_bucket{{{labels},le="+Inf"}} 4' in (
+        prometheus
+    )
+    assert 'cloudtruth_cache_lookups_total{bucket="projects",result="miss"} 1' in (
+        prometheus
+    )
+    assert 'cloudtruth_upload_bytes_saved_total{kind="templates"} 300' in prometheus
+    # each metric family is declared once
+    type_lines = [line for line in prometheus.splitlines() if line.startswith("#")]
+    assert len(type_lines) == len(set(type_lines))
+
+    metrics.write(str(tmp_path / "metrics.prom"))
+    assert (tmp_path / "metrics.prom").read_text() == prometheus
+    metrics.write(str(tmp_path / "metrics.json"))
+    assert json.loads((tmp_path / "metrics.json").read_text()) == report
+
+
+@mock.patch(
+    "dynamic_importer.api.client.requests.Session.get",
+    side_effect=mocked_requests_get,
+)
+def test_client_records_metrics(mock_get):
+    client = CTClient("measured")
+    client.get_project_id("myproj")
+    client.get_project_id("myproj")
+    client.get_parameter_id("myproj", "param1")
+    report = client.metrics.to_dict()
+    assert [(r["method"], r["endpoint"], r["count"]) for r in report["requests"]] == [
+        ("GET", "/projects/", 1),
+        ("GET", "/projects/{id}/parameters/", 1),
+    ]
+    assert report["cache"]["projects"] == {"hits": 2, "misses": 1}
+    assert report["cache"]["parameters"] == {"hits": 0, "misses": 1}
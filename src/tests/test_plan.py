@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+from unittest import mock
+
+from dynamic_importer.plan import apply_plan
+from dynamic_importer.plan import build_plan
+from dynamic_importer.plan import CREATE
+from dynamic_importer.plan import empty_snapshot
+from dynamic_importer.plan import format_plan
+from dynamic_importer.plan import SKIP
+from dynamic_importer.plan import UPDATE
+
+CONFIG_DATA = {
+    "PORT": {
+        "param_name": "PORT",
+        "type": "integer",
+        "secret": False,
+        "values": {"default": 8080, "production": 443},
+    },
+    "DEBUG": {
+        "param_name": "DEBUG",
+        "type": "boolean",
+        "secret": False,
+        "values": {"default": True, "production": None},
+    },
+    "NEW": {
+        "param_name": "NEW",
+        "type": "string",
+        "secret": True,
+        "values": {"default": "hello"},
+    },
+}
+
+SNAPSHOT = {
+    "parameters": {
+        "PORT": {
+            "url": "/projects/1/parameters/1/",
+            "id": "1",
+            "description": "listen port",
+            "type": "integer",
+            "secret": False,
+            "values": {
+                "default": {"url": "/v/1/", "id": "11", "internal_value": "8080"},
+                "production": {"url": "/v/2/", "id": "12", "internal_value": "80"},
+            },
+        },
+        "DEBUG": {
+            "url": "/projects/1/parameters/2/",
+            "id": "2",
+            "description": "",
+            "type": "string",
+            "secret": False,
+            "values": {
+                "default": {"url": "/v/3/", "id": "21", "internal_value": "true"},
+            },
+        },
+    },
+    "templates": {
+        "app.env": {"url": "/projects/1/templates/1/", "id": "1", "body": "old"},
+    },
+}
+
+
+def _by_target(actions):
+    return {(a.kind, a.name, a.environment): a.action for a in actions}
+
+
+def test_build_plan_against_empty_project():
+    actions = build_plan(CONFIG_DATA, empty_snapshot(), "app.env", "body")
+    assert all(action.action == CREATE for action in actions)
+    # the unset production DEBUG value is never uploaded
+    assert ("value", "DEBUG", "production") not in _by_target(actions)
+    assert len(actions) == 8
+
+
+def test_build_plan_detects_changes():
+    actions = _by_target(build_plan(CONFIG_DATA, SNAPSHOT, "app.env", "old"))
+    assert actions[("parameter", "PORT", "")] == SKIP
+    assert actions[("value", "PORT", "default")] == SKIP
+    assert actions[("value", "PORT", "production")] == UPDATE
+    assert actions[("parameter", "DEBUG", "")] == UPDATE
+    # booleans are compared the way CloudTruth stores them
+    assert actions[("value", "DEBUG", "default")] == SKIP
+    assert actions[("parameter", "NEW", "")] == CREATE
+    assert actions[("value", "NEW", "default")] == CREATE
+    assert actions[("template", "app.env", "")] == SKIP
+
+
+def test_format_plan():
+    actions = build_plan(CONFIG_DATA, SNAPSHOT, "app.env", "new body")
+    output = format_plan(actions)
+    assert "~ update value PORT (production)" in output
+    assert "+ create parameter NEW" in output
+    assert "~ update template app.env" in output
+    assert "PORT (default)" not in output
+    assert output.endswith("Plan: 2 to create, 3 to update, 3 unchanged")
+    assert "= skip value PORT (default)" in format_plan(actions, show_unchanged=True)
+
+
+def test_apply_plan_only_sends_changes():
+    client = mock.MagicMock()
+    actions = build_plan(CONFIG_DATA, SNAPSHOT, "app.env", "new body")
+    apply_plan(client, "myproj", actions, create_dependencies=True)
+
+    client.create_parameter.assert_called_once_with(
+        "myproj", "NEW", type_name="string", secret=True, create_dependencies=True
+    )
+    client.update_parameter.assert_called_once_with(
+        "myproj", "2", "DEBUG", description="", type_name="boolean"
+    )
+    client.create_value.assert_called_once_with("myproj", "NEW", "default", "hello")
+    client.update_value.assert_called_once_with(
+        "myproj", "PORT", "production", "12", 443
+    )
+    client.update_template.assert_called_once_with("myproj", "1", "app.env", "new body")
+    client.create_template.assert_not_called()
+
+    # every parameter is applied before any value is written
+    names = [call[0] for call in client.method_calls]
+    assert names.index("create_value") > names.index("create_parameter")
+    assert names.index("update_value") > names.index("update_parameter")
+
+
+def test_apply_plan_with_jobs():
+    client = mock.MagicMock()
+    actions = build_plan(CONFIG_DATA, empty_snapshot())
+    apply_plan(client, "myproj", actions, jobs=4)
+    assert client.create_parameter.call_count == 3
+    assert client.create_value.call_count == 4
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+from unittest import mock
+
+from dynamic_importer.api.rate_limit import parse_retry_after
+from dynamic_importer.api.rate_limit import RateLimiter
+from dynamic_importer.api.rate_limit import throttle_delay
+from dynamic_importer.api.rate_limit import THROTTLE_BACKOFF_MAX
+from tests.fixtures.clock import FakeClock
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+
+
+def test_throttle_delay():
+    assert 5 <= throttle_delay("5", 0) <= 6
+    assert 4 <= throttle_delay(None, 2) <= 5
+    assert throttle_delay(None, 30) <= THROTTLE_BACKOFF_MAX + 1
+
+
+def test_rate_limiter_spaces_requests():
+    clock = FakeClock()
+    with mock.patch("dynamic_importer.api.rate_limit.time", clock):
+        limiter = RateLimiter(rate=2, burst=2)
+        for _ in range(6):
+            limiter.acquire()
+        # the burst goes out at once, then one request every half second
+        assert clock.now == 102.0
+
+
+def test_rate_limiter_pause():
+    clock = FakeClock()
+    with mock.patch("dynamic_importer.api.rate_limit.time", clock):
+        limiter = RateLimiter()
+        limiter.acquire()
+        assert clock.now == 100.0
+        limiter.pause(5)
+        limiter.acquire()
+        assert clock.now == 105.0
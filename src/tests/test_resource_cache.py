@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2024 CloudTruth, Inc.
+# All Rights Reserved
+#
+from __future__ import annotations
+
+from dynamic_importer.api.resource_cache import ResourceCache
+
+
+def test_resource_cache_indexes():
+    cache = ResourceCache()
+    cache.put("parameters", ("proj", "param1"), "1", "/projects/1/parameters/1/")
+    assert cache.get("parameters", "proj", "param1").to_dict() == {
+        "id": "1",
+        "url": "/projects/1/parameters/1/",
+    }
+    assert cache.get_by_id("parameters", "1").key == ("proj", "param1")
+    assert cache.get("parameters", "other", "param1") is None
+
+    # updating a resource moves it in the id index
+    cache.put("parameters", ("proj", "param1"), "2", "/projects/1/parameters/2/")
+    assert cache.get_by_id("parameters", "1") is None
+    assert cache.get_by_id("parameters", "2").key == ("proj", "param1")
+    assert len(cache) == 1
+
+
+def test_resource_cache_eviction():
+    cache = ResourceCache(max_entries=2)
+    cache.put("parameters", ("proj", "a"), "1", "/a/")
+    cache.put("parameters", ("proj", "b"), "2", "/b/")
+    cache.mark_complete("parameters", "proj")
+    # reading a keeps it, so b is the least recently used
+    cache.get("parameters", "proj", "a")
+    cache.put("parameters", ("proj", "c"), "3", "/c/")
+    assert cache.get("parameters", "proj", "b") is None
+    assert cache.get_by_id("parameters", "2") is None
+    assert cache.evictions == 1
+    # a listing missing an evicted resource can no longer answer misses
+    assert not cache.is_complete("parameters", "proj")
+
+
+def test_resource_cache_listings():
+    cache = ResourceCache()
+    cache.mark_complete("values", "proj")
+    assert cache.is_complete("values", "proj", "param1", "default")
+    assert not cache.is_complete("values", "other", "param1", "default")
+    assert not cache.is_complete("parameters", "proj")
+
+
+def test_resource_cache_forget_project():
+    cache = ResourceCache()
+    cache.put("projects", ("proj",), "1", "/projects/1/")
+    cache.put("parameters", ("proj", "param1"), "1", "/p/1/")
+    cache.put("values", ("proj", "param1", "default"), "1", "/v/1/")
+    cache.put("templates", ("proj", "template1"), "1", "/t/1/")
+    cache.put("parameters", ("other", "param1"), "2", "/p/2/")
+    cache.mark_complete("parameters", "proj")
+    cache.mark_complete("templates", "proj")
+
+    cache.forget_project("proj", ("parameters", "values"))
+    assert cache.get("parameters", "proj", "param1") is None
+    assert cache.get("values", "proj", "param1", "default") is None
+    assert cache.get("templates", "proj", "template1") is not None
+    assert cache.get("parameters", "other", "param1") is not None
+    assert cache.get("projects", "proj") is not None
+    assert not cache.is_complete("parameters", "proj")
+    assert cache.is_complete("templates", "proj")
+
+
+def test_resource_cache_export_and_load():
+    cache = ResourceCache()
+    cache.put("projects", ("proj",), "1", "/projects/1/")
+    cache.put("parameters", ("proj", "param1"), "1", "/p/1/")
+    cache.put("values", ("proj", "param1", "default"), "1", "/v/1/")
+    exported = cache.export(("projects", "parameters"))
+    assert exported == {
+        "projects": [["proj", "1", "/projects/1/", None]],
+        "parameters": [["proj", "param1", "1", "/p/1/", None]],
+    }
+
+    exported["projects"][0][-1] = 100.0
+    loaded = ResourceCache()
+    loaded.load(exported)
+    assert loaded.get("parameters", "proj", "param1").id == "1"
+    assert loaded.get("values", "proj", "param1", "default") is None
+    # loaded rows keep their time until fetched again
+    assert loaded.export(("projects",))["projects"][0][-1] == 100.0
+    loaded.put("projects", ("proj",), "1", "/projects/1/")
+    assert loaded.get("projects", "proj").saved_at is None